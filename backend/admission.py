@@ -0,0 +1,158 @@
+"""Admission control for expensive endpoints.
+
+Each compute route belongs to a cost class with a concurrency limit and a
+bounded wait queue. A request that finds its class full waits in the queue
+(first come, first served) for up to the class's wait timeout; a request
+that finds the queue full, or times out, is rejected straight away with 503
+and a Retry-After estimate instead of piling onto the compute pool.
+
+Cheap endpoints (CRUD, lists, health, metrics) are not admission controlled,
+and the heavy class is limited to a fraction of the compute workers, so
+bursts of pass or eclipse searches cannot starve the rest of the API.
+
+Routes opt in with a dependency, which runs outside the handler's own error
+handling so the 503 reaches the client::
+
+    @api_router.post("/satellites/passes", dependencies=[Depends(admission_controller.limit('heavy'))])
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+from fastapi import HTTPException
+
+from executor import compute_executor
+from metrics import REGISTRY, CallbackGauge, Counter
+
+ADMISSIONS = REGISTRY.register(Counter(
+    'planetarium_admission_total',
+    'Admission decisions by cost class (admitted, queued, rejected)',
+    ('cost_class', 'result'),
+))
+
+
+class CostClass:
+    """Concurrency limit with a bounded FIFO wait queue"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, wait_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self._waiters = deque()
+        # Smoothed time a request holds a slot, for Retry-After estimates
+        self._service_time = 1.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up for a new request"""
+        backlog = (len(self._waiters) + 1) / self.limit
+        return max(1, math.ceil(backlog * self._service_time))
+
+    def _reject(self):
+        ADMISSIONS.inc(self.name, 'rejected')
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server busy, too many {self.name} requests in flight",
+            headers={'Retry-After': str(self.retry_after())},
+        )
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            ADMISSIONS.inc(self.name, 'admitted')
+            return
+        if len(self._waiters) >= self.queue_size:
+            self._reject()
+
+        ADMISSIONS.inc(self.name, 'queued')
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # A slot handed over by release() counts as already taken
+            await asyncio.wait_for(waiter, self.wait_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self._reject()
+        except asyncio.CancelledError:
+            self._discard(waiter)
+            raise
+
+    def _discard(self, waiter):
+        if waiter.done() and not waiter.cancelled():
+            # The slot arrived just as we gave up; pass it on
+            self.release()
+        elif waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+    def release(self, held_for: float = None):
+        if held_for is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * held_for
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    def __init__(self, classes):
+        self.classes = {cost_class.name: cost_class for cost_class in classes}
+
+    def limit(self, name: str):
+        """Dependency that holds a slot of the named cost class for the request"""
+        cost_class = self.classes[name]
+
+        async def admit():
+            await cost_class.acquire()
+            started = time.monotonic()
+            try:
+                yield
+            finally:
+                cost_class.release(time.monotonic() - started)
+
+        return admit
+
+
+def create_admission_controller(compute_workers: int) -> AdmissionController:
+    """Build cost classes from environment configuration, sized to the compute pool"""
+    heavy_limit = int(os.environ.get('ADMISSION_HEAVY_LIMIT', str(max(1, compute_workers // 2))))
+    standard_limit = int(os.environ.get('ADMISSION_STANDARD_LIMIT', str(compute_workers * 4)))
+    return AdmissionController([
+        CostClass(
+            'heavy', heavy_limit,
+            queue_size=int(os.environ.get('ADMISSION_HEAVY_QUEUE', str(heavy_limit * 4))),
+            wait_timeout=float(os.environ.get('ADMISSION_HEAVY_WAIT_SECONDS', '10')),
+        ),
+        CostClass(
+            'standard', standard_limit,
+            queue_size=int(os.environ.get('ADMISSION_STANDARD_QUEUE', str(standard_limit * 4))),
+            wait_timeout=float(os.environ.get('ADMISSION_STANDARD_WAIT_SECONDS', '5')),
+        ),
+    ])
+
+
+admission_controller = create_admission_controller(compute_executor.max_workers)
+
+
+def _admission_state():
+    state = {}
+    for cost_class in admission_controller.classes.values():
+        state[(cost_class.name, 'active')] = cost_class.active
+        state[(cost_class.name, 'queued')] = cost_class.queued
+    return state
+
+
+REGISTRY.register(CallbackGauge(
+    'planetarium_admission_requests',
+    'Requests holding or waiting for a slot, by cost class',
+    _admission_state,
+    ('cost_class', 'state'),
+))
@@ -0,0 +1,193 @@
+"""Offline benchmarks for the astronomy compute paths.
+
+Runs each case in-process with fixed inputs, bundled TLE fixtures and stubbed
+MongoDB/NASA/CelesTrak, reports p50/p99 latency and throughput, and compares
+p50 against the stored baseline. Exits non-zero if any case is slower than
+the baseline by more than the threshold.
+
+    cd backend
+    python -m benchmarks.run                      # run and gate against baseline.json
+    python -m benchmarks.run --case satellite     # only cases whose name contains "satellite"
+    python -m benchmarks.run --update-baseline    # record a new baseline on this machine
+
+The eclipse cases need the DE421 ephemeris (de421.bsp) in --data-dir; they
+are reported as skipped when it is missing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'benchmarks')
+# Measure the computations themselves, not reads from the on-disk memo store or
+# the shared result cache (which would also fill the production cache file)
+os.environ.setdefault('MEMO_STORE_MB', '0')
+os.environ.setdefault('RESULT_CACHE_MB', '0')
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks import stubs  # noqa: E402
+
+
+class Case:
+    def __init__(self, name, func, iterations=30, needs_ephemeris=False, is_async=False):
+        self.name = name
+        self.func = func
+        self.iterations = iterations
+        self.needs_ephemeris = needs_ephemeris
+        self.is_async = is_async
+
+
+def build_cases(server):
+    location = server.LocationData(latitude=40.7128, longitude=-74.0060, datetime='2025-01-01T03:00:00Z')
+    name, line1, line2 = stubs.load_tles()[0]
+    position_request = server.SatellitePositionRequest(
+        name=name, line1=line1, line2=line2,
+        latitude=location.latitude, longitude=location.longitude, datetime=location.datetime,
+    )
+    pass_request = server.SatellitePassRequest(**position_request.model_dump(), days=7)
+    conjunction_request = server.ConjunctionRequest(
+        satellites=[{'name': name, 'line1': line1, 'line2': line2} for name, line1, line2 in stubs.load_tles()],
+        datetime=location.datetime, hours=24, threshold_km=50,
+    )
+    eclipse_start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    tonight_request = server.TonightRequest(
+        latitude=location.latitude, longitude=location.longitude, date='2025-01-01', catalog='figures',
+    )
+
+    rng = np.random.default_rng(42)
+    lookup_ra = rng.uniform(0, 360, 10000)
+    lookup_dec = np.degrees(np.arcsin(rng.uniform(-1, 1, 10000)))
+
+    server.db.custom_constellations.docs = [
+        server.CustomConstellation(
+            name=f'Figure {i}',
+            user_id='benchmark-user',
+            stars=[{'x': j, 'y': j, 'ra': j * 3.0, 'dec': j - 10.0, 'name': f'Star {j}'} for j in range(20)],
+            lines=[[j, j + 1] for j in range(19)],
+        ).to_document()
+        for i in range(50)
+    ]
+
+    async def user_constellations_miss():
+        await server.list_cache.invalidate('custom_constellations', 'benchmark-user')
+        await server.get_user_constellations('benchmark-user', None)
+
+    async def user_constellations_hit():
+        await server.get_user_constellations('benchmark-user', None)
+
+    return [
+        Case('planet_positions', lambda: server.compute_planet_positions(location), iterations=200),
+        Case('visible_stars', lambda: server.compute_visible_stars(location), iterations=200),
+        Case('astronomical_events', lambda: server.compute_astronomical_events(location), iterations=100),
+        Case('satellite_position', lambda: server.compute_satellite_position(position_request), iterations=100),
+        Case('satellite_passes', lambda: server.compute_satellite_passes(pass_request), iterations=20),
+        Case('satellite_conjunctions', lambda: server.compute_satellite_conjunctions(conjunction_request), iterations=20),
+        Case('constellation_lookup_10k', lambda: server.constellation_at(lookup_ra, lookup_dec), iterations=50),
+        Case('lunar_eclipses', lambda: server.compute_lunar_eclipses(eclipse_start), iterations=5, needs_ephemeris=True),
+        Case('solar_eclipses', lambda: server.compute_solar_eclipses(location), iterations=5, needs_ephemeris=True),
+        Case('tonight_figures', lambda: server.compute_tonight(tonight_request), iterations=20, needs_ephemeris=True),
+        Case('satellite_tle_group', lambda: server.get_satellite_tle('stations', None), iterations=100, is_async=True),
+        Case('user_constellations_miss', user_constellations_miss, iterations=100, is_async=True),
+        Case('user_constellations_hit', user_constellations_hit, iterations=200, is_async=True),
+    ]
+
+
+def run_case(case, loop, warmup):
+    call = (lambda: loop.run_until_complete(case.func())) if case.is_async else case.func
+    for _ in range(warmup):
+        call()
+    samples = []
+    for _ in range(case.iterations):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    samples = np.array(samples)
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)) * 1000, 3),
+        'p99_ms': round(float(np.percentile(samples, 99)) * 1000, 3),
+        'throughput_per_s': round(len(samples) / float(samples.sum()), 2),
+        'iterations': case.iterations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the astronomy compute paths')
+    parser.add_argument('--case', help='only run cases whose name contains this string')
+    parser.add_argument('--data-dir', default=str(BACKEND_DIR), help='directory holding de421.bsp')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed p50 slowdown relative to baseline (0.25 = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.1,
+                        help='ignore slowdowns smaller than this, to keep sub-millisecond cases from flapping')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    # Skyfield resolves 'de421.bsp' relative to the working directory
+    os.chdir(args.data_dir)
+    has_ephemeris = Path('de421.bsp').exists()
+
+    import server
+    server.db = stubs.StubDatabase()
+    server.requests = stubs.StubRequests()
+    server.sync_feed = server.create_sync_feed(server.db)
+
+    cases = build_cases(server)
+    if args.case:
+        cases = [case for case in cases if args.case in case.name]
+
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    baseline_cases = baseline.get('cases', {})
+    loop = asyncio.new_event_loop()
+    results = {}
+    regressions = []
+
+    print(f"{'case':<28}{'p50 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'vs base':>10}")
+    for case in cases:
+        if case.needs_ephemeris and not has_ephemeris:
+            print(f"{case.name:<28}{'skipped: de421.bsp not found in ' + args.data_dir:>40}")
+            continue
+        result = run_case(case, loop, args.warmup)
+        results[case.name] = result
+
+        change = ''
+        reference = baseline_cases.get(case.name)
+        if reference:
+            ratio = result['p50_ms'] / reference['p50_ms'] - 1
+            change = f"{ratio:+.0%}"
+            if ratio > args.threshold and result['p50_ms'] - reference['p50_ms'] > args.min_delta_ms:
+                regressions.append((case.name, reference['p50_ms'], result['p50_ms']))
+                change += ' !'
+        print(f"{case.name:<28}{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}"
+              f"{result['throughput_per_s']:>10.1f}{change:>10}")
+    loop.close()
+
+    if args.update_baseline:
+        baseline_cases.update(results)
+        BASELINE_PATH.write_text(json.dumps({
+            'machine': {'python': platform.python_version(), 'platform': platform.platform()},
+            'cases': baseline_cases,
+        }, indent=2, sort_keys=True) + '\n')
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}:")
+        for name, before, after in regressions:
+            print(f"  {name}: {before:.3f} ms -> {after:.3f} ms")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""In-process stand-ins for MongoDB and the upstream HTTP APIs.
+
+They implement only what the benchmarked handlers call, so the suite measures
+our code rather than network or database latency.
+"""
+import json
+from pathlib import Path
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, key, direction=1):
+        self._docs.sort(key=lambda doc: doc.get(key), reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self._docs = self._docs[:count]
+        return self
+
+    async def to_list(self, length):
+        return self._docs[:length]
+
+
+class StubCollection:
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+
+    @staticmethod
+    def _matches(doc, query):
+        return all(doc.get(key) == value for key, value in query.items())
+
+    @staticmethod
+    def _project(doc, projection):
+        if projection and projection.get('_id') == 0:
+            return {key: value for key, value in doc.items() if key != '_id'}
+        return dict(doc)
+
+    def find(self, query=None, projection=None):
+        query = query or {}
+        return _Cursor([self._project(doc, projection) for doc in self.docs if self._matches(doc, query)])
+
+    async def find_one(self, query=None, projection=None):
+        docs = self.find(query, projection)._docs
+        return docs[0] if docs else None
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def find_one_and_delete(self, query, projection=None):
+        for index, doc in enumerate(self.docs):
+            if self._matches(doc, query):
+                return self._project(self.docs.pop(index), projection)
+        return None
+
+    async def create_index(self, *args, **kwargs):
+        return None
+
+
+class StubDatabase:
+    def __init__(self):
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._collections.setdefault(name, StubCollection())
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+class StubResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class StubRequests:
+    """Serves NASA APOD and CelesTrak requests from fixture files"""
+
+    def __init__(self):
+        self._apod = (FIXTURES / 'apod.json').read_text()
+        self._tle = (FIXTURES / 'stations.tle').read_text()
+
+    def get(self, url, *args, **kwargs):
+        if 'api.nasa.gov' in url:
+            return StubResponse(self._apod)
+        if 'celestrak.org' in url:
+            return StubResponse(self._tle)
+        return StubResponse('', status_code=404)
+
+    def post(self, url, *args, **kwargs):
+        return StubResponse('{}')
+
+
+def load_tles():
+    """Fixture TLEs as (name, line1, line2) tuples"""
+    lines = (FIXTURES / 'stations.tle').read_text().strip().splitlines()
+    return [tuple(lines[i:i + 3]) for i in range(0, len(lines), 3)]
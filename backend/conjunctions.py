@@ -0,0 +1,226 @@
+"""Close-approach screening between satellites.
+
+All objects are propagated together on a shared time grid. At each step a
+uniform grid hash over the positions finds the pairs close enough that they
+could meet within half a step, a linear relative-motion model drops the pairs
+that clearly miss, and only the survivors have their time of closest approach
+refined with SGP4 (Newton iterations on the range rate). Nothing is ever
+compared all-against-all, so the cost grows with the number of objects and
+of genuinely nearby pairs rather than with n².
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+from sgp4.api import Satrec
+
+from orbits import propagate, propagate_one, time_grid
+
+# Neighbouring cell columns (x, y offsets) searched from each point. Each
+# column lookup covers three cells, dz = -1..1, which are adjacent in key order.
+# Only half of the surrounding columns are needed because each pair of columns
+# is visited from one side; pairs within the point's own column come up twice
+# and are deduplicated.
+NEIGHBOUR_COLUMNS = np.array([(0, 0, 0), (0, 1, 0), (1, -1, 0), (1, 0, 0), (1, 1, 0)])
+# Upper bound on relative acceleration between two orbiting objects, km/s²
+MAX_RELATIVE_ACCELERATION = 0.02
+# Positions propagated per chunk of the time grid (objects x steps)
+CHUNK_POSITIONS = 200_000
+REFINE_ITERATIONS = 5
+
+
+def grid_pairs(points: np.ndarray, radius: float, groups: Optional[np.ndarray] = None):
+    """Index pairs (i < j) of points closer than radius, found via a uniform grid hash.
+
+    With groups, only points in the same group are paired, so many independent
+    point sets (e.g. every step of a time grid) can be hashed in one pass.
+    """
+    if len(points) < 2:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    cells = np.floor(points / radius).astype(np.int64)
+    # Shift so neighbour lookups never leave the packed key range
+    cells -= cells.min(axis=0) - 1
+    dims = cells.max(axis=0) + 2
+    strides = np.array([dims[1] * dims[2], dims[2], 1])
+    keys = cells @ strides
+    if groups is not None:
+        keys += groups.astype(np.int64) * int(np.prod(dims))
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    firsts, seconds = [], []
+    for offset in NEIGHBOUR_COLUMNS:
+        # Shifted keys stay sorted, which keeps the binary searches cache-friendly
+        neighbour_keys = sorted_keys + offset @ strides
+        lo = np.searchsorted(sorted_keys, neighbour_keys - 1, side='left')
+        hi = np.searchsorted(sorted_keys, neighbour_keys + 1, side='right')
+        counts = hi - lo
+        total = int(counts.sum())
+        if not total:
+            continue
+        first = np.repeat(order, counts)
+        runs = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = order[np.repeat(lo, counts) + runs]
+        if not offset.any():
+            same_cell = first < second
+            first, second = first[same_cell], second[same_cell]
+        firsts.append(first)
+        seconds.append(second)
+
+    if not firsts:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    close = np.einsum('ij,ij->i', points[first] - points[second], points[first] - points[second]) < radius * radius
+    first, second = first[close], second[close]
+    return np.minimum(first, second), np.maximum(first, second)
+
+
+def _screen_chunk(positions, velocities, offsets, threshold_km, step_seconds, is_target):
+    """Candidate (i, j, seconds from start, linear miss distance) encounters for a chunk of grid steps"""
+    count, steps = positions.shape[:2]
+    # Step-major flattening: point k is object k % count at step k // count
+    positions = positions.transpose(1, 0, 2).reshape(-1, 3)
+    velocities = velocities.transpose(1, 0, 2).reshape(-1, 3)
+    valid = np.flatnonzero(np.isfinite(positions).all(axis=1))
+    if not len(valid):
+        return []
+    half_step = step_seconds / 2
+    max_speed = float(np.max(np.linalg.norm(velocities[valid], axis=1)))
+    margin = 0.5 * MAX_RELATIVE_ACCELERATION * half_step ** 2
+    radius = threshold_km + margin + 2 * max_speed * half_step
+
+    if is_target is not None and is_target.sum() * 8 < count:
+        first, second = _target_pairs(positions, valid, count, radius, is_target)
+    else:
+        first, second = grid_pairs(positions[valid], radius, groups=valid // count)
+        first, second = valid[first], valid[second]
+        if is_target is not None:
+            involved = is_target[first % count] | is_target[second % count]
+            first, second = first[involved], second[involved]
+
+    # Closest approach under straight-line relative motion within the step
+    dr = positions[second] - positions[first]
+    dv = velocities[second] - velocities[first]
+    speed2 = np.maximum(np.einsum('ij,ij->i', dv, dv), 1e-12)
+    offset = np.clip(-np.einsum('ij,ij->i', dr, dv) / speed2, -half_step, half_step)
+    miss = np.linalg.norm(dr + dv * offset[:, None], axis=1)
+    keep = miss < threshold_km + margin
+    first, second, offset, miss = first[keep], second[keep], offset[keep], miss[keep]
+    return list(zip(
+        (first % count).tolist(), (second % count).tolist(),
+        (offsets[first // count] + offset).tolist(), miss.tolist(),
+    ))
+
+
+def _target_pairs(positions, valid, count, radius, is_target):
+    """Pairs within radius when only a few targets are screened: targets against everything"""
+    is_valid = np.zeros(len(positions), dtype=bool)
+    is_valid[valid] = True
+    firsts, seconds = [], []
+    for target in np.flatnonzero(is_target):
+        # Same step, every object: flat indices differ by (object - target)
+        target_points = np.arange(target, len(positions), count)
+        steps = len(target_points)
+        others = (np.arange(steps)[:, None] * count + np.arange(count)[None, :])
+        distance = np.linalg.norm(positions[others] - positions[target_points][:, None], axis=2)
+        step, other = np.nonzero(distance < radius)
+        first, second = target_points[step], others[step, other]
+        ok = is_valid[first] & is_valid[second] & (first != second)
+        # Skip target-target duplicates: keep those pairs from the lower index only
+        ok &= ~is_target[second % count] | (first % count < second % count)
+        firsts.append(np.minimum(first[ok], second[ok]))
+        seconds.append(np.maximum(first[ok], second[ok]))
+    if not firsts:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def _refine(sat_a: Satrec, sat_b: Satrec, start: datetime, guess: float, lo: float, hi: float):
+    """Time (seconds from start), miss distance and relative speed at closest approach"""
+    t = guess
+    for _ in range(REFINE_ITERATIONS):
+        ra, va = propagate_one(sat_a, start, t)
+        rb, vb = propagate_one(sat_b, start, t)
+        dr, dv = rb - ra, vb - va
+        speed2 = float(dv @ dv)
+        if not np.isfinite(speed2) or speed2 < 1e-12:
+            break
+        t = min(max(t - float(dr @ dv) / speed2, lo), hi)
+    ra, va = propagate_one(sat_a, start, t)
+    rb, vb = propagate_one(sat_b, start, t)
+    return t, float(np.linalg.norm(rb - ra)), float(np.linalg.norm(vb - va))
+
+
+def screen_conjunctions(
+    names: Sequence[str],
+    satrecs: Sequence[Satrec],
+    start: datetime,
+    duration_seconds: float,
+    threshold_km: float,
+    step_seconds: float = 30.0,
+    targets: Optional[Iterable[int]] = None,
+) -> List[dict]:
+    """Close approaches under threshold_km within the window, closest first.
+
+    With targets (indices into satrecs), only pairs involving at least one
+    target are screened; otherwise every pair is. A naive start is UTC.
+    """
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    count = len(satrecs)
+    is_target = None
+    if targets is not None:
+        is_target = np.zeros(count, dtype=bool)
+        is_target[list(targets)] = True
+
+    offsets = np.arange(0.0, duration_seconds + step_seconds, step_seconds)
+    chunk_steps = max(1, CHUNK_POSITIONS // max(count, 1))
+    candidates = []
+    for chunk_start in range(0, len(offsets), chunk_steps):
+        chunk = offsets[chunk_start:chunk_start + chunk_steps]
+        positions, velocities = propagate(satrecs, *time_grid(start, chunk))
+        candidates.extend(_screen_chunk(positions, velocities, chunk, threshold_km, step_seconds, is_target))
+
+    # Consecutive steps flagging the same pair are one encounter (or, for objects
+    # flying in formation, one long one); refine each run once from its best step
+    candidates.sort()
+    runs = []
+    for i, j, guess, miss in candidates:
+        if runs and runs[-1]['pair'] == (i, j) and guess - runs[-1]['last'] < 2.5 * step_seconds:
+            run = runs[-1]
+            run['last'] = guess
+            if miss < run['miss']:
+                run['guess'], run['miss'] = guess, miss
+        else:
+            runs.append({'pair': (i, j), 'first': guess, 'last': guess, 'guess': guess, 'miss': miss})
+
+    # Refine each run, then keep one encounter per pair per pass
+    encounters = {}
+    for run in runs:
+        i, j = run['pair']
+        lo = max(run['first'] - step_seconds, 0.0)
+        hi = min(run['last'] + step_seconds, duration_seconds)
+        t, miss, speed = _refine(satrecs[i], satrecs[j], start, run['guess'], lo, hi)
+        if not miss <= threshold_km:
+            continue
+        pair_encounters = encounters.setdefault((i, j), [])
+        for index, (other_t, other_miss, _) in enumerate(pair_encounters):
+            if abs(other_t - t) < 2 * step_seconds:
+                if miss < other_miss:
+                    pair_encounters[index] = (t, miss, speed)
+                break
+        else:
+            pair_encounters.append((t, miss, speed))
+
+    results = []
+    for (i, j), pair_encounters in encounters.items():
+        for t, miss, speed in pair_encounters:
+            results.append({
+                'satellite_a': names[i],
+                'satellite_b': names[j],
+                'tca': (start + timedelta(seconds=t)).isoformat(),
+                'miss_distance_km': round(miss, 3),
+                'relative_speed_km_s': round(speed, 3),
+            })
+    results.sort(key=lambda result: result['miss_distance_km'])
+    return results
@@ -0,0 +1,200 @@
+"""IAU constellation geometry and point-in-constellation lookup.
+
+Boundaries come from Skyfield's bundled copy of the official IAU boundary
+table (Roman 1987), which is defined on the B1875 equator as a grid of RA/Dec
+cells, each labelled with a constellation. Looking a point up is two binary
+searches into that grid after precessing to B1875, so it vectorises over any
+number of points.
+
+The same grid is traced once at import into closed boundary outlines,
+converted to J2000 and kept as compact flat coordinate lists. Line figures are
+loaded from ``data/constellation_figures.json``.
+"""
+import json
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from skyfield.api import load, load_constellation_names
+from skyfield.functions import load_bundled_npy
+from skyfield.timelib import julian_date_of_besselian_epoch
+
+FIGURES_PATH = Path(__file__).parent / 'data' / 'constellation_figures.json'
+
+# Longest boundary edge kept straight before precession, in degrees; longer
+# constant-declination edges are subdivided so they stay accurate in J2000
+MAX_EDGE_DEGREES = 2.0
+
+_arrays = load_bundled_npy('constellations.npz')
+_sorted_ra = _arrays['sorted_ra'] * 15.0  # hours -> degrees
+_sorted_dec = _arrays['sorted_dec']
+_radec_to_index = _arrays['radec_to_index']
+_abbreviations = [str(abbr) for abbr in _arrays['indexed_abbreviations']]
+
+NAMES = dict(load_constellation_names())
+
+# Rotation from J2000 (ICRS) to the equator and equinox of B1875
+_B1875 = load.timescale(builtin=True).tt_jd(julian_date_of_besselian_epoch(1875))
+_TO_B1875 = _B1875.M
+
+
+def _unit_vectors(ra_deg, dec_deg):
+    ra = np.radians(ra_deg)
+    dec = np.radians(dec_deg)
+    cos_dec = np.cos(dec)
+    return np.array([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)])
+
+
+def _radec(vectors):
+    x, y, z = vectors
+    ra = np.degrees(np.arctan2(y, x)) % 360.0
+    dec = np.degrees(np.arctan2(z, np.hypot(x, y)))
+    return ra, dec
+
+
+def constellation_at(ra_deg, dec_deg):
+    """Return the IAU abbreviation(s) containing J2000 RA/Dec point(s) in degrees
+
+    Accepts scalars or arrays and returns a string or an array of strings.
+    """
+    ra_deg = np.asarray(ra_deg, dtype=float)
+    dec_deg = np.asarray(dec_deg, dtype=float)
+    ra1875, dec1875 = _radec(_TO_B1875 @ _unit_vectors(ra_deg, dec_deg).reshape(3, -1))
+    i = np.searchsorted(_sorted_ra, ra1875)
+    j = np.searchsorted(_sorted_dec, dec1875, side='right')
+    result = np.array(_abbreviations)[_radec_to_index[i, j]]
+    return str(result[0]) if ra_deg.ndim == 0 else result.reshape(ra_deg.shape)
+
+
+def _cell_edges():
+    """Collect unit-length boundary edges of the B1875 grid per constellation"""
+    ra_edges = np.concatenate([[0.0], _sorted_ra, [360.0]])
+    dec_edges = np.concatenate([[-90.0], _sorted_dec, [90.0]])
+    n_ra = len(ra_edges) - 1
+    n_dec = len(dec_edges) - 1
+    grid = _radec_to_index[:n_ra, :n_dec]
+
+    edges = defaultdict(list)
+    for i in range(n_ra):
+        left = i - 1 if i > 0 else n_ra - 1
+        for j in range(n_dec):
+            here = grid[i, j]
+            # Edge on the western (lower RA) side of the cell
+            if grid[left, j] != here:
+                p, q = (i, j), (i, j + 1)
+                edges[here].append((p, q))
+                edges[grid[left, j]].append((q, p))
+            # Edge on the southern side of the cell (no edge at the pole)
+            if j > 0 and grid[i, j - 1] != here:
+                p, q = ((i + 1) % n_ra, j), (i, j)
+                edges[here].append((p, q))
+                edges[grid[i, j - 1]].append((q, p))
+    return edges, ra_edges, dec_edges
+
+
+def _trace_loops(edge_list):
+    """Chain directed edges into closed loops of grid vertices"""
+    outgoing = defaultdict(list)
+    for p, q in edge_list:
+        outgoing[p].append(q)
+    loops = []
+    while outgoing:
+        start = next(iter(outgoing))
+        loop = [start]
+        vertex = start
+        while True:
+            targets = outgoing[vertex]
+            nxt = targets.pop()
+            if not targets:
+                del outgoing[vertex]
+            if nxt == start:
+                break
+            loop.append(nxt)
+            vertex = nxt
+        loops.append(loop)
+    return loops
+
+
+def _loop_coordinates(loop, ra_edges, dec_edges, n_ra):
+    """Convert a loop of grid vertices to J2000 RA/Dec, dropping collinear points"""
+    points = []
+    count = len(loop)
+    for k, (i, j) in enumerate(loop):
+        prev_i, prev_j = loop[k - 1]
+        next_i, next_j = loop[(k + 1) % count]
+        if (prev_i == i == next_i) or (prev_j == j == next_j):
+            continue
+        points.append((i % n_ra, j))
+
+    ras = []
+    decs = []
+    for k, (i, j) in enumerate(points):
+        ra = ra_edges[i]
+        dec = dec_edges[j]
+        next_i, next_j = points[(k + 1) % len(points)]
+        ras.append(ra)
+        decs.append(dec)
+        if next_j == j:
+            # Constant-declination edge: subdivide before precessing
+            span = (ra_edges[next_i] - ra) % 360.0
+            if span > 180.0:
+                span -= 360.0
+            steps = int(abs(span) * np.cos(np.radians(dec)) // MAX_EDGE_DEGREES)
+            for step in range(1, steps + 1):
+                ras.append(ra + span * step / (steps + 1))
+                decs.append(dec)
+
+    ra2000, dec2000 = _radec(_TO_B1875.T @ _unit_vectors(np.array(ras), np.array(decs)))
+    return np.round(np.column_stack([ra2000, dec2000]).ravel(), 2).tolist()
+
+
+def _build_boundaries():
+    edges, ra_edges, dec_edges = _cell_edges()
+    n_ra = len(ra_edges) - 1
+    boundaries = {}
+    for index, edge_list in edges.items():
+        loops = _trace_loops(edge_list)
+        boundaries[_abbreviations[index]] = [
+            _loop_coordinates(loop, ra_edges, dec_edges, n_ra) for loop in loops
+        ]
+    return boundaries
+
+
+def _build_figures(data):
+    stars = data['stars']
+    return {
+        abbr: [
+            [coordinate for name in polyline for coordinate in stars[name]]
+            for polyline in polylines
+        ]
+        for abbr, polylines in data['figures'].items()
+    }
+
+
+with open(FIGURES_PATH) as f:
+    _figure_data = json.load(f)
+
+BOUNDARIES = _build_boundaries()
+FIGURES = _build_figures(_figure_data)
+# Named stars of the line figures: name -> [J2000 RA, Dec] in degrees
+FIGURE_STARS = _figure_data['stars']
+
+
+def constellation_geometry():
+    """All 88 constellations with boundaries and line figures.
+
+    Coordinates are J2000 degrees, flattened as [ra0, dec0, ra1, dec1, ...]
+    per boundary loop or figure polyline. The figure data does not cover
+    every constellation yet; those without one have ``has_figure`` false and
+    no lines.
+    """
+    return [
+        {
+            'abbreviation': abbr,
+            'name': NAMES[abbr],
+            'boundaries': BOUNDARIES[abbr],
+            'has_figure': abbr in FIGURES,
+            'lines': FIGURES.get(abbr, []),
+        }
+        for abbr in sorted(NAMES)
+    ]
@@ -0,0 +1,74 @@
+"""Thread pool for CPU-bound astronomy work.
+
+Ephemeris evaluation and SGP4 propagation block for tens to thousands of
+milliseconds, so handlers hand that work to this pool instead of running it on
+the event loop. The pool tracks how many jobs are waiting and running so the
+numbers can be exported as metrics.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import REGISTRY, CallbackGauge, Histogram, timed
+from profiler import sampling_profiler
+
+EXECUTOR_WAIT = REGISTRY.register(Histogram(
+    'planetarium_executor_wait_seconds',
+    'Time compute jobs spend queued before a worker thread picks them up',
+    ('job',),
+))
+
+
+class ComputeExecutor:
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='compute')
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+
+    async def run(self, job: str, func, *args):
+        """Run func(*args) on the pool and return its result"""
+        submitted = time.perf_counter()
+        # Carry context variables (request-scoped state) into the worker thread
+        context = contextvars.copy_context()
+
+        def call():
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+            EXECUTOR_WAIT.observe(time.perf_counter() - submitted, job)
+            try:
+                with timed('compute', job), sampling_profiler.attach(context):
+                    return context.run(func, *args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        with self._lock:
+            self.queued += 1
+        future = self._pool.submit(call)
+        # A caller cancelled while the job is still queued cancels it before call() runs
+        future.add_done_callback(self._discard_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _discard_cancelled(self, future):
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+compute_executor = ComputeExecutor(int(os.environ.get('COMPUTE_WORKERS', str(os.cpu_count() or 4))))
+
+REGISTRY.register(CallbackGauge(
+    'planetarium_executor_jobs',
+    'Compute jobs currently queued or running',
+    lambda: {('queued',): compute_executor.queued, ('running',): compute_executor.running},
+    ('state',),
+))
@@ -0,0 +1,157 @@
+"""Satellite ground tracks as compact, dateline-split polylines.
+
+Each satellite is propagated once over its whole window on a uniform grid
+fine enough for its orbital period. The track is then simplified by
+subdividing (on unwrapped longitudes) only where a straight line would stray
+from the samples, which keeps points where the track bends (latitude turning
+points, fast longitude change near the poles) and drops them on the long
+straight-ish stretches. Finally it is cut at the
+antimeridian, with an interpolated point on each side of every crossing, and
+each piece is encoded in the Google encoded polyline format.
+"""
+from datetime import datetime
+from typing import List
+
+import numpy as np
+from sgp4.api import Satrec
+
+from orbits import propagate, time_grid
+from visibility import EARTH_RADIUS_KM, WGS84_FLATTENING, gmst
+
+# Dense samples per orbit before simplification
+SAMPLES_PER_ORBIT = 360
+# Spacing of the samples simplification starts from (8 per orbit)
+INITIAL_STRIDE = SAMPLES_PER_ORBIT // 8
+POLYLINE_PRECISION = 1e5
+
+
+def orbital_period_minutes(satrec: Satrec) -> float:
+    return 2 * np.pi / satrec.no_kozai
+
+
+def subpoints(positions: np.ndarray, jd, fr):
+    """Geodetic latitude, longitude (degrees) and height (km) below TEME positions shaped (t, 3)"""
+    theta = gmst(jd, fr)
+    x, y, z = positions[:, 0], positions[:, 1], positions[:, 2]
+    longitude = np.degrees(np.arctan2(y, x) - theta)
+    longitude = (longitude + 180) % 360 - 180
+
+    e2 = WGS84_FLATTENING * (2 - WGS84_FLATTENING)
+    p = np.hypot(x, y)
+    latitude = np.arctan2(z, p * (1 - e2))
+    for _ in range(3):
+        normal_radius = EARTH_RADIUS_KM / np.sqrt(1 - e2 * np.sin(latitude) ** 2)
+        latitude = np.arctan2(z + e2 * normal_radius * np.sin(latitude), p)
+    normal_radius = EARTH_RADIUS_KM / np.sqrt(1 - e2 * np.sin(latitude) ** 2)
+    height = p / np.cos(latitude) - normal_radius
+    return np.degrees(latitude), longitude, height
+
+
+def simplify(latitude: np.ndarray, longitude: np.ndarray, tolerance: float) -> np.ndarray:
+    """Indices of the points needed to stay within tolerance degrees of the sampled track.
+
+    Starts from a coarse subset and, round by round, halves every interval
+    whose straight line strays too far from the samples it skips. Each round
+    handles all intervals at once, so there are only about log2(n) rounds.
+    """
+    count = len(latitude)
+    kept = np.unique(np.append(np.arange(0, count, INITIAL_STRIDE), count - 1))
+    while True:
+        first, last = kept[:-1], kept[1:]
+        gaps = last - first - 1
+        wide = gaps > 0
+        first, last, gaps = first[wide], last[wide], gaps[wide]
+        if not len(first):
+            return kept
+        # Every skipped sample, tagged with the interval it belongs to
+        interval = np.repeat(np.arange(len(first)), gaps)
+        inner = first[interval] + 1 + np.arange(gaps.sum()) - np.repeat(np.cumsum(gaps) - gaps, gaps)
+        d_lon = (longitude[last] - longitude[first])[interval]
+        d_lat = (latitude[last] - latitude[first])[interval]
+        rel_lon = longitude[inner] - longitude[first][interval]
+        rel_lat = latitude[inner] - latitude[first][interval]
+        length = np.hypot(d_lon, d_lat)
+        error = np.where(
+            length > 0,
+            np.abs(d_lon * rel_lat - d_lat * rel_lon) / np.maximum(length, 1e-12),
+            np.hypot(rel_lon, rel_lat),
+        )
+        worst = np.maximum.reduceat(error, np.cumsum(gaps) - gaps)
+        split = worst > tolerance
+        if not split.any():
+            return kept
+        kept = np.union1d(kept, (first[split] + last[split]) // 2)
+
+
+def split_at_antimeridian(latitude: np.ndarray, unwrapped_longitude: np.ndarray) -> List[np.ndarray]:
+    """Cut an unwrapped track into segments within [-180, 180], each an array of (lat, lon)"""
+    wraps = np.floor((unwrapped_longitude + 180) / 360)
+    segments = []
+    current = [(latitude[0], unwrapped_longitude[0] - 360 * wraps[0])]
+    for i in range(1, len(latitude)):
+        if wraps[i] != wraps[i - 1]:
+            # Interpolate the crossing and end/start the segments exactly on it
+            edge = 180 + 360 * min(wraps[i], wraps[i - 1])
+            fraction = (edge - unwrapped_longitude[i - 1]) / (unwrapped_longitude[i] - unwrapped_longitude[i - 1])
+            crossing_latitude = latitude[i - 1] + fraction * (latitude[i] - latitude[i - 1])
+            eastward = wraps[i] > wraps[i - 1]
+            current.append((crossing_latitude, 180.0 if eastward else -180.0))
+            segments.append(np.array(current))
+            current = [(crossing_latitude, -180.0 if eastward else 180.0)]
+        current.append((latitude[i], unwrapped_longitude[i] - 360 * wraps[i]))
+    segments.append(np.array(current))
+    return segments
+
+
+def encode_polyline(points: np.ndarray) -> str:
+    """Google encoded polyline of (lat, lon) points"""
+    scaled = np.round(points * POLYLINE_PRECISION).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    chunks = []
+    for value in deltas.tolist():
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+
+def encode_track(latitude: np.ndarray, longitude: np.ndarray, tolerance_deg: float) -> List[str]:
+    """Simplify a sampled track and encode it as polylines split at the antimeridian"""
+    finite = np.isfinite(latitude)
+    latitude, longitude = latitude[finite], longitude[finite]
+    if len(latitude) < 2:
+        return []
+    unwrapped = np.degrees(np.unwrap(np.radians(longitude)))
+    kept = simplify(latitude, unwrapped, tolerance_deg)
+    return [encode_polyline(segment) for segment in split_at_antimeridian(latitude[kept], unwrapped[kept])]
+
+
+def ground_track(satrec: Satrec, start: datetime, orbits_before: float, orbits_after: float,
+                 tolerance_deg: float) -> dict:
+    """Current subpoint plus past and future ground tracks around start, as encoded polylines"""
+    period = orbital_period_minutes(satrec) * 60
+    step = period / SAMPLES_PER_ORBIT
+    before = -np.arange(0, orbits_before * period + step / 2, step)[::-1]
+    after = np.arange(0, orbits_after * period + step / 2, step)
+    offsets = np.concatenate([before, after[1:]])
+    now = len(before) - 1
+
+    jd, fr = time_grid(start, offsets)
+    positions, _ = propagate([satrec], jd, fr)
+    latitude, longitude, height = subpoints(positions[0], jd, fr)
+
+    current = None
+    if np.isfinite(latitude[now]):
+        current = {
+            'latitude': float(latitude[now]),
+            'longitude': float(longitude[now]),
+            'altitude_km': float(height[now]),
+        }
+    return {
+        'period_minutes': period / 60,
+        'current': current,
+        'past': encode_track(latitude[:now + 1], longitude[:now + 1], tolerance_deg),
+        'future': encode_track(latitude[now:], longitude[now:], tolerance_deg),
+    }
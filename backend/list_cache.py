@@ -0,0 +1,226 @@
+"""Read-through cache for per-user list endpoints.
+
+Entries hold the serialized JSON body of a list response together with its
+ETag, so a cache hit can be answered (or turned into a 304) without touching
+MongoDB. Writes invalidate the owning user's entry.
+
+The default backend is an in-process LRU. Setting ``REDIS_URL`` switches to a
+Redis-compatible store shared by all workers (requires the optional ``redis``
+package). An in-process entry cannot see invalidations made by other workers,
+so the in-process backend keeps its per-key generations in a small
+memory-mapped file (by default under ``/dev/shm``) that every worker on the
+host shares. Entries are stored with the generation current when they were
+loaded and count as misses once any worker has bumped it, all without a
+database round trip.
+"""
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+from metrics import CACHE_REQUESTS, timed
+
+logger = logging.getLogger(__name__)
+
+
+COUNTER = struct.Struct('<Q')
+
+
+class SharedGenerations:
+    """Per-key counters in a memory-mapped file shared by all workers on a host.
+
+    Keys hash onto a fixed array of counters, so two keys may share one; that
+    only costs the other key an extra miss. Bumps lock their counter with an
+    fcntl byte-range lock; reads take no lock.
+    """
+
+    def __init__(self, path: str, slots: int = 65536):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * COUNTER.size
+        if os.fstat(self._fd).st_size != size:
+            # Only resets after a layout change; a lost generation is just a miss
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    def _offset(self, key: str) -> int:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % self.slots * COUNTER.size
+
+    def get(self, key: str) -> int:
+        return COUNTER.unpack_from(self._map, self._offset(key))[0]
+
+    def bump(self, key: str):
+        offset = self._offset(key)
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, COUNTER.size, offset)
+            try:
+                COUNTER.pack_into(self._map, offset, COUNTER.unpack_from(self._map, offset)[0] + 1)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, COUNTER.size, offset)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+class InMemoryBackend:
+    """Process-local LRU store with per-entry expiry.
+
+    With generations (a SharedGenerations) an invalidation in any worker is
+    visible to all; without, only to this process.
+    """
+    shared = False
+
+    def __init__(self, max_entries: int = 10000, generations: Optional[SharedGenerations] = None):
+        self.max_entries = max_entries
+        self.shared_generations = generations
+        self._entries = OrderedDict()
+        self._generations = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def generation(self, key: str) -> int:
+        if self.shared_generations:
+            return self.shared_generations.get(key)
+        return self._generations.get(key, 0)
+
+    async def bump_generation(self, key: str):
+        if self.shared_generations:
+            self.shared_generations.bump(key)
+            return
+        self._generations[key] = self._generations.get(key, 0) + 1
+        # Generations only need to outlive in-flight loads, so keep them bounded
+        if len(self._generations) > self.max_entries * 2:
+            self._generations.clear()
+
+
+class RedisBackend:
+    """Store backed by a Redis-compatible server, shared across workers"""
+    shared = True
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        await self._redis.set(key, value, ex=ttl)
+
+    async def delete(self, key: str):
+        await self._redis.delete(key)
+
+    async def generation(self, key: str) -> int:
+        value = await self._redis.get(f"{key}:gen")
+        return int(value) if value else 0
+
+    async def bump_generation(self, key: str):
+        await self._redis.incr(f"{key}:gen")
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class ListCache:
+    """Per-user read-through cache of serialized list responses"""
+
+    def __init__(self, backend, ttl: int = 300, namespace: str = "listcache"):
+        self.backend = backend
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def _key(self, collection: str, user_id: str) -> str:
+        return f"{self.namespace}:{collection}:{user_id}"
+
+    async def get_or_load(
+        self, collection: str, user_id: str, loader: Callable[[], Awaitable[bytes]]
+    ) -> Tuple[bytes, str]:
+        """Return (body, etag) for a user's list, calling loader on a miss"""
+        key = self._key(collection, user_id)
+        # Entries of a backend not shared between workers are only valid at
+        # the generation they were loaded at, which other workers may bump
+        current = b""
+        if not self.backend.shared:
+            current = str(await self.backend.generation(key)).encode()
+        cached = await self.backend.get(key)
+        if cached is not None:
+            stored, _, cached = cached.partition(b"\n")
+            if stored == current:
+                CACHE_REQUESTS.inc('user_lists', 'hit')
+                etag, _, body = cached.partition(b"\n")
+                return body, etag.decode()
+
+        CACHE_REQUESTS.inc('user_lists', 'miss')
+        # An invalidation racing with the load bumps the generation, in which
+        # case the (possibly stale) result is returned but not stored
+        generation = await self.backend.generation(key)
+        with timed('mongo', f'{collection}.find'):
+            body = await loader()
+        etag = make_etag(body)
+        if await self.backend.generation(key) == generation:
+            await self.backend.set(key, current + b"\n" + etag.encode() + b"\n" + body, self.ttl)
+        return body, etag
+
+    async def invalidate(self, collection: str, user_id: str):
+        key = self._key(collection, user_id)
+        await self.backend.bump_generation(key)
+        await self.backend.delete(key)
+
+
+def create_list_cache() -> ListCache:
+    """Build the list cache from environment configuration"""
+    ttl = int(os.environ.get('LIST_CACHE_TTL', '300'))
+    redis_url = os.environ.get('REDIS_URL')
+    if redis_url:
+        try:
+            return ListCache(RedisBackend(redis_url), ttl=ttl)
+        except ImportError:
+            logger.warning("REDIS_URL is set but the redis package is not installed; using in-process cache")
+    max_entries = int(os.environ.get('LIST_CACHE_MAX_ENTRIES', '10000'))
+    shm_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    path = os.environ.get('LIST_CACHE_GENERATIONS_PATH', os.path.join(shm_dir, 'planetarium-list-generations.bin'))
+    try:
+        generations = SharedGenerations(path)
+    except OSError as e:
+        logger.warning(f"Could not open list cache generations at {path}: {str(e)}; "
+                       "invalidations will not reach other workers")
+        generations = None
+    return ListCache(InMemoryBackend(max_entries=max_entries, generations=generations), ttl=ttl)
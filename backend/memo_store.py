@@ -0,0 +1,205 @@
+"""Persistent memo store for deterministic computations.
+
+Eclipse searches, almanac events and pass predictions depend only on their
+inputs and on the data behind them (ephemeris file, library versions), so
+their results can outlive the process. ``memoize`` wraps such a function and
+keeps its JSON results in a SQLite file, keyed by a hash of:
+
+* the function name and a hash of its bytecode, so a changed function
+  does not serve results computed by its previous code;
+* its arguments in canonical form (Pydantic models as JSON-mode dumps, dict
+  keys sorted, datetimes as ISO strings), so equal inputs share an entry;
+* a version string from a callable given to the decorator (e.g. the
+  ephemeris file and library versions). TLEs passed as arguments are part
+  of the key already, so a refreshed element set is simply a new key.
+
+Rows stored by an earlier code hash or version of a function are deleted the
+first time a worker stores a result for its current one. The file runs in WAL mode, so readers
+in every worker proceed while one writes; writers wait on SQLite's busy
+timeout. Past the size limit the least recently used rows are evicted. Any
+SQLite error just makes the call compute as if nothing was stored.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, datetime
+from typing import Callable, Optional
+
+from pydantic import BaseModel
+
+from metrics import CACHE_REQUESTS, timed
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memo (
+    key TEXT PRIMARY KEY,
+    function TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS memo_last_used ON memo (last_used);
+CREATE INDEX IF NOT EXISTS memo_function ON memo (function, version);
+"""
+# Check the total size after this many writes per worker
+TRIM_EVERY = 32
+# Trim down to this share of the limit, so trims do not run on every write
+TRIM_TARGET = 0.9
+# Reads only refresh last_used when it is older than this (seconds), to avoid a write per hit
+TOUCH_INTERVAL = 3600
+
+
+def canonical(value):
+    """JSON-compatible form of an argument that is equal for equal inputs"""
+    if isinstance(value, BaseModel):
+        return canonical(value.model_dump(mode='json'))
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(canonical(v) for v in value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Cannot memoize an argument of type {type(value).__name__}")
+
+
+def code_hash(func) -> str:
+    code = func.__code__
+    return hashlib.blake2b(code.co_code + repr(code.co_consts).encode(), digest_size=8).hexdigest()
+
+
+class MemoStore:
+    def __init__(self, path: str, max_bytes: int, max_value_bytes: int, busy_timeout: float = 5.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_value_bytes = max_value_bytes
+        self.busy_timeout = busy_timeout
+        self.enabled = max_bytes > 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._purged = set()
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened (and the schema created) on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Stored JSON for key, or None"""
+        connection = self._connection()
+        row = connection.execute('SELECT value, last_used FROM memo WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, last_used = row
+        now = time.time()
+        if now - last_used > TOUCH_INTERVAL:
+            connection.execute('UPDATE memo SET last_used = ? WHERE key = ?', (now, key))
+        return zlib.decompress(value)
+
+    def set(self, key: str, function: str, version: str, value: bytes) -> bool:
+        """Store JSON for key; False if it is larger than max_value_bytes"""
+        compressed = zlib.compress(value)
+        if len(compressed) > self.max_value_bytes:
+            return False
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO memo (key, function, version, value, size, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+            (key, function, version, compressed, len(compressed), time.time()),
+        )
+        with self._lock:
+            purge = (function, version) not in self._purged
+            self._purged.add((function, version))
+            self._writes += 1
+            trim = self._writes % TRIM_EVERY == 0
+        if purge:
+            self.purge(function, version)
+        if trim:
+            self.trim()
+        return True
+
+    def purge(self, function: str, version: str):
+        """Delete rows stored under the same name by any other code hash or version"""
+        name = function.rpartition(':')[0]
+        # Every "name:<hash>" sorts between "name:" and "name;" (':' + 1), which the index serves
+        self._connection().execute(
+            'DELETE FROM memo WHERE function >= ? AND function < ? AND (function != ? OR version != ?)',
+            (f'{name}:', f'{name};', function, version),
+        )
+
+    def trim(self):
+        """Evict the least recently used rows until the store is under its target size"""
+        connection = self._connection()
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM memo').fetchone()[0]
+        excess = total - int(self.max_bytes * TRIM_TARGET)
+        if total <= self.max_bytes or excess <= 0:
+            return
+        victims = []
+        for key, size in connection.execute('SELECT key, size FROM memo ORDER BY last_used'):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany('DELETE FROM memo WHERE key = ?', victims)
+
+    def memoize(self, name: str, version: Optional[Callable[[], str]] = None):
+        """Decorator storing a function's JSON-serialisable results across restarts"""
+        def decorator(func):
+            if not self.enabled:
+                return func
+            function = f"{name}:{code_hash(func)}"
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                current = version() if version else ''
+                canonical_call = json.dumps(
+                    [function, current, canonical(args), canonical(kwargs)], separators=(',', ':')
+                )
+                key = hashlib.blake2b(canonical_call.encode(), digest_size=16).hexdigest()
+                try:
+                    with timed('memo', f'{name}.get'):
+                        stored = self.get(key)
+                except sqlite3.Error as e:
+                    logger.warning(f"Memo store read failed for {name}: {str(e)}")
+                    stored = None
+                if stored is not None:
+                    CACHE_REQUESTS.inc('memo_store', 'hit')
+                    return json.loads(stored)
+                CACHE_REQUESTS.inc('memo_store', 'miss')
+
+                result = func(*args, **kwargs)
+                try:
+                    with timed('memo', f'{name}.set'):
+                        self.set(key, function, current, json.dumps(result).encode())
+                except sqlite3.Error as e:
+                    logger.warning(f"Memo store write failed for {name}: {str(e)}")
+                return result
+            return wrapper
+        return decorator
+
+
+def create_memo_store() -> MemoStore:
+    """Build the memo store from environment configuration; MEMO_STORE_MB=0 disables it"""
+    default_path = os.path.join(os.environ.get('SKYFIELD_DATA_DIR', '.'), 'memo.sqlite3')
+    return MemoStore(
+        path=os.environ.get('MEMO_STORE_PATH', default_path),
+        max_bytes=int(os.environ.get('MEMO_STORE_MB', '256')) * 1024 * 1024,
+        max_value_bytes=int(os.environ.get('MEMO_STORE_VALUE_KB', '1024')) * 1024,
+    )
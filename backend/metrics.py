@@ -0,0 +1,221 @@
+"""Prometheus text-format metrics for the API.
+
+A small in-process registry (counters, histograms and callback gauges) plus:
+
+- ``MetricsMiddleware``: latency histogram and request counter per route
+  template, method and status.
+- ``timed(kind, name)``: context manager recording how long a section spent in
+  ``compute`` (ephemeris/propagation), ``mongo``, ``upstream`` HTTP or the
+  on-disk ``memo`` store.
+- ``CACHE_REQUESTS``: hits and misses per named cache.
+
+Each worker process exposes its own numbers; Prometheus aggregates across
+workers by scraping each one.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        items = self.snapshot().items()
+        for labels, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                label_text = _format_labels(self.labelnames, labels, ('le', _format_value(bound)))
+                yield f'{self.name}_bucket{label_text} {cumulative}'
+            label_text = _format_labels(self.labelnames, labels, ('le', '+Inf'))
+            yield f'{self.name}_bucket{label_text} {series[-1]}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-2])}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}'
+
+
+class CallbackGauge:
+    """Gauge whose value(s) are read from a callback at scrape time"""
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} gauge'
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    'planetarium_request_duration_seconds',
+    'HTTP request latency by route',
+    ('method', 'route'),
+))
+REQUESTS = REGISTRY.register(Counter(
+    'planetarium_requests_total',
+    'HTTP requests by route and status',
+    ('method', 'route', 'status'),
+))
+SECTION_LATENCY = REGISTRY.register(Histogram(
+    'planetarium_section_duration_seconds',
+    'Time spent in compute, mongo and upstream sections',
+    ('kind', 'name'),
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'planetarium_cache_requests_total',
+    'Cache lookups by cache and result (hit or miss)',
+    ('cache', 'result'),
+))
+CACHE_REJECTED = REGISTRY.register(Counter(
+    'planetarium_cache_rejected_total',
+    'Values too large for their cache slot and therefore not cached, by cache and job',
+    ('cache', 'job'),
+))
+
+
+def _cache_hit_ratios():
+    lookups = {}
+    for (cache, result), value in CACHE_REQUESTS.snapshot().items():
+        hits, total = lookups.get(cache, (0, 0))
+        lookups[cache] = (hits + (value if result == 'hit' else 0), total + value)
+    return {(cache,): hits / total for cache, (hits, total) in lookups.items() if total}
+
+
+REGISTRY.register(CallbackGauge(
+    'planetarium_cache_hit_ratio',
+    'Fraction of cache lookups served from cache since startup',
+    _cache_hit_ratios,
+    ('cache',),
+))
+
+
+@contextmanager
+def timed(kind: str, name: str):
+    """Record the duration of a block under a kind (compute/mongo/upstream/memo) and name"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SECTION_LATENCY.observe(time.perf_counter() - start, kind, name)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Routing stores the matched route on the (shared) scope
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            method = scope.get('method', '')
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method, route_path)
+            REQUESTS.inc(method, route_path, str(status))
@@ -0,0 +1,161 @@
+"""One-off migration of stored documents to the current storage model.
+
+- custom_constellations: typed star records (unknown keys dropped), lines that
+  reference missing stars removed, oversized figures truncated to the model
+  limits, and ISO-string ``created_at`` values converted to native dates.
+- stargazing_events: ISO-string ``created_at`` values converted to native dates.
+- both: missing or unparsable ``created_at`` values set to the document's
+  ObjectId generation time.
+- both: ``seq`` and ``updated_at`` stamped on documents written before delta
+  sync, so the first sync of every client picks them up.
+
+Safe to run repeatedly; documents already in the current shape are skipped.
+Documents that cannot be coerced (e.g. without a user_id) are logged and left
+as they are.
+
+    python migrate.py [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import UpdateOne
+
+import server
+from server import (
+    CustomConstellation,
+    MAX_CONSTELLATION_LINES,
+    MAX_CONSTELLATION_STARS,
+)
+from sync_feed import SYNC_FIELDS, create_sync_feed
+
+logger = logging.getLogger('migrate')
+
+BATCH_SIZE = 500
+
+
+def parse_created_at(value, _id=None):
+    """Native created_at; missing or unparsable values fall back to the ObjectId's generation time"""
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            value = None
+    if value is None and isinstance(_id, ObjectId):
+        return _id.generation_time
+    return value
+
+
+def as_float(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def normalise_constellation(doc: dict, _id=None) -> dict:
+    """Coerce a legacy constellation document into the validated model"""
+    doc = dict(doc, created_at=parse_created_at(doc.get('created_at'), _id))
+    try:
+        return CustomConstellation.model_validate(doc).to_document()
+    except ValidationError:
+        pass
+
+    stars = []
+    for star in doc.get('stars', [])[:MAX_CONSTELLATION_STARS]:
+        star = star if isinstance(star, dict) else {}
+        stars.append({
+            'x': as_float(star.get('x'), None),
+            'y': as_float(star.get('y'), None),
+            'ra': min(max(as_float(star.get('ra'), 0.0), 0.0), 360.0),
+            'dec': min(max(as_float(star.get('dec'), 0.0), -90.0), 90.0),
+            'name': str(star['name'])[:64] if star.get('name') is not None else None,
+        })
+    lines = [
+        line for line in doc.get('lines', [])
+        if isinstance(line, (list, tuple)) and len(line) == 2
+        and all(isinstance(i, int) and 0 <= i < len(stars) for i in line)
+        and line[0] != line[1]
+    ][:MAX_CONSTELLATION_LINES]
+    doc.update(name=str(doc.get('name', ''))[:100], stars=stars, lines=lines)
+    logger.warning(f"Constellation {doc.get('id')} did not validate and was normalised")
+    return CustomConstellation.model_validate(doc).to_document()
+
+
+async def migrate_constellations(dry_run: bool) -> int:
+    updated = 0
+    batch = []
+    async for doc in server.db.custom_constellations.find({}):
+        _id = doc.pop('_id')
+        try:
+            migrated = normalise_constellation(doc, _id)
+        except ValidationError as e:
+            logger.error(f"Skipping constellation {doc.get('id', _id)}: {str(e)}")
+            continue
+        if migrated != {k: v for k, v in doc.items() if k not in SYNC_FIELDS}:
+            batch.append(UpdateOne({'_id': _id}, {'$set': migrated}))
+        if len(batch) >= BATCH_SIZE:
+            updated += await flush(server.db.custom_constellations, batch, dry_run)
+            batch = []
+    return updated + await flush(server.db.custom_constellations, batch, dry_run)
+
+
+async def migrate_event_dates(dry_run: bool) -> int:
+    updated = 0
+    batch = []
+    query = {'$or': [{'created_at': {'$type': 'string'}}, {'created_at': None}]}
+    async for doc in server.db.stargazing_events.find(query, {'created_at': 1}):
+        created_at = parse_created_at(doc.get('created_at'), doc['_id'])
+        if not isinstance(created_at, datetime):
+            logger.error(f"Skipping stargazing event {doc['_id']}: no usable created_at")
+            continue
+        batch.append(UpdateOne({'_id': doc['_id']}, {'$set': {'created_at': created_at}}))
+        if len(batch) >= BATCH_SIZE:
+            updated += await flush(server.db.stargazing_events, batch, dry_run)
+            batch = []
+    return updated + await flush(server.db.stargazing_events, batch, dry_run)
+
+
+async def stamp_unsynced(sync_feed, collection, dry_run: bool) -> int:
+    updated = 0
+    batch = []
+    async for doc in collection.find({'seq': {'$exists': False}}, {'user_id': 1}):
+        if not isinstance(doc.get('user_id'), str):
+            logger.error(f"Skipping {collection.name} {doc['_id']}: no user_id to sync under")
+            continue
+        stamp = {'seq': None} if dry_run else await sync_feed.stamp(doc['user_id'])
+        batch.append(UpdateOne({'_id': doc['_id']}, {'$set': stamp}))
+        if len(batch) >= BATCH_SIZE:
+            updated += await flush(collection, batch, dry_run)
+            batch = []
+    return updated + await flush(collection, batch, dry_run)
+
+
+async def flush(collection, batch, dry_run: bool) -> int:
+    if batch and not dry_run:
+        await collection.bulk_write(batch, ordered=False)
+    return len(batch)
+
+
+async def main(dry_run: bool):
+    constellations = await migrate_constellations(dry_run)
+    events = await migrate_event_dates(dry_run)
+    sync_feed = create_sync_feed(server.db)
+    stamped = 0
+    for name in sync_feed.collections.values():
+        stamped += await stamp_unsynced(sync_feed, server.db[name], dry_run)
+    action = 'Would update' if dry_run else 'Updated'
+    logger.info(f"{action} {constellations} constellations and {events} stargazing events")
+    logger.info(f"{action} sync fields of {stamped} documents")
+    server.client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help='report changes without writing them')
+    args = parser.parse_args()
+    server.connect_mongo()
+    asyncio.run(main(args.dry_run))
@@ -0,0 +1,55 @@
+"""Vectorised SGP4 propagation shared by the satellite endpoints.
+
+Skyfield's EarthSatellite is convenient for one object at a time, but
+catalogue-wide work (conjunction screening, sky snapshots) needs every object
+propagated over a common time grid in one call. These helpers wrap sgp4's
+SatrecArray for that. Positions are TEME kilometres and velocities TEME km/s;
+objects whose propagation fails (decayed, bad elements) come back as NaN.
+"""
+from datetime import datetime, timezone
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from sgp4.api import Satrec, SatrecArray
+
+UNIX_EPOCH_JD = 2440587.5
+SECONDS_PER_DAY = 86400.0
+
+
+def parse_tles(tles: Sequence[Tuple[str, str, str]]) -> Tuple[List[str], List[Satrec]]:
+    """Parse (name, line1, line2) triples into names and Satrec records"""
+    names, satrecs = [], []
+    for name, line1, line2 in tles:
+        names.append(name)
+        satrecs.append(Satrec.twoline2rv(line1, line2))
+    return names, satrecs
+
+
+def time_grid(start: datetime, offsets_seconds) -> Tuple[np.ndarray, np.ndarray]:
+    """Split start + offsets into the (jd, fraction) pairs SGP4 expects"""
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    unix = start.timestamp() + np.asarray(offsets_seconds, dtype=float)
+    days = np.floor(unix / SECONDS_PER_DAY)
+    return UNIX_EPOCH_JD + days, (unix - days * SECONDS_PER_DAY) / SECONDS_PER_DAY
+
+
+def propagate(satrecs: Sequence[Satrec], jd: np.ndarray, fr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions and velocities of every satellite at every time, shaped (n, t, 3)"""
+    errors, positions, velocities = SatrecArray(list(satrecs)).sgp4(jd, fr)
+    failed = errors != 0
+    positions[failed] = np.nan
+    velocities[failed] = np.nan
+    return positions, velocities
+
+
+def propagate_one(satrec: Satrec, start: datetime, offset_seconds: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Position and velocity of one satellite at start + offset"""
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    unix = start.timestamp() + offset_seconds
+    days = unix // SECONDS_PER_DAY
+    error, position, velocity = satrec.sgp4(UNIX_EPOCH_JD + days, (unix - days * SECONDS_PER_DAY) / SECONDS_PER_DAY)
+    if error:
+        return np.full(3, np.nan), np.full(3, np.nan)
+    return np.array(position), np.array(velocity)
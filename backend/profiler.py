@@ -0,0 +1,211 @@
+"""Opt-in sampling profiler for live requests.
+
+A request is profiled when it is picked by the sample rate, its path starts
+with one of the configured prefixes, or it carries an ``X-Profile`` header
+equal to the admin token. While profiled requests are in flight, a
+background thread wakes every few milliseconds and records the Python stack
+of every thread working on one:
+
+* the event loop thread, when the task it is running is a profiled request
+  (uvicorn runs each request in its own task);
+* compute pool threads, while they run a job submitted by a profiled request
+  (the executor carries the request's context into the job).
+
+Stacks are folded (``root;...;leaf``, the input format of flamegraph.pl and
+speedscope) and counted per route, with a cap on distinct stacks per route,
+so memory stays bounded however long it runs. With nothing configured the
+middleware is a single attribute check and no thread is started.
+"""
+import asyncio
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+PROFILED_REQUEST: ContextVar[Optional['ProfiledRequest']] = ContextVar('profiled_request', default=None)
+OTHER_STACKS = '[other stacks]'
+
+
+class ProfiledRequest:
+    __slots__ = ('scope', 'stacks')
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.stacks = Counter()
+
+
+class SamplingProfiler:
+    def __init__(self, sample_rate: float, paths, token: str, interval: float, max_depth: int, max_stacks: int):
+        self.sample_rate = sample_rate
+        self.paths = tuple(paths)
+        self.token = token
+        self.interval = interval
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self.enabled = sample_rate > 0 or bool(self.paths) or bool(token)
+        self._tasks: Dict[asyncio.Task, ProfiledRequest] = {}
+        self._threads: Dict[int, ProfiledRequest] = {}
+        self._routes: Dict[str, dict] = {}
+        self._loop = None
+        self._loop_thread = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._sampler = None
+
+    def check_token(self, token: Optional[str]) -> bool:
+        return bool(self.token) and token is not None and hmac.compare_digest(token, self.token)
+
+    def should_sample(self, scope) -> bool:
+        if self.paths and scope['path'].startswith(self.paths):
+            return True
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if self.token:
+            for name, value in scope['headers']:
+                if name == b'x-profile':
+                    return self.check_token(value.decode('latin-1'))
+        return False
+
+    def begin(self, scope) -> ProfiledRequest:
+        """Start sampling the current request (call from its task)"""
+        request = ProfiledRequest(scope)
+        with self._lock:
+            if self._sampler is None:
+                self._loop = asyncio.get_running_loop()
+                self._loop_thread = threading.get_ident()
+                self._sampler = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._sampler.start()
+            self._tasks[asyncio.current_task()] = request
+        PROFILED_REQUEST.set(request)
+        self._wakeup.set()
+        return request
+
+    def end(self, request: ProfiledRequest):
+        """Stop sampling a request and fold its stacks into its route's profile"""
+        with self._lock:
+            self._tasks.pop(asyncio.current_task(), None)
+            route = getattr(request.scope.get('route'), 'path', None) or 'unmatched'
+            key = f"{request.scope.get('method', '')} {route}"
+            profile = self._routes.setdefault(key, {'requests': 0, 'samples': 0, 'stacks': Counter()})
+            profile['requests'] += 1
+            stacks = profile['stacks']
+            for stack, count in request.stacks.items():
+                profile['samples'] += count
+                if stack in stacks or len(stacks) < self.max_stacks:
+                    stacks[stack] += count
+                else:
+                    stacks[OTHER_STACKS] += count
+
+    @contextmanager
+    def attach(self, context):
+        """Attribute the current thread's work to the profiled request in context, if any"""
+        request = context.get(PROFILED_REQUEST) if self.enabled else None
+        if request is None:
+            yield
+            return
+        thread = threading.get_ident()
+        with self._lock:
+            self._threads[thread] = request
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads.pop(thread, None)
+
+    def _run(self):
+        current_tasks = getattr(asyncio.tasks, '_current_tasks', {})
+        while True:
+            with self._lock:
+                targets = dict(self._threads)
+                loop_request = self._tasks.get(current_tasks.get(self._loop)) if self._tasks else None
+                idle = not self._tasks and not self._threads
+            if idle:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            if loop_request is not None:
+                targets[self._loop_thread] = loop_request
+            if targets:
+                frames = sys._current_frames()
+                for thread, request in targets.items():
+                    frame = frames.get(thread)
+                    if frame is not None:
+                        request.stacks[self._fold(frame, 'event-loop' if thread == self._loop_thread else 'compute')] += 1
+            time.sleep(self.interval)
+
+    def _fold(self, frame, root: str) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if frame is not None:
+            names.append('...')
+        names.append(root)
+        return ';'.join(reversed(names))
+
+    def profiles(self, top: int = 20) -> dict:
+        """Per-route request and sample counts with the most frequent stacks"""
+        with self._lock:
+            return {
+                route: {
+                    'requests': profile['requests'],
+                    'samples': profile['samples'],
+                    'top_stacks': [{'stack': stack, 'samples': count}
+                                   for stack, count in profile['stacks'].most_common(top)],
+                }
+                for route, profile in self._routes.items()
+            }
+
+    def folded(self, route: Optional[str] = None) -> str:
+        """Folded stacks (one "stack count" line each) for one route or all of them"""
+        with self._lock:
+            totals = Counter()
+            for key, profile in self._routes.items():
+                if route is None or key == route:
+                    totals.update(profile['stacks'])
+        return ''.join(f"{stack} {count}\n" for stack, count in totals.most_common())
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that samples the stacks of selected requests"""
+
+    def __init__(self, app, profiler: Optional[SamplingProfiler] = None):
+        self.app = app
+        self.profiler = profiler or sampling_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.profiler.enabled or not self.profiler.should_sample(scope):
+            await self.app(scope, receive, send)
+            return
+        request = self.profiler.begin(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.end(request)
+
+
+def create_sampling_profiler() -> SamplingProfiler:
+    """Build the profiler from environment configuration; disabled unless something is set"""
+    paths = [path for path in os.environ.get('PROFILER_PATHS', '').split(',') if path]
+    return SamplingProfiler(
+        sample_rate=float(os.environ.get('PROFILER_SAMPLE_RATE', '0')),
+        paths=paths,
+        token=os.environ.get('PROFILER_TOKEN', ''),
+        interval=float(os.environ.get('PROFILER_INTERVAL_MS', '5')) / 1000,
+        max_depth=int(os.environ.get('PROFILER_MAX_DEPTH', '64')),
+        max_stacks=int(os.environ.get('PROFILER_MAX_STACKS', '2000')),
+    )
+
+
+sampling_profiler = create_sampling_profiler()
@@ -0,0 +1,268 @@
+"""Reminder scheduling for stargazing events.
+
+Events with ``reminder_enabled`` carry a ``next_fire_at`` field backed by an
+index. The scheduler keeps only the next batch of due reminders in a heap,
+sleeps until the earliest one (or until a newly created reminder is earlier),
+and claims each reminder atomically in MongoDB before dispatching it, so
+several workers can run schedulers against the same collection and restarts
+lose nothing.
+
+Delivery is at-least-once: a claim pushes ``next_fire_at`` forward by a lease,
+and only a successful dispatch clears it. A worker dying mid-dispatch leaves
+the reminder to fire again when the lease expires.
+"""
+import asyncio
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def utc(dt: datetime) -> datetime:
+    """MongoDB returns naive UTC datetimes; make them comparable with aware ones"""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def utc_now() -> datetime:
+    """Current time at BSON (millisecond) precision, so it round-trips exactly"""
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def compute_fire_time(date: str, time: str, lead: timedelta, tz: Optional[str] = None) -> Optional[datetime]:
+    """UTC fire time for an event's date/time strings, or None if unparsable.
+
+    The strings are wall-clock time in the IANA zone tz (UTC if omitted),
+    unless time carries its own offset.
+    """
+    try:
+        event_time = datetime.fromisoformat(f"{date}T{time}".replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if event_time.tzinfo is None:
+        event_time = event_time.replace(tzinfo=ZoneInfo(tz) if tz else timezone.utc)
+    fire_at = event_time.astimezone(timezone.utc) - lead
+    return fire_at.replace(microsecond=fire_at.microsecond // 1000 * 1000)
+
+
+# Sinks
+class LocalQueueSink:
+    """Hand reminders to an in-process consumer through a bounded queue
+
+    ``consume`` must be running for reminders to leave the queue. A full
+    queue fails the send, so the scheduler's lease and retry path keeps the
+    reminder instead of marking it sent.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    async def send(self, reminder: dict):
+        # QueueFull propagates: the reminder is retried, not dropped
+        self.queue.put_nowait(reminder)
+
+    async def consume(self):
+        """Drain the queue, logging each reminder; run as a background task"""
+        while True:
+            reminder = await self.queue.get()
+            logger.info(f"Reminder due for event {reminder['event_id']}: {reminder['title']}")
+            self.queue.task_done()
+
+
+class WebhookSink:
+    """POST each reminder as JSON to a webhook URL"""
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    async def send(self, reminder: dict):
+        response = await asyncio.to_thread(
+            requests.post, self.url, json=reminder, timeout=self.timeout
+        )
+        response.raise_for_status()
+
+
+class ReminderScheduler:
+    """Fires due reminders from the stargazing_events collection"""
+
+    def __init__(
+        self,
+        collection,
+        sink,
+        batch_size: int = 500,
+        horizon: timedelta = timedelta(hours=1),
+        lease: timedelta = timedelta(minutes=5),
+        max_attempts: int = 5,
+        max_concurrent: int = 20,
+    ):
+        self.collection = collection
+        self.sink = sink
+        self.batch_size = batch_size
+        self.horizon = horizon
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._dispatch_slots = asyncio.Semaphore(max_concurrent)
+        self._heap = []
+        self._queued_ids = set()
+        # Every reminder due before this instant is either in the heap or
+        # was added after the last refill and will be seen by notify()
+        self._loaded_until = None
+        self._in_flight = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._consumer = None
+        self._dispatches = set()
+
+    async def ensure_indexes(self):
+        await self.collection.create_index('next_fire_at', sparse=True)
+
+    def start(self):
+        if isinstance(self.sink, LocalQueueSink):
+            self._consumer = asyncio.create_task(self.sink.consume())
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._consumer):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        for task in list(self._dispatches):
+            task.cancel()
+
+    def notify(self, event_id: str, fire_at: datetime):
+        """Tell the scheduler about a reminder created or moved in this process"""
+        if self._loaded_until is None or fire_at >= self._loaded_until:
+            return  # The next refill picks it up from MongoDB
+        if len(self._heap) >= self.batch_size:
+            # Heap is full: shrink the loaded window so a refill happens first
+            self._loaded_until = fire_at
+        elif event_id not in self._queued_ids:
+            heapq.heappush(self._heap, (fire_at, event_id))
+            self._queued_ids.add(event_id)
+        self._wakeup.set()
+
+    async def _refill(self, now: datetime):
+        horizon_end = now + self.horizon
+        docs = await self.collection.find(
+            {'next_fire_at': {'$lte': horizon_end}},
+            {'_id': 0, 'id': 1, 'next_fire_at': 1},
+        ).sort('next_fire_at', 1).limit(self.batch_size).to_list(self.batch_size)
+
+        self._heap = [
+            (utc(doc['next_fire_at']), doc['id'])
+            for doc in docs if doc['id'] not in self._in_flight
+        ]
+        heapq.heapify(self._heap)
+        self._queued_ids = {event_id for _, event_id in self._heap}
+        if len(docs) == self.batch_size:
+            # More reminders may share the last fire time; reload from there
+            self._loaded_until = utc(docs[-1]['next_fire_at'])
+        else:
+            self._loaded_until = horizon_end
+
+    async def _run(self):
+        while True:
+            try:
+                # Cleared before looking at the heap so a notify() that lands
+                # while we work still wakes the next wait immediately
+                self._wakeup.clear()
+                now = utc_now()
+                if self._loaded_until is None or now >= self._loaded_until or not self._heap:
+                    await self._refill(now)
+
+                while self._heap and self._heap[0][0] <= now:
+                    fire_at, event_id = heapq.heappop(self._heap)
+                    self._queued_ids.discard(event_id)
+                    await self._dispatch_slots.acquire()
+                    self._in_flight.add(event_id)
+                    task = asyncio.create_task(self._fire(event_id, fire_at))
+                    self._dispatches.add(task)
+                    task.add_done_callback(self._dispatches.discard)
+
+                wake_at = self._loaded_until
+                if self._heap:
+                    wake_at = min(wake_at, self._heap[0][0])
+                timeout = max((wake_at - utc_now()).total_seconds(), 0.01)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reminder scheduler error: {str(e)}")
+                self._loaded_until = None
+                await asyncio.sleep(5)
+
+    async def _fire(self, event_id: str, fire_at: datetime):
+        try:
+            now = utc_now()
+            # Claim by pushing next_fire_at forward; a concurrent worker, an
+            # earlier lease, or a deleted event makes the match fail
+            event = await self.collection.find_one_and_update(
+                {'id': event_id, 'next_fire_at': fire_at},
+                {'$set': {'next_fire_at': now + self.lease}, '$inc': {'reminder_attempts': 1}},
+                projection={'_id': 0},
+            )
+            if event is None:
+                return
+
+            reminder = {
+                'event_id': event['id'],
+                'user_id': event['user_id'],
+                'title': event['title'],
+                'event_type': event['event_type'],
+                'date': event['date'],
+                'time': event['time'],
+                'tz': event.get('tz'),
+                'location': event.get('location'),
+                'description': event['description'],
+                'fire_at': fire_at.isoformat(),
+            }
+            try:
+                await self.sink.send(reminder)
+            except Exception as e:
+                attempts = event.get('reminder_attempts', 0) + 1
+                if attempts >= self.max_attempts:
+                    logger.error(f"Giving up on reminder for event {event_id}: {str(e)}")
+                    await self.collection.update_one(
+                        {'id': event_id},
+                        {'$unset': {'next_fire_at': ''}, '$set': {'reminder_failed_at': now}},
+                    )
+                else:
+                    retry_at = now + timedelta(seconds=30 * 2 ** attempts)
+                    logger.warning(f"Reminder for event {event_id} failed, retrying at {retry_at}: {str(e)}")
+                    await self.collection.update_one(
+                        {'id': event_id}, {'$set': {'next_fire_at': retry_at}}
+                    )
+                    self.notify(event_id, retry_at)
+                return
+
+            await self.collection.update_one(
+                {'id': event_id},
+                {'$unset': {'next_fire_at': '', 'reminder_attempts': ''}, '$set': {'reminder_sent_at': now}},
+            )
+        finally:
+            self._in_flight.discard(event_id)
+            self._dispatch_slots.release()
+
+
+def create_reminder_scheduler(collection) -> ReminderScheduler:
+    """Build the scheduler and its sink from environment configuration"""
+    webhook_url = os.environ.get('REMINDER_WEBHOOK_URL')
+    sink = WebhookSink(webhook_url) if webhook_url else LocalQueueSink()
+    return ReminderScheduler(
+        collection,
+        sink,
+        batch_size=int(os.environ.get('REMINDER_BATCH_SIZE', '500')),
+    )
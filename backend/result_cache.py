@@ -0,0 +1,161 @@
+"""Result cache shared by all workers on a host.
+
+Computed responses (eclipse lists, passes, planet positions, parsed TLE
+groups) are stored as serialized JSON in a memory-mapped file, by default
+under ``/dev/shm``, so a result computed by one uvicorn worker is served by
+every other worker until its TTL runs out.
+
+The file is a small header followed by ``sets * ways`` fixed-size slots. A
+key hashes to one set, and a write replaces the matching, an expired, or
+else the least recently used slot of that set, which bounds the cache to the
+file size with LRU eviction per set. Slots are large so that big values fit,
+but on tmpfs only the pages actually written take memory.
+
+Every slot starts with a sequence counter (a seqlock): a writer makes it odd
+while rewriting the slot and even again when done. Readers take no lock;
+they copy the slot and discard it if the counter was odd or changed while
+they read. Writers serialise per set with an fcntl byte-range lock (between
+processes) and a threading lock (within one).
+"""
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PLRC0001'
+# magic, sets, ways, slot size
+FILE_HEADER = struct.Struct('<8sIII')
+HEADER_SIZE = 64
+# sequence, key digest, expires at (epoch seconds), last used, length, crc32
+SLOT_HEADER = struct.Struct('<Q16sddII')
+LAST_USED = struct.Struct('<d')
+LAST_USED_OFFSET = 32
+SEQUENCE = struct.Struct('<Q')
+READ_RETRIES = 3
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+class SharedResultCache:
+    """Memory-mapped key/value cache with per-entry TTL, shared across processes"""
+
+    def __init__(self, path: str, sets: int = 256, ways: int = 4, slot_size: int = 65536):
+        self.path = path
+        self.sets = sets
+        self.ways = ways
+        self.slot_size = slot_size
+        self.max_value_size = slot_size - SLOT_HEADER.size
+        self._set_size = ways * slot_size
+        self._size = HEADER_SIZE + sets * self._set_size
+        self._lock = threading.Lock()
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        # Whoever opens the file first (or with a different layout) formats it
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, HEADER_SIZE, 0)
+        try:
+            header = FILE_HEADER.pack(MAGIC, sets, ways, slot_size)
+            if os.pread(self._fd, FILE_HEADER.size, 0) != header or os.fstat(self._fd).st_size != self._size:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self._size)
+                os.pwrite(self._fd, header, 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, HEADER_SIZE, 0)
+        self._map = mmap.mmap(self._fd, self._size)
+
+    def _set_offset(self, digest: bytes) -> int:
+        return HEADER_SIZE + (int.from_bytes(digest[:8], 'little') % self.sets) * self._set_size
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value for key, or None if absent or expired"""
+        digest = _digest(key)
+        base = self._set_offset(digest)
+        now = time.time()
+        for way in range(self.ways):
+            offset = base + way * self.slot_size
+            for _ in range(READ_RETRIES):
+                sequence, slot_digest, expires_at, _, length, crc = SLOT_HEADER.unpack_from(self._map, offset)
+                if sequence & 1:
+                    continue
+                if slot_digest != digest or length > self.max_value_size:
+                    break
+                start = offset + SLOT_HEADER.size
+                value = self._map[start:start + length]
+                if SEQUENCE.unpack_from(self._map, offset)[0] != sequence or zlib.crc32(value) != crc:
+                    continue
+                if expires_at < now:
+                    return None
+                # Recency is advisory, so readers stamp it without locking
+                LAST_USED.pack_into(self._map, offset + LAST_USED_OFFSET, now)
+                return value
+        return None
+
+    def set(self, key: str, value: bytes, ttl: float) -> bool:
+        """Store value under key for ttl seconds; False if it is too large to cache"""
+        if len(value) > self.max_value_size:
+            return False
+        digest = _digest(key)
+        base = self._set_offset(digest)
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._set_size, base)
+            try:
+                now = time.time()
+                offset = self._choose_slot(base, digest, now)
+                sequence = SEQUENCE.unpack_from(self._map, offset)[0]
+                SEQUENCE.pack_into(self._map, offset, sequence + 1)
+                start = offset + SLOT_HEADER.size
+                self._map[start:start + len(value)] = value
+                SLOT_HEADER.pack_into(
+                    self._map, offset, sequence + 1, digest, now + ttl, now, len(value), zlib.crc32(value)
+                )
+                SEQUENCE.pack_into(self._map, offset, sequence + 2)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._set_size, base)
+        return True
+
+    def _choose_slot(self, base: int, digest: bytes, now: float) -> int:
+        """Slot to overwrite: the key's own, else an expired one, else the least recently used"""
+        victim, victim_rank = base, None
+        for way in range(self.ways):
+            offset = base + way * self.slot_size
+            _, slot_digest, expires_at, last_used, _, _ = SLOT_HEADER.unpack_from(self._map, offset)
+            if slot_digest == digest:
+                return offset
+            rank = 0.0 if expires_at < now else last_used
+            if victim_rank is None or rank < victim_rank:
+                victim, victim_rank = offset, rank
+        return victim
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+def create_result_cache() -> Optional[SharedResultCache]:
+    """Build the shared result cache from environment configuration (None if disabled)"""
+    size_mb = int(os.environ.get('RESULT_CACHE_MB', '64'))
+    if size_mb <= 0:
+        return None
+    slot_size = int(os.environ.get('RESULT_CACHE_SLOT_KB', '64')) * 1024
+    ways = 4
+    sets = max(1, size_mb * 1024 * 1024 // (slot_size * ways))
+    shm_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    # The layout is part of the default name, so workers started with a different
+    # configuration during a rolling restart never reformat a file in use
+    default_name = f'planetarium-results-{sets}x{ways}x{slot_size}.cache'
+    path = os.environ.get('RESULT_CACHE_PATH', os.path.join(shm_dir, default_name))
+    try:
+        return SharedResultCache(path, sets=sets, ways=ways, slot_size=slot_size)
+    except OSError as e:
+        logger.warning(f"Could not open result cache at {path}: {str(e)}; results will not be shared")
+        return None
@@ -0,0 +1,354 @@
+"""Server-side satellite catalogue and per-tick sky snapshots.
+
+The catalogue holds every satellite from the CelesTrak groups the API serves,
+parsed once, and is refreshed in the background. Groups overlap (the ISS is
+in both ``stations`` and ``visual``), so entries are keyed by NORAD id and
+remember which groups list them; a refresh only re-parses elements that
+actually changed.
+
+Sky queries ("what is in this patch of sky") run against a snapshot: the
+whole catalogue propagated once to a tick (a time rounded to a few seconds)
+and rotated into the Earth-fixed frame, where an observer does not move. The
+snapshot buckets positions into cubic cells, so a query tests the few
+thousand occupied cells against its cone and then only looks at the
+satellites in cells that can reach it. Those few are re-propagated to the
+exact request time for the final answer, so a snapshot serves every request
+within its tick and many observers at once.
+
+Every refresh is also passed on to the search index (see satellite_search).
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sgp4.api import Satrec
+
+from metrics import CACHE_REQUESTS, timed
+from orbits import propagate, time_grid
+from satellite_search import SatelliteSearchIndex
+from visibility import STANDARD_MAGNITUDES, gmst, norad_id, observer_frame, optical_visibility
+
+CELESTRAK_GROUPS = {
+    'stations': 'https://celestrak.org/NORAD/elements/gp.php?GROUP=stations&FORMAT=tle',
+    'starlink': 'https://celestrak.org/NORAD/elements/gp.php?GROUP=starlink&FORMAT=tle',
+    'gps-ops': 'https://celestrak.org/NORAD/elements/gp.php?GROUP=gps-ops&FORMAT=tle',
+    'galileo': 'https://celestrak.org/NORAD/elements/gp.php?GROUP=galileo&FORMAT=tle',
+    'visual': 'https://celestrak.org/NORAD/elements/gp.php?GROUP=visual&FORMAT=tle',
+}
+EARTH_ROTATION_RAD_S = 7.2921158553e-5
+# Samples along each edge of an RA/Dec box when finding a cone that covers it
+BOX_EDGE_SAMPLES = 65
+BOX_PADDING_DEG = 1.0
+
+
+def parse_tle_text(text: str) -> List[Tuple[str, str, str]]:
+    """(name, line1, line2) triples from three-line TLE text, skipping malformed entries"""
+    lines = [line.strip() for line in text.strip().splitlines()]
+    tles = []
+    i = 0
+    while i + 2 < len(lines):
+        if lines[i + 1].startswith('1 ') and lines[i + 2].startswith('2 '):
+            tles.append((lines[i], lines[i + 1], lines[i + 2]))
+            i += 3
+        else:
+            i += 1
+    return tles
+
+
+def cospar_id(line1: str) -> Optional[str]:
+    """International designator (e.g. 1998-067A) from TLE line 1"""
+    designator = line1[9:17].strip()
+    if len(designator) < 5 or not designator[:2].isdigit():
+        return None
+    year = int(designator[:2])
+    return f"{1900 + year if year >= 57 else 2000 + year}-{designator[2:]}"
+
+
+def earth_fixed(vectors: np.ndarray, theta) -> np.ndarray:
+    """Rotate TEME vectors (..., 3) into the Earth-fixed frame at sidereal angle theta"""
+    cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+    x, y = vectors[..., 0], vectors[..., 1]
+    return np.stack([cos_theta * x + sin_theta * y, cos_theta * y - sin_theta * x, vectors[..., 2]], axis=-1)
+
+
+def unit_vector(ra_deg, dec_deg) -> np.ndarray:
+    ra, dec = np.broadcast_arrays(np.radians(ra_deg), np.radians(dec_deg))
+    return np.stack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)], axis=-1)
+
+
+def box_cone(ra_min: float, ra_max: float, dec_min: float, dec_max: float) -> Tuple[np.ndarray, float]:
+    """Centre (J2000 unit vector) and radius (radians) of a cone covering an RA/Dec box.
+
+    ra_max below ra_min means the box wraps through RA 0.
+    """
+    width = (ra_max - ra_min) % 360 or (360 if ra_max != ra_min else 0)
+    ra = ra_min + np.linspace(0, width, BOX_EDGE_SAMPLES)
+    dec = np.linspace(dec_min, dec_max, BOX_EDGE_SAMPLES)
+    edges = np.concatenate([
+        unit_vector(ra, dec_min), unit_vector(ra, dec_max),
+        unit_vector(ra_min, dec), unit_vector(ra_min + width, dec),
+    ])
+    centre = unit_vector(ra_min + width / 2, (dec_min + dec_max) / 2)
+    radius = np.arccos(np.clip(edges @ centre, -1, 1)).max() + np.radians(BOX_PADDING_DEG)
+    # Past a hemisphere the boundary no longer bounds the box; take the whole sky
+    return centre, (np.pi if radius >= np.pi / 2 else float(radius))
+
+
+def in_ra_range(ra: np.ndarray, ra_min: float, ra_max: float) -> np.ndarray:
+    if ra_min <= ra_max:
+        return (ra >= ra_min) & (ra <= ra_max)
+    return (ra >= ra_min) | (ra <= ra_max)
+
+
+class CatalogEntry:
+    __slots__ = ('norad_id', 'cospar_id', 'name', 'line1', 'line2', 'groups', 'satrec')
+
+    def __init__(self, name: str, line1: str, line2: str):
+        self.norad_id = norad_id(line1)
+        self.cospar_id = cospar_id(line1)
+        self.name = name
+        self.line1 = line1
+        self.line2 = line2
+        self.groups = set()
+        self.satrec = Satrec.twoline2rv(line1, line2)
+
+
+class SkySnapshot:
+    """The catalogue propagated to one instant, bucketed by Earth-fixed position"""
+
+    def __init__(self, when: datetime, entries: Sequence[CatalogEntry], groups: Sequence[frozenset],
+                 cell_km: float):
+        self.time = when
+        jd, fr = time_grid(when, [0.0])
+        positions, velocities = propagate([entry.satrec for entry in entries], jd, fr)
+        theta = gmst(jd, fr)[0]
+        positions = earth_fixed(positions[:, 0], theta)
+        velocities = earth_fixed(velocities[:, 0], theta)
+        # Earth-fixed velocity: the frame itself turns under the satellites
+        velocities[:, 0] += EARTH_ROTATION_RAD_S * positions[:, 1]
+        velocities[:, 1] -= EARTH_ROTATION_RAD_S * positions[:, 0]
+
+        valid = np.flatnonzero(np.isfinite(positions).all(axis=1))
+        self.entries = [entries[i] for i in valid]
+        # Copied under the catalogue lock: refreshes mutate entry.groups in place
+        self.groups = [groups[i] for i in valid]
+        positions, velocities = positions[valid], velocities[valid]
+        self.max_speed = float(np.linalg.norm(velocities, axis=1).max()) if len(valid) else 0.0
+        self.cell_radius = cell_km * np.sqrt(3) / 2
+
+        cells = np.floor(positions / cell_km).astype(np.int64)
+        occupied, members, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+        self.cell_centres = (occupied + 0.5) * cell_km
+        self.cell_members = np.argsort(members.ravel(), kind='stable')
+        self.cell_starts = np.cumsum(counts) - counts
+        self.cell_counts = counts
+
+    def candidates(self, observer: np.ndarray, up: np.ndarray, axis: np.ndarray, radius: float,
+                   drift_seconds: float) -> np.ndarray:
+        """Indices of satellites that may lie within radius (radians) of axis, seen from observer.
+
+        All vectors are Earth-fixed. drift_seconds is how far the query time is
+        from the snapshot, which widens every cell by how far a satellite can
+        have moved since.
+        """
+        if not len(self.entries):
+            return np.empty(0, dtype=np.intp)
+        reach = self.cell_radius + self.max_speed * abs(drift_seconds)
+        offsets = self.cell_centres - observer
+        distance = np.linalg.norm(offsets, axis=1)
+        cos_angle = (offsets @ axis) / np.maximum(distance, 1e-9)
+        angle = np.arccos(np.clip(cos_angle, -1, 1))
+        spread = np.arcsin(np.clip(reach / np.maximum(distance, 1e-9), 0, 1))
+        hit = (distance <= reach) | (angle <= radius + spread)
+        hit &= offsets @ up > -reach
+        cells = np.flatnonzero(hit)
+        counts = self.cell_counts[cells]
+        total = int(counts.sum())
+        runs = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return self.cell_members[np.repeat(self.cell_starts[cells], counts) + runs]
+
+
+class SatelliteCatalog:
+    def __init__(self, snapshot_tick_seconds: float, snapshot_cell_km: float, refresh_seconds: float,
+                 snapshots_kept: int = 8):
+        self.snapshot_tick_seconds = snapshot_tick_seconds
+        self.snapshot_cell_km = snapshot_cell_km
+        self.refresh_seconds = refresh_seconds
+        self.snapshots_kept = snapshots_kept
+        self.version = 0
+        self._entries: Dict[int, CatalogEntry] = {}
+        self._groups: Dict[str, set] = {}
+        self.search_index = SatelliteSearchIndex()
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, norad_ids: Iterable[int]) -> List[Optional[CatalogEntry]]:
+        """Catalogue entries by NORAD id (None for ids not in the catalogue)"""
+        with self._lock:
+            return [self._entries.get(number) for number in norad_ids]
+
+    def group_sizes(self) -> Dict[str, int]:
+        return {group_id: len(members) for group_id, members in self._groups.items()}
+
+    def update_group(self, group_id: str, tles: Iterable[Tuple[str, str, str]]):
+        """Replace a group's membership with fresh TLEs.
+
+        Only new or changed elements are parsed. Returns the entries added or
+        changed and the NORAD ids dropped from the catalogue altogether.
+        """
+        changed, removed = [], []
+        with self._lock:
+            members = set()
+            for name, line1, line2 in tles:
+                number = norad_id(line1)
+                if number is None or number in members:
+                    continue
+                members.add(number)
+                entry = self._entries.get(number)
+                if entry is None or entry.line1 != line1 or entry.line2 != line2 or entry.name != name:
+                    replacement = CatalogEntry(name, line1, line2)
+                    replacement.groups = entry.groups if entry else set()
+                    self._entries[number] = entry = replacement
+                    changed.append(entry)
+                entry.groups.add(group_id)
+
+            for number in self._groups.get(group_id, set()) - members:
+                entry = self._entries[number]
+                entry.groups.discard(group_id)
+                if not entry.groups:
+                    del self._entries[number]
+                    removed.append(number)
+            previous = self._groups.get(group_id)
+            self._groups[group_id] = members
+            if changed or removed or members != previous:
+                self.version += 1
+            self.search_index.update(group_id, members, changed, removed)
+        return changed, removed
+
+    def snapshot(self, when: datetime) -> SkySnapshot:
+        """Snapshot at the tick nearest to when, built on first use"""
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        tick = round(when.timestamp() / self.snapshot_tick_seconds) * self.snapshot_tick_seconds
+        key = (tick, self.version)
+        with self._snapshot_lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+                CACHE_REQUESTS.inc('sky_snapshot', 'hit')
+                return snapshot
+            CACHE_REQUESTS.inc('sky_snapshot', 'miss')
+            with self._lock:
+                entries = list(self._entries.values())
+                groups = [frozenset(entry.groups) for entry in entries]
+            with timed('compute', 'sky_snapshot'):
+                snapshot = SkySnapshot(
+                    datetime.fromtimestamp(tick, timezone.utc), entries, groups, self.snapshot_cell_km,
+                )
+            self._snapshots[key] = snapshot
+            while len(self._snapshots) > self.snapshots_kept:
+                self._snapshots.popitem(last=False)
+            return snapshot
+
+    def sky_patch(
+        self,
+        when: datetime,
+        latitude: float,
+        longitude: float,
+        j2000_to_date: np.ndarray,
+        cone: Optional[Tuple[float, float, float]] = None,
+        box: Optional[Tuple[float, float, float, float]] = None,
+        groups: Optional[Sequence[str]] = None,
+        limit: int = 50,
+    ) -> dict:
+        """Satellites above the horizon inside an alt/az cone or a J2000 RA/Dec box.
+
+        cone is (altitude, azimuth, radius) and box (ra_min, ra_max, dec_min,
+        dec_max), all in degrees. j2000_to_date rotates J2000 vectors onto the
+        equator of date, which stands in for TEME (they differ by the equation
+        of the equinoxes, about a second of RA). Matches come back nearest the
+        centre of the region first.
+        """
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        snapshot = self.snapshot(when)
+        jd, fr = time_grid(when, [0.0])
+        observer, up, east, north = (vector[0] for vector in observer_frame(latitude, longitude, jd, fr))
+        if cone is not None:
+            altitude, azimuth, radius = np.radians(cone)
+            axis = np.cos(altitude) * (np.sin(azimuth) * east + np.cos(azimuth) * north) + np.sin(altitude) * up
+        else:
+            centre, radius = box_cone(*box)
+            axis = j2000_to_date @ centre
+
+        theta = gmst(jd, fr)[0]
+        drift = (when - snapshot.time).total_seconds()
+        indices = snapshot.candidates(
+            earth_fixed(observer, theta), earth_fixed(up, theta), earth_fixed(axis, theta), radius, drift,
+        )
+        if groups:
+            wanted = set(groups)
+            indices = [i for i in indices if snapshot.groups[i] & wanted]
+        entries = [snapshot.entries[i] for i in indices]
+        entry_groups = [snapshot.groups[i] for i in indices]
+
+        result = {'observer_dark': None, 'candidates': len(entries), 'matched': 0, 'satellites': []}
+        if not entries:
+            return result
+        positions, _ = propagate([entry.satrec for entry in entries], jd, fr)
+        magnitudes = [STANDARD_MAGNITUDES.get(entry.norad_id, np.nan) for entry in entries]
+        seen = optical_visibility(positions, jd, fr, latitude, longitude, standard_magnitudes=magnitudes)
+        result['observer_dark'] = bool(seen['observer_dark'][0])
+
+        rho = positions[:, 0] - observer
+        direction = rho / np.linalg.norm(rho, axis=1)[:, None]
+        separation = np.degrees(np.arccos(np.clip(direction @ axis, -1, 1)))
+        j2000 = direction @ j2000_to_date
+        ra = np.degrees(np.arctan2(j2000[:, 1], j2000[:, 0])) % 360
+        dec = np.degrees(np.arcsin(np.clip(j2000[:, 2], -1, 1)))
+
+        inside = seen['above_horizon'][:, 0] & np.isfinite(separation)
+        if cone is not None:
+            inside &= separation <= cone[2]
+        else:
+            ra_min, ra_max, dec_min, dec_max = box
+            inside &= in_ra_range(ra, ra_min, ra_max) & (dec >= dec_min) & (dec <= dec_max)
+
+        matches = np.flatnonzero(inside)
+        result['matched'] = len(matches)
+        matches = matches[np.argsort(separation[matches], kind='stable')][:limit]
+        for i in matches.tolist():
+            entry = entries[i]
+            magnitude = seen['magnitude'][i, 0]
+            result['satellites'].append({
+                'name': entry.name,
+                'norad_id': entry.norad_id,
+                'cospar_id': entry.cospar_id,
+                'groups': sorted(entry_groups[i]),
+                'altitude': round(float(seen['altitude'][i, 0]), 3),
+                'azimuth': round(float(seen['azimuth'][i, 0]), 3),
+                'ra': round(float(ra[i]), 3),
+                'dec': round(float(dec[i]), 3),
+                'distance_km': round(float(seen['distance_km'][i, 0]), 1),
+                'separation': round(float(separation[i]), 3),
+                'sunlit': bool(seen['sunlit'][i, 0]),
+                'visible': bool(seen['visible'][i, 0]),
+                'magnitude': round(float(magnitude), 2) if np.isfinite(magnitude) else None,
+            })
+        return result
+
+
+def create_satellite_catalog() -> SatelliteCatalog:
+    """Build the catalogue from environment configuration"""
+    return SatelliteCatalog(
+        snapshot_tick_seconds=float(os.environ.get('SKY_SNAPSHOT_TICK_SECONDS', '10')),
+        snapshot_cell_km=float(os.environ.get('SKY_SNAPSHOT_CELL_KM', '500')),
+        refresh_seconds=float(os.environ.get('TLE_REFRESH_MINUTES', '120')) * 60,
+    )
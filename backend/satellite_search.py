@@ -0,0 +1,235 @@
+"""Name, NORAD and COSPAR search over the satellite catalogue.
+
+Two structures back the search, both keyed on the words of each name
+(``ISS (ZARYA)`` is ``ISS`` and ``ZARYA``):
+
+* a sorted list of (word, name, NORAD id), which works as a flattened trie:
+  every word starting with a prefix sits in one contiguous run found by
+  binary search, already in result order, so a prefix query reads only as
+  many entries as it returns;
+* trigram postings (each word padded as ``"  word "``), used for fuzzy
+  matching when nothing matches exactly or by prefix, e.g. on typos. The
+  postings of the query's trigrams are counted together with numpy, so even
+  trigrams shared by thousands of Starlink names stay cheap.
+
+NORAD numbers and COSPAR designators are exact dictionary lookups. A group
+filter on a small group (a few dozen stations) scans that group instead of a
+long prefix run. The catalogue hands every refresh to ``update``; element
+sets change daily but names rarely do, so a refresh usually only swaps entry
+references.
+"""
+import math
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+WORD = re.compile(r'[A-Z0-9]+')
+COSPAR = re.compile(r'^(\d{2}|\d{4})-?(\d{3})([A-Z]{1,3})$')
+# Share of a query's trigrams a name must contain to count as a fuzzy match
+FUZZY_MIN_SIMILARITY = 0.5
+
+
+def name_words(name: str) -> List[str]:
+    return WORD.findall(name.upper())
+
+
+def trigrams(word: str) -> set:
+    """Trigrams of a word, padded so its start (and its end) show up in them"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def normalise_cospar(query: str) -> Optional[str]:
+    """Canonical 1998-067A form of a COSPAR designator, also accepting 98067A"""
+    match = COSPAR.match(query.upper())
+    if not match:
+        return None
+    year, launch, piece = match.groups()
+    if len(year) == 2:
+        year = str(1900 + int(year) if int(year) >= 57 else 2000 + int(year))
+    return f"{year}-{launch}{piece}"
+
+
+class SatelliteSearchIndex:
+    def __init__(self):
+        self._entries = {}
+        self._by_cospar: Dict[str, int] = {}
+        self._group_members: Dict[str, set] = {}
+        self._words: List[tuple] = []
+        self._postings: Dict[str, set] = {}
+        self._posting_arrays: Dict[str, np.ndarray] = {}
+        # Trigrams per name, indexed by NORAD id
+        self._gram_counts = np.zeros(0, dtype=np.int32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, group_id: str, members: Iterable[int], changed: Iterable, removed: Iterable[int]):
+        """Apply a group refresh: its members, new or updated entries and dropped NORAD ids"""
+        with self._lock:
+            self._group_members[group_id] = set(members)
+            stale, fresh = [], []
+            for entry in changed:
+                old = self._entries.get(entry.norad_id)
+                self._entries[entry.norad_id] = entry
+                if old is not None and old.name == entry.name and old.cospar_id == entry.cospar_id:
+                    continue
+                if old is not None:
+                    stale.append(old)
+                fresh.append(entry)
+            for number in removed:
+                old = self._entries.pop(number, None)
+                if old is not None:
+                    stale.append(old)
+
+            if stale:
+                dropped = set()
+                for old in stale:
+                    self._unindex(old)
+                    dropped.update((word, old.name, old.norad_id) for word in name_words(old.name))
+                self._words = [key for key in self._words if key not in dropped]
+            for entry in fresh:
+                self._index(entry)
+            if fresh:
+                # Sorting an already sorted list with a short tail appended is close to linear
+                self._words.extend((word, entry.name, entry.norad_id)
+                                   for entry in fresh for word in name_words(entry.name))
+                self._words.sort()
+
+    def _index(self, entry):
+        if entry.cospar_id:
+            self._by_cospar[entry.cospar_id] = entry.norad_id
+        grams = set()
+        for word in name_words(entry.name):
+            grams |= trigrams(word)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(entry.norad_id)
+            self._posting_arrays.pop(gram, None)
+        if entry.norad_id >= len(self._gram_counts):
+            grown = np.zeros(max(entry.norad_id + 1, 2 * len(self._gram_counts)), dtype=np.int32)
+            grown[:len(self._gram_counts)] = self._gram_counts
+            self._gram_counts = grown
+        self._gram_counts[entry.norad_id] = len(grams)
+
+    def _unindex(self, entry):
+        if self._by_cospar.get(entry.cospar_id) == entry.norad_id:
+            del self._by_cospar[entry.cospar_id]
+        for word in name_words(entry.name):
+            for gram in trigrams(word):
+                postings = self._postings.get(gram)
+                if postings is None:
+                    continue
+                postings.discard(entry.norad_id)
+                self._posting_arrays.pop(gram, None)
+                if not postings:
+                    del self._postings[gram]
+        self._gram_counts[entry.norad_id] = 0
+
+    def _posting_array(self, gram: str) -> np.ndarray:
+        array = self._posting_arrays.get(gram)
+        if array is None:
+            array = np.fromiter(self._postings.get(gram, ()), dtype=np.int64)
+            self._posting_arrays[gram] = array
+        return array
+
+    def search(self, query: str, groups: Optional[Sequence[str]] = None, limit: int = 20) -> List[dict]:
+        """Exact id and name prefix matches up to limit, or fuzzy matches if there are none"""
+        words = name_words(query)
+        results, seen = [], set()
+
+        with self._lock:
+            members = None
+            if groups:
+                members = set()
+                for group_id in groups:
+                    members |= self._group_members.get(group_id, set())
+
+            def add(number, match):
+                entry = self._entries.get(number)
+                if entry is None or number in seen or (members is not None and number not in members):
+                    return
+                seen.add(number)
+                results.append({
+                    'name': entry.name,
+                    'norad_id': entry.norad_id,
+                    'cospar_id': entry.cospar_id,
+                    # From the index's own membership: entry.groups belongs to the catalogue's lock
+                    'groups': sorted(group_id for group_id, group in self._group_members.items() if number in group),
+                    'line1': entry.line1,
+                    'line2': entry.line2,
+                    'match': match,
+                })
+
+            stripped = query.strip()
+            if stripped.isdigit():
+                add(int(stripped), 'norad')
+            cospar = normalise_cospar(stripped)
+            if cospar in self._by_cospar:
+                add(self._by_cospar[cospar], 'cospar')
+            if words and len(results) < limit:
+                for number in self._prefix_matches(words, members, limit - len(results)):
+                    add(number, 'prefix')
+            if words and not results:
+                for number in self._fuzzy_matches(words, members, limit):
+                    add(number, 'fuzzy')
+        return results[:limit]
+
+    def _prefix_run(self, prefix: str):
+        start = bisect_left(self._words, (prefix,))
+        end = bisect_left(self._words, (prefix + '\x7f',), start)
+        return start, end
+
+    def _prefix_matches(self, words: List[str], members: Optional[set], limit: int) -> List[int]:
+        """NORAD ids of names with a word starting with each query word, in word order"""
+        runs = [self._prefix_run(word) for word in words]
+        driver = min(range(len(words)), key=lambda i: runs[i][1] - runs[i][0])
+        start, end = runs[driver]
+
+        def matches(name):
+            name_set = name_words(name)
+            return all(any(candidate.startswith(word) for candidate in name_set) for word in words)
+
+        if members is not None and len(members) < end - start:
+            # A small group: checking its members beats walking a long run
+            found = []
+            for number in members:
+                entry = self._entries.get(number)
+                if entry is not None and matches(entry.name):
+                    word = min(w for w in name_words(entry.name) if w.startswith(words[driver]))
+                    found.append((word, entry.name, number))
+            return [number for _, _, number in sorted(found)[:limit]]
+
+        found, seen = [], set()
+        for i in range(start, end):
+            _, name, number = self._words[i]
+            if number in seen or (members is not None and number not in members):
+                continue
+            if len(words) > 1 and not matches(name):
+                continue
+            seen.add(number)
+            found.append(number)
+            if len(found) >= limit:
+                break
+        return found
+
+    def _fuzzy_matches(self, words: List[str], members: Optional[set], limit: int) -> List[int]:
+        """NORAD ids whose names share enough trigrams with the query, best first"""
+        query_grams = set()
+        for word in words:
+            query_grams |= trigrams(word)
+        needed = max(1, math.ceil(FUZZY_MIN_SIMILARITY * len(query_grams)))
+        hits = np.concatenate([self._posting_array(gram) for gram in query_grams])
+        if not len(hits):
+            return []
+        shared = np.bincount(hits)
+        candidates = np.flatnonzero(shared >= needed)
+        if members is not None:
+            candidates = candidates[np.isin(candidates, np.fromiter(members, dtype=np.int64))]
+        # Dice similarity between the query's trigrams and the name's
+        score = 2 * shared[candidates] / (len(query_grams) + self._gram_counts[candidates])
+        best = np.lexsort((candidates, -score))[:limit]
+        return candidates[best].tolist()
@@ -1,45 +1,244 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Header, Query, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter, model_validator
+from typing import List, Literal, Optional, Tuple, Annotated
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import uuid
-from datetime import datetime, timezone
+import base64
+from datetime import date, datetime, timezone, timedelta
 import requests
-from skyfield.api import load, wgs84, EarthSatellite
+from skyfield.api import Loader, wgs84, EarthSatellite
 from skyfield import almanac, eclipselib
 import ephem
+import sgp4
+import skyfield
 import math
+import numpy as np
+import json
 from io import StringIO
+from list_cache import create_list_cache, etag_matches, make_etag
+from reminders import compute_fire_time, create_reminder_scheduler
+from sync_feed import InvalidSyncToken, create_sync_feed
+from constellations import FIGURE_STARS, FIGURES, constellation_at, constellation_geometry
+from transforms import horizon_rotations, transform
+from tonight import NightGrid, rise_transit_set
+from solar_system import encode_orbits, moon_track, planet_tracks, satellite_tracks
+from metrics import CACHE_REJECTED, CACHE_REQUESTS, REGISTRY, CallbackGauge, MetricsMiddleware, timed
+from profiler import ProfilingMiddleware, sampling_profiler
+from executor import compute_executor
+from admission import admission_controller
+from orbits import parse_tles, propagate, time_grid
+from visibility import optical_visibility, standard_magnitude
+from conjunctions import screen_conjunctions
+from groundtrack import ground_track
+from result_cache import create_result_cache
+from memo_store import create_memo_store
+from satellite_catalog import CELESTRAK_GROUPS, create_satellite_catalog, parse_tle_text
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection, opened by the lifespan handler rather than at import
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+client = None
+db = None
+
+def connect_mongo():
+    """Open the MongoDB client (at startup, or from maintenance scripts)"""
+    global client, db
+    client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    return db
+
+# Skyfield data is loaded once per worker and shared by all requests
+skyfield_loader = Loader(os.environ.get('SKYFIELD_DATA_DIR', '.'))
+
+@lru_cache(maxsize=None)
+def get_timescale():
+    return skyfield_loader.timescale()
+
+@lru_cache(maxsize=None)
+def get_ephemeris():
+    with timed('compute', 'load_ephemeris'):
+        return skyfield_loader('de421.bsp')
+
+# Per-user cache in front of the list endpoints
+list_cache = create_list_cache()
+
+# Computed responses shared by all workers on this host
+result_cache = create_result_cache()
+
+# Deterministic results kept on disk across restarts, shared by all workers
+memo_store = create_memo_store()
+
+def ephemeris_version() -> str:
+    """Data and libraries behind Skyfield results, part of their memo keys"""
+    path = skyfield_loader.path_to('de421.bsp')
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    return f"de421:{size}:skyfield-{skyfield.__version__}:sgp4-{sgp4.__version__}"
+
+# Every CelesTrak group, parsed once and refreshed in the background
+satellite_catalog = create_satellite_catalog()
+
+# Seconds each kind of computed response is served from the result cache
+RESULT_TTLS = {
+    'planet_positions': 300,
+    'visible_stars': 300,
+    'astronomical_events': 3600,
+    'satellite_tle': 7200,
+    'satellite_passes': 900,
+    'lunar_eclipses': 3600,
+    'solar_eclipses': 3600,
+    'satellite_conjunctions': 900,
+    'tonight': 86400,
+    'solar_system_orbits': 3600,
+}
+
+# Fires reminders for events with reminder_enabled; created at startup
+reminder_scheduler = None
+reminder_lead = timedelta(minutes=int(os.environ.get('REMINDER_LEAD_MINUTES', '60')))
+# Sequence numbers and tombstones for delta sync of user data; created at startup
+sync_feed = None
+
+# Startup lifecycle: import -> preload -> warm-up -> ready
+startup_phases = {}
+worker_ready = False
+
+REGISTRY.register(CallbackGauge(
+    'planetarium_startup_phase_seconds',
+    'Duration of each startup phase of this worker',
+    lambda: {(phase,): seconds for phase, seconds in startup_phases.items()},
+    ('phase',),
+))
+REGISTRY.register(CallbackGauge(
+    'planetarium_worker_ready',
+    'Whether this worker has finished warming up',
+    lambda: int(worker_ready),
+))
+REGISTRY.register(CallbackGauge(
+    'planetarium_catalog_satellites',
+    'Satellites in the server-side catalogue, by CelesTrak group',
+    lambda: {(group_id,): size for group_id, size in satellite_catalog.group_sizes().items()},
+    ('group',),
+))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global reminder_scheduler, sync_feed
+    connect_mongo()
+    
+    started = time.perf_counter()
+    await compute_executor.run('preload', preload_data)
+    startup_phases['preload'] = time.perf_counter() - started
+    
+    reminder_scheduler = create_reminder_scheduler(db.stargazing_events)
+    await reminder_scheduler.ensure_indexes()
+    # Nearby search: geo cells first, then the start time within each cell
+    await db.stargazing_events.create_index([('point', '2dsphere'), ('starts_at', 1)])
+    reminder_scheduler.start()
+    sync_feed = create_sync_feed(db)
+    await sync_feed.ensure_indexes()
+    
+    # Serve liveness while warming up; readiness flips once this finishes
+    warmup_task = asyncio.create_task(warm_up())
+    catalog_task = asyncio.create_task(refresh_satellite_catalog())
+    yield
+    warmup_task.cancel()
+    catalog_task.cancel()
+    await reminder_scheduler.stop()
+    compute_executor.shutdown()
+    if result_cache:
+        result_cache.close()
+    client.close()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Admission control for compute routes; CRUD and list routes are not limited
+standard_cost = Depends(admission_controller.limit('standard'))
+heavy_cost = Depends(admission_controller.limit('heavy'))
+
 # Models
+MAX_CONSTELLATION_STARS = 200
+MAX_CONSTELLATION_LINES = 500
+MAX_TLE_NAME_LENGTH = 100
+MAX_TLE_LINE_LENGTH = 80
+MAX_PASS_DAYS = 14
+MAX_CONJUNCTION_OBJECTS = 5000
+# Objects x time steps a single conjunction screening may propagate
+MAX_CONJUNCTION_POSITIONS = 20_000_000
+MAX_CONJUNCTION_RESULTS = 500
+MAX_VISIBILITY_OBJECTS = 5000
+MAX_GROUNDTRACK_SATELLITES = 100
+MAX_GROUNDTRACK_ORBITS = 10
+MAX_SKY_PATCH_RESULTS = 500
+MAX_SEARCH_RESULTS = 100
+MAX_TRANSFORM_POINTS = 100_000
+MAX_TRANSFORM_TIMES = 100
+MAX_NEARBY_RESULTS = 100
+MAX_NEARBY_RADIUS_KM = 20_000
+MAX_ORBIT_SPAN_DAYS = 36525
+MAX_ORBIT_SATELLITES = 50
+MAX_SYNC_CHANGES = 1000
+# Points x times a single coordinate transform may return
+MAX_TRANSFORM_VALUES = 2_000_000
+
+class ConstellationStar(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    x: Optional[float] = None  # Canvas position in the editor
+    y: Optional[float] = None
+    ra: float = Field(default=0.0, ge=0, le=360)  # J2000 degrees
+    dec: float = Field(default=0.0, ge=-90, le=90)
+    name: Optional[str] = Field(default=None, max_length=64)
+
 class CustomConstellation(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    name: str
-    stars: List[dict]  # List of star positions [{x, y, ra, dec, name}]
-    lines: List[List[int]]  # List of connections between stars
+    name: str = Field(max_length=100)
+    stars: List[ConstellationStar] = Field(max_length=MAX_CONSTELLATION_STARS)
+    # Connections between stars, as pairs of indices into stars
+    lines: List[Tuple[Annotated[int, Field(ge=0)], Annotated[int, Field(ge=0)]]] = Field(
+        max_length=MAX_CONSTELLATION_LINES
+    )
     user_id: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+    @model_validator(mode='after')
+    def check_line_indices(self):
+        for start, end in self.lines:
+            if start >= len(self.stars) or end >= len(self.stars):
+                raise ValueError(f"Line [{start}, {end}] references a star that does not exist")
+            if start == end:
+                raise ValueError(f"Line [{start}, {end}] connects a star to itself")
+        return self
+
+    def to_document(self) -> dict:
+        """Document for storage: native BSON dates and no empty star fields"""
+        doc = self.model_dump()
+        doc['stars'] = [star.model_dump(exclude_none=True) for star in self.stars]
+        doc['lines'] = [list(line) for line in self.lines]
+        return doc
+
+class GeoPoint(BaseModel):
+    """GeoJSON point; coordinates are [longitude, latitude] in degrees"""
+    type: Literal['Point'] = 'Point'
+    coordinates: Tuple[Annotated[float, Field(ge=-180, le=180)], Annotated[float, Field(ge=-90, le=90)]]
+
 class StargazingEvent(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -47,17 +246,153 @@ class StargazingEvent(BaseModel):
     event_type: str  # meteor_shower, eclipse, planet_visible, etc
     date: str
     time: str
+    tz: Optional[str] = None  # IANA zone of date and time, e.g. Europe/Paris; UTC if omitted
     description: str
     location: Optional[str] = None
+    point: Optional[GeoPoint] = None  # Where the event takes place, for nearby search
     user_id: str
     reminder_enabled: bool = False
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+    @model_validator(mode='after')
+    def check_tz(self):
+        if self.tz is not None:
+            try:
+                ZoneInfo(self.tz)
+            except (ZoneInfoNotFoundError, ValueError):
+                raise ValueError(f"Unknown time zone: {self.tz}")
+        return self
+
 class LocationData(BaseModel):
     latitude: float
     longitude: float
     datetime: str
 
+class ConstellationLookupRequest(BaseModel):
+    ra: List[float]  # J2000 right ascensions in degrees
+    dec: List[float]  # J2000 declinations in degrees
+
+def cached_result(job: str, params: str = '') -> Tuple[str, Optional[bytes]]:
+    """Look up a computed response in the shared result cache; returns (key, body or None)"""
+    key = f"{job}:{params}"
+    body = result_cache.get(key) if result_cache else None
+    CACHE_REQUESTS.inc('results', 'miss' if body is None else 'hit')
+    return key, body
+
+def store_result(job: str, key: str, result) -> bytes:
+    """Serialize a computed response, share it with other workers and return the body"""
+    body = json.dumps(result).encode()
+    if result_cache:
+        share_result(job, key, body)
+    return body
+
+def share_result(job: str, key: str, body: bytes):
+    """Put a body in the shared result cache, counting ones too large for a slot"""
+    if not result_cache.set(key, body, RESULT_TTLS[job]):
+        CACHE_REJECTED.inc('results', job)
+        logger.debug(f"{job} result of {len(body)} bytes exceeds the result cache slot; not cached")
+
+async def compute_cached_body(job: str, func, request: Optional[BaseModel] = None) -> bytes:
+    """JSON body of func(request) from the result cache, computed on the executor on a miss"""
+    key, body = cached_result(job, request.model_dump_json() if request else '')
+    if body is not None:
+        return body
+    args = (request,) if request else ()
+    return store_result(job, key, await compute_executor.run(job, func, *args))
+
+# POST bodies carry the client's clock, which differs on every poll. The heavy
+# handlers that go through compute_cached floor it to these buckets (seconds),
+# so polls within one share a result; the cheap ones skip the result cache,
+# since recomputing them costs less than entries that never hit. Ground tracks
+# skip it too: their current subpoint must be at the exact requested time.
+POST_TIME_BUCKETS = {
+    'satellite_passes': 300,
+    'satellite_conjunctions': 300,
+    'solar_eclipses': 86400,
+}
+
+def floor_request_time(job: str, request: BaseModel) -> BaseModel:
+    """request with its datetime floored to the job's bucket (unchanged if unparsable)"""
+    try:
+        dt = datetime.fromisoformat(request.datetime.replace('Z', '+00:00'))
+    except ValueError:
+        return request
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    bucket = POST_TIME_BUCKETS[job]
+    start = math.floor(dt.timestamp() / bucket) * bucket
+    return request.model_copy(update={'datetime': datetime.fromtimestamp(start, timezone.utc).isoformat()})
+
+async def compute_cached(job: str, func, request: BaseModel) -> Response:
+    """Serve func(request), with its time floored, from the result cache, computing it on the executor on a miss"""
+    request = floor_request_time(job, request)
+    return Response(content=await compute_cached_body(job, func, request), media_type='application/json')
+
+def public_response(body: bytes, if_none_match: Optional[str], max_age: int, etag: Optional[str] = None,
+                    media_type: str = 'application/json') -> Response:
+    """A response shared caches may keep for max_age seconds, or a 304 if the client has it"""
+    headers = {
+        'ETag': etag or make_etag(body),
+        'Cache-Control': f'public, max-age={max_age}',
+        'Vary': 'Accept-Encoding',
+    }
+    if etag_matches(if_none_match, headers['ETag']):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+# GET forms of the location endpoints snap their inputs so that nearby
+# requests share one URL, and so one cache entry, at every layer:
+# (degrees latitude/longitude round to, seconds the time is floored to).
+# None drops the observer from results that do not depend on it.
+LOCATION_QUANTA = {
+    'planet_positions': (0.1, 60),
+    'visible_stars': (0.1, 60),
+    'astronomical_events': (None, 3600),
+    'solar_eclipses': (None, 86400),
+}
+# Responses for an explicit time never change
+FIXED_TIME_MAX_AGE = 86400
+STATIC_MAX_AGE = 86400
+# Shorter than the result cache TTL so browsers pick up refreshed elements
+TLE_MAX_AGE = 3600
+
+def canonical_location(job: str, latitude: float, longitude: float, when: Optional[str]) -> Tuple[LocationData, int]:
+    """Quantised LocationData for a GET location request, and the max-age of its response"""
+    step, bucket = LOCATION_QUANTA[job]
+    now = datetime.now(timezone.utc)
+    try:
+        dt = datetime.fromisoformat(when.replace('Z', '+00:00')) if when else now
+    except ValueError:
+        raise HTTPException(status_code=400, detail="datetime must be an ISO 8601 timestamp")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    start = math.floor(dt.timestamp() / bucket) * bucket
+    
+    if step is None:
+        latitude = longitude = 0.0
+    else:
+        latitude = round(round(latitude / step) * step, 6)
+        longitude = round(round(longitude / step) * step, 6)
+    
+    # "Now" is only good until the bucket rolls over
+    max_age = FIXED_TIME_MAX_AGE if when else max(1, math.ceil(start + bucket - now.timestamp()))
+    location = LocationData(
+        latitude=latitude, longitude=longitude,
+        datetime=datetime.fromtimestamp(start, timezone.utc).isoformat(),
+    )
+    return location, max_age
+
+async def location_query(job: str, func, latitude: float, longitude: float, when: Optional[str],
+                         if_none_match: Optional[str]) -> Response:
+    """Serve a GET location endpoint from quantised inputs with HTTP caching headers"""
+    location, max_age = canonical_location(job, latitude, longitude, when)
+    try:
+        body = await compute_cached_body(job, func, location)
+    except Exception as e:
+        logger.error(f"Error computing {job}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return public_response(body, if_none_match, max_age)
+
 # NASA APOD endpoint
 @api_router.get("/nasa/apod")
 async def get_nasa_apod():
@@ -65,7 +400,10 @@ async def get_nasa_apod():
     try:
         # Using DEMO_KEY for now - in production, would use environment variable
         api_key = os.environ.get('NASA_API_KEY', 'DEMO_KEY')
-        response = requests.get(f'https://api.nasa.gov/planetary/apod?api_key={api_key}')
+        with timed('upstream', 'nasa_apod'):
+            response = await asyncio.to_thread(
+                requests.get, f'https://api.nasa.gov/planetary/apod?api_key={api_key}'
+            )
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -73,21 +411,19 @@ async def get_nasa_apod():
         raise HTTPException(status_code=500, detail="Failed to fetch NASA data")
 
 # Get planet positions
-@api_router.post("/planets/positions")
-async def get_planet_positions(location: LocationData):
-    """Get current positions of planets for given location and time"""
-    try:
-        # Parse datetime - convert ISO format to datetime object
-        from datetime import datetime
-        dt = datetime.fromisoformat(location.datetime.replace('Z', '+00:00'))
-        obs_time = ephem.Date(dt)
-        
-        # Create observer
-        observer = ephem.Observer()
-        observer.lat = str(location.latitude)
-        observer.lon = str(location.longitude)
-        observer.date = obs_time
-        
+def compute_planet_positions(location: LocationData):
+    """Positions of the planets, Moon and Sun for an observer"""
+    # Parse datetime - convert ISO format to datetime object
+    dt = datetime.fromisoformat(location.datetime.replace('Z', '+00:00'))
+    obs_time = ephem.Date(dt)
+    
+    # Create observer
+    observer = ephem.Observer()
+    observer.lat = str(location.latitude)
+    observer.lon = str(location.longitude)
+    observer.date = obs_time
+    
+    with timed('compute', 'planet_positions.ephem'):
         planets = {
             'Mercury': ephem.Mercury(observer),
             'Venus': ephem.Venus(observer),
@@ -99,85 +435,203 @@ async def get_planet_positions(location: LocationData):
             'Moon': ephem.Moon(observer),
             'Sun': ephem.Sun(observer)
         }
-        
-        result = {}
-        for name, body in planets.items():
-            result[name] = {
-                'name': name,
-                'altitude': float(body.alt) * 180 / math.pi,  # Convert to degrees
-                'azimuth': float(body.az) * 180 / math.pi,
-                'ra': float(body.ra) * 180 / math.pi,  # Right ascension
-                'dec': float(body.dec) * 180 / math.pi,  # Declination
-                'visible': float(body.alt) > 0,  # Above horizon
-                'magnitude': float(body.mag) if hasattr(body, 'mag') else None
-            }
-        
-        return result
+    
+    # Tag each body with its constellation from astrometric J2000 coordinates
+    body_constellations = constellation_at(
+        [float(body.a_ra) * 180 / math.pi for body in planets.values()],
+        [float(body.a_dec) * 180 / math.pi for body in planets.values()],
+    )
+    
+    result = {}
+    for (name, body), constellation in zip(planets.items(), body_constellations):
+        result[name] = {
+            'name': name,
+            'altitude': float(body.alt) * 180 / math.pi,  # Convert to degrees
+            'azimuth': float(body.az) * 180 / math.pi,
+            'ra': float(body.ra) * 180 / math.pi,  # Right ascension
+            'dec': float(body.dec) * 180 / math.pi,  # Declination
+            'visible': float(body.alt) > 0,  # Above horizon
+            'magnitude': float(body.mag) if hasattr(body, 'mag') else None,
+            'constellation': str(constellation)
+        }
+    
+    return result
+
+@api_router.post("/planets/positions", dependencies=[standard_cost])
+async def get_planet_positions(location: LocationData):
+    """Get current positions of planets for given location and time"""
+    try:
+        return await compute_executor.run('planet_positions', compute_planet_positions, location)
     except Exception as e:
         logger.error(f"Error calculating planet positions: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/planets/positions", dependencies=[standard_cost])
+async def query_planet_positions(
+    latitude: float = Query(ge=-90, le=90),
+    longitude: float = Query(ge=-180, le=180),
+    when: Optional[str] = Query(None, alias='datetime'),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Cacheable GET form of planet positions (location to 0.1°, time to the minute)"""
+    return await location_query('planet_positions', compute_planet_positions, latitude, longitude, when, if_none_match)
+
+# Heliocentric orbits for the 3D views
+# Start times floor to this, so clients loading a scene in the same hour share one response
+ORBIT_BUCKET_SECONDS = 3600
+# DE421 covers 1899-07-29 to 2053-10-09
+ORBIT_YEARS = (1900, 2050)
+
+class OrbitRequest(BaseModel):
+    start: str
+    span_days: float = Field(default=365, gt=0, le=MAX_ORBIT_SPAN_DAYS)
+    moon: bool = False
+    satellites: List[int] = Field(default_factory=list, max_length=MAX_ORBIT_SATELLITES)
+    frame: Literal['ecliptic', 'icrs'] = 'ecliptic'
+
+def compute_orbits(request: OrbitRequest, entries) -> bytes:
+    """Binary payload of planet, Moon and satellite state vectors and orbit polylines"""
+    ts, eph = get_timescale(), get_ephemeris()
+    start = datetime.fromisoformat(request.start)
+    with timed('compute', 'solar_system_orbits.ephemeris'):
+        tracks = planet_tracks(ts, eph, start, request.span_days, request.frame)
+        if request.moon:
+            tracks.append(moon_track(ts, eph, start, request.span_days, request.frame))
+    if entries:
+        with timed('compute', 'solar_system_orbits.satellites'):
+            tracks.extend(satellite_tracks(ts, entries, start, request.span_days, request.frame))
+    return encode_orbits(start, request.frame, tracks, {'span_days': request.span_days})
+
+@api_router.get("/solar-system/orbits", dependencies=[standard_cost])
+async def get_solar_system_orbits(
+    start: Optional[str] = None,
+    span_days: float = Query(365, gt=0, le=MAX_ORBIT_SPAN_DAYS),
+    moon: bool = False,
+    satellite: List[int] = Query(default=[], max_length=MAX_ORBIT_SATELLITES),
+    frame: Literal['ecliptic', 'icrs'] = 'ecliptic',
+    if_none_match: Optional[str] = Header(None),
+):
+    """Heliocentric state vectors and orbit polylines as one binary payload (format in solar_system.py)"""
+    now = datetime.now(timezone.utc)
+    try:
+        dt = datetime.fromisoformat(start.replace('Z', '+00:00')) if start else now
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start must be an ISO 8601 timestamp")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    if not ORBIT_YEARS[0] <= dt.year <= ORBIT_YEARS[1]:
+        raise HTTPException(status_code=400, detail=f"start must be between {ORBIT_YEARS[0]} and {ORBIT_YEARS[1]}")
+    bucket = math.floor(dt.timestamp() / ORBIT_BUCKET_SECONDS) * ORBIT_BUCKET_SECONDS
+    max_age = FIXED_TIME_MAX_AGE if start else max(1, math.ceil(bucket + ORBIT_BUCKET_SECONDS - now.timestamp()))
+    
+    satellites = sorted(set(satellite))
+    entries = satellite_catalog.get(satellites)
+    if satellites:
+        if not len(satellite_catalog):
+            raise HTTPException(status_code=503, detail="Satellite catalogue is still loading",
+                                headers={'Retry-After': '30'})
+        missing = [number for number, entry in zip(satellites, entries) if entry is None]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Satellites not in the catalogue: {missing}")
+        # Elements change on every catalogue refresh
+        max_age = min(max_age, TLE_MAX_AGE)
+    
+    request = OrbitRequest(
+        start=datetime.fromtimestamp(bucket, timezone.utc).isoformat(),
+        span_days=span_days, moon=moon, satellites=satellites, frame=frame,
+    )
+    # Element set epochs (line 1, columns 19-32) tell refreshed elements apart in every worker
+    epochs = ','.join(entry.line1[18:32] for entry in entries)
+    key, body = cached_result('solar_system_orbits', f"{request.model_dump_json()}:{epochs}")
+    if body is None:
+        try:
+            body = await compute_executor.run('solar_system_orbits', compute_orbits, request, entries)
+        except Exception as e:
+            logger.error(f"Error computing orbits: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+        if result_cache:
+            share_result('solar_system_orbits', key, body)
+    return public_response(body, if_none_match, max_age, media_type='application/octet-stream')
+
 # Get stars data
-@api_router.post("/stars/visible")
+# Famous bright stars with J2000 coordinates in degrees
+BRIGHT_STARS = [
+    {'name': 'Sirius', 'ra': 101.287, 'dec': -16.716, 'magnitude': -1.46},
+    {'name': 'Canopus', 'ra': 95.988, 'dec': -52.696, 'magnitude': -0.74},
+    {'name': 'Arcturus', 'ra': 213.915, 'dec': 19.182, 'magnitude': -0.05},
+    {'name': 'Vega', 'ra': 279.234, 'dec': 38.783, 'magnitude': 0.03},
+    {'name': 'Capella', 'ra': 79.172, 'dec': 45.998, 'magnitude': 0.08},
+    {'name': 'Rigel', 'ra': 78.634, 'dec': -8.202, 'magnitude': 0.13},
+    {'name': 'Procyon', 'ra': 114.825, 'dec': 5.225, 'magnitude': 0.38},
+    {'name': 'Betelgeuse', 'ra': 88.793, 'dec': 7.407, 'magnitude': 0.50},
+    {'name': 'Altair', 'ra': 297.696, 'dec': 8.868, 'magnitude': 0.77},
+    {'name': 'Aldebaran', 'ra': 68.980, 'dec': 16.509, 'magnitude': 0.85},
+    {'name': 'Spica', 'ra': 201.298, 'dec': -11.161, 'magnitude': 0.98},
+    {'name': 'Antares', 'ra': 247.352, 'dec': -26.432, 'magnitude': 1.09},
+    {'name': 'Pollux', 'ra': 116.329, 'dec': 28.026, 'magnitude': 1.14},
+    {'name': 'Deneb', 'ra': 310.358, 'dec': 45.280, 'magnitude': 1.25},
+    {'name': 'Regulus', 'ra': 152.093, 'dec': 11.967, 'magnitude': 1.35}
+]
+
+def compute_visible_stars(location: LocationData):
+    """Bright stars above the horizon for an observer"""
+    # Parse datetime - convert ISO format to datetime object
+    dt = datetime.fromisoformat(location.datetime.replace('Z', '+00:00'))
+    obs_time = ephem.Date(dt)
+    
+    # Calculate visibility for each star
+    observer = ephem.Observer()
+    observer.lat = str(location.latitude)
+    observer.lon = str(location.longitude)
+    observer.date = obs_time
+    
+    star_constellations = constellation_at(
+        [star['ra'] for star in BRIGHT_STARS], [star['dec'] for star in BRIGHT_STARS]
+    )
+    
+    visible_stars = []
+    for star, constellation in zip(BRIGHT_STARS, star_constellations):
+        star_obj = ephem.FixedBody()
+        star_obj._ra = ephem.degrees(str(star['ra']))
+        star_obj._dec = ephem.degrees(str(star['dec']))
+        star_obj.compute(observer)
+    
+        altitude = float(star_obj.alt) * 180 / math.pi
+        if altitude > 0:  # Above horizon
+            visible_stars.append({
+                'name': star['name'],
+                'ra': star['ra'],
+                'dec': star['dec'],
+                'magnitude': star['magnitude'],
+                'altitude': altitude,
+                'azimuth': float(star_obj.az) * 180 / math.pi,
+                'constellation': str(constellation)
+            })
+    
+    return visible_stars
+
+@api_router.post("/stars/visible", dependencies=[standard_cost])
 async def get_visible_stars(location: LocationData):
     """Get visible stars for given location and time"""
     try:
-        # Parse datetime - convert ISO format to datetime object
-        from datetime import datetime
-        dt = datetime.fromisoformat(location.datetime.replace('Z', '+00:00'))
-        obs_time = ephem.Date(dt)
-        
-        # Famous bright stars with their coordinates
-        bright_stars = [
-            {'name': 'Sirius', 'ra': 101.287, 'dec': -16.716, 'magnitude': -1.46},
-            {'name': 'Canopus', 'ra': 95.988, 'dec': -52.696, 'magnitude': -0.74},
-            {'name': 'Arcturus', 'ra': 213.915, 'dec': 19.182, 'magnitude': -0.05},
-            {'name': 'Vega', 'ra': 279.234, 'dec': 38.783, 'magnitude': 0.03},
-            {'name': 'Capella', 'ra': 79.172, 'dec': 45.998, 'magnitude': 0.08},
-            {'name': 'Rigel', 'ra': 78.634, 'dec': -8.202, 'magnitude': 0.13},
-            {'name': 'Procyon', 'ra': 114.825, 'dec': 5.225, 'magnitude': 0.38},
-            {'name': 'Betelgeuse', 'ra': 88.793, 'dec': 7.407, 'magnitude': 0.50},
-            {'name': 'Altair', 'ra': 297.696, 'dec': 8.868, 'magnitude': 0.77},
-            {'name': 'Aldebaran', 'ra': 68.980, 'dec': 16.509, 'magnitude': 0.85},
-            {'name': 'Spica', 'ra': 201.298, 'dec': -11.161, 'magnitude': 0.98},
-            {'name': 'Antares', 'ra': 247.352, 'dec': -26.432, 'magnitude': 1.09},
-            {'name': 'Pollux', 'ra': 116.329, 'dec': 28.026, 'magnitude': 1.14},
-            {'name': 'Deneb', 'ra': 310.358, 'dec': 45.280, 'magnitude': 1.25},
-            {'name': 'Regulus', 'ra': 152.093, 'dec': 11.967, 'magnitude': 1.35}
-        ]
-        
-        # Calculate visibility for each star
-        observer = ephem.Observer()
-        observer.lat = str(location.latitude)
-        observer.lon = str(location.longitude)
-        observer.date = obs_time
-        
-        visible_stars = []
-        for star in bright_stars:
-            star_obj = ephem.FixedBody()
-            star_obj._ra = ephem.degrees(str(star['ra']))
-            star_obj._dec = ephem.degrees(str(star['dec']))
-            star_obj.compute(observer)
-            
-            altitude = float(star_obj.alt) * 180 / math.pi
-            if altitude > 0:  # Above horizon
-                visible_stars.append({
-                    'name': star['name'],
-                    'ra': star['ra'],
-                    'dec': star['dec'],
-                    'magnitude': star['magnitude'],
-                    'altitude': altitude,
-                    'azimuth': float(star_obj.az) * 180 / math.pi
-                })
-        
-        return visible_stars
+        return await compute_executor.run('visible_stars', compute_visible_stars, location)
     except Exception as e:
         logger.error(f"Error getting visible stars: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/stars/visible", dependencies=[standard_cost])
+async def query_visible_stars(
+    latitude: float = Query(ge=-90, le=90),
+    longitude: float = Query(ge=-180, le=180),
+    when: Optional[str] = Query(None, alias='datetime'),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Cacheable GET form of visible stars (location to 0.1°, time to the minute)"""
+    return await location_query('visible_stars', compute_visible_stars, latitude, longitude, when, if_none_match)
+
 # Constellation data
 @api_router.get("/constellations")
-async def get_constellations():
+async def get_constellations(if_none_match: Optional[str] = Header(None)):
     """Get standard constellation data"""
     constellations = [
         {'name': 'Ursa Major', 'common_name': 'Great Bear', 'best_month': 'April'},
@@ -191,108 +645,470 @@ async def get_constellations():
         {'name': 'Gemini', 'common_name': 'The Twins', 'best_month': 'February'},
         {'name': 'Taurus', 'common_name': 'The Bull', 'best_month': 'January'}
     ]
-    return constellations
+    return public_response(json.dumps(constellations).encode(), if_none_match, STATIC_MAX_AGE)
+
+# Geometry for all 88 IAU constellations never changes, so serialize it once
+iau_constellations_body = json.dumps(constellation_geometry(), separators=(',', ':')).encode()
+iau_constellations_etag = make_etag(iau_constellations_body)
+
+@api_router.get("/constellations/iau")
+async def get_iau_constellations(if_none_match: Optional[str] = Header(None)):
+    """Get boundaries and line figures for all 88 IAU constellations"""
+    return public_response(iau_constellations_body, if_none_match, STATIC_MAX_AGE, etag=iau_constellations_etag)
+
+@api_router.post("/constellations/lookup", dependencies=[standard_cost])
+async def lookup_constellations(request: ConstellationLookupRequest):
+    """Find the constellation containing each J2000 RA/Dec point"""
+    if len(request.ra) != len(request.dec):
+        raise HTTPException(status_code=400, detail="ra and dec must have the same length")
+    if len(request.ra) > 100000:
+        raise HTTPException(status_code=400, detail="At most 100000 points per request")
+    constellations = constellation_at(request.ra, request.dec).tolist()
+    # Not every constellation has a line figure yet; name the ones returned without
+    return {
+        'constellations': constellations,
+        'without_figures': sorted(set(constellations) - FIGURES.keys()),
+    }
+
+# Coordinate transforms
+CoordinateFrame = Literal['icrs', 'ecliptic', 'galactic', 'altaz']
+
+def parse_datetimes(values: List[str]) -> List[datetime]:
+    """UTC datetimes from ISO 8601 strings (naive ones are taken as UTC)"""
+    parsed = []
+    for value in values:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        parsed.append(dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc))
+    return parsed
+
+class CoordinateTransformRequest(BaseModel):
+    from_frame: CoordinateFrame
+    to_frame: CoordinateFrame
+    # Longitude-like (RA, azimuth, ecliptic or galactic longitude) and
+    # latitude-like (Dec, altitude, ...) angle of each point, in degrees
+    lon: List[float] = Field(max_length=MAX_TRANSFORM_POINTS)
+    lat: List[float] = Field(max_length=MAX_TRANSFORM_POINTS)
+    # Observer and times, needed when either frame is altaz
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
+    datetimes: List[str] = Field(default_factory=list, max_length=MAX_TRANSFORM_TIMES)
+
+    @model_validator(mode='after')
+    def check_points(self):
+        if len(self.lon) != len(self.lat):
+            raise ValueError("lon and lat must have the same length")
+        if 'altaz' in (self.from_frame, self.to_frame):
+            if self.latitude is None or self.longitude is None or not self.datetimes:
+                raise ValueError("altaz needs latitude, longitude and at least one datetime")
+            if len(self.lon) * len(self.datetimes) > MAX_TRANSFORM_VALUES:
+                raise ValueError(f"At most {MAX_TRANSFORM_VALUES} points x datetimes per request")
+            parse_datetimes(self.datetimes)
+        return self
+
+def compute_coordinate_transform(request: CoordinateTransformRequest) -> Response:
+    """Convert every point in one pass; altaz results have one row per datetime"""
+    result = {'from_frame': request.from_frame, 'to_frame': request.to_frame}
+    horizon = None
+    if 'altaz' in (request.from_frame, request.to_frame):
+        times = parse_datetimes(request.datetimes)
+        horizon = horizon_rotations(get_timescale().from_datetimes(times), request.latitude, request.longitude)
+        result['datetimes'] = [dt.isoformat() for dt in times]
+    
+    with timed('compute', 'coordinate_transform'):
+        lon, lat = transform(request.lon, request.lat, request.from_frame, request.to_frame, horizon)
+    result['lon'] = np.round(lon, 6).tolist()
+    result['lat'] = np.round(lat, 6).tolist()
+    # Serialise here, in the worker, rather than on the event loop
+    return Response(content=json.dumps(result), media_type='application/json')
+
+@api_router.post("/coordinates/transform", dependencies=[standard_cost])
+async def transform_coordinates(request: CoordinateTransformRequest):
+    """Convert points between ICRS, ecliptic, galactic and alt/az frames"""
+    try:
+        return await compute_executor.run('coordinate_transform', compute_coordinate_transform, request)
+    except Exception as e:
+        logger.error(f"Error transforming coordinates: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 # Custom constellations CRUD
+constellation_list_adapter = TypeAdapter(List[CustomConstellation])
+event_list_adapter = TypeAdapter(List[StargazingEvent])
+
+def cached_list_response(body: bytes, etag: str, if_none_match: Optional[str]) -> Response:
+    """Build a list response, or a 304 if the client already has this version"""
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
 @api_router.post("/constellations/custom", response_model=CustomConstellation)
 async def create_custom_constellation(constellation: CustomConstellation):
     """Save a custom constellation"""
-    doc = constellation.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.custom_constellations.insert_one(doc)
+    doc = constellation.to_document()
+    doc.update(await sync_feed.stamp(constellation.user_id))
+    with timed('mongo', 'custom_constellations.insert'):
+        await db.custom_constellations.insert_one(doc)
+    await list_cache.invalidate('custom_constellations', constellation.user_id)
     return constellation
 
 @api_router.get("/constellations/custom/{user_id}", response_model=List[CustomConstellation])
-async def get_user_constellations(user_id: str):
+async def get_user_constellations(user_id: str, if_none_match: Optional[str] = Header(None)):
     """Get all custom constellations for a user"""
-    constellations = await db.custom_constellations.find(
-        {"user_id": user_id}, {"_id": 0}
-    ).to_list(100)
+    async def load_constellations() -> bytes:
+        constellations = await db.custom_constellations.find(
+            {"user_id": user_id}, {"_id": 0}
+        ).to_list(100)
+        return constellation_list_adapter.dump_json(
+            constellation_list_adapter.validate_python(constellations)
+        )
     
-    for const in constellations:
-        if isinstance(const['created_at'], str):
-            const['created_at'] = datetime.fromisoformat(const['created_at'])
-    
-    return constellations
+    body, etag = await list_cache.get_or_load('custom_constellations', user_id, load_constellations)
+    return cached_list_response(body, etag, if_none_match)
 
 @api_router.delete("/constellations/custom/{constellation_id}")
 async def delete_custom_constellation(constellation_id: str):
     """Delete a custom constellation"""
-    result = await db.custom_constellations.delete_one({"id": constellation_id})
-    if result.deleted_count == 0:
+    with timed('mongo', 'custom_constellations.delete'):
+        deleted = await db.custom_constellations.find_one_and_delete(
+            {"id": constellation_id}, projection={"_id": 0, "user_id": 1}
+        )
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Constellation not found")
+    await sync_feed.tombstone('constellations', deleted['user_id'], constellation_id)
+    await list_cache.invalidate('custom_constellations', deleted['user_id'])
     return {"message": "Constellation deleted"}
 
+def project_constellation(constellation: dict, latitude: float, longitude: float, times: List[datetime]) -> dict:
+    """Altitude and azimuth of a custom constellation's stars, one row per time"""
+    stars = constellation['stars']
+    horizon = horizon_rotations(get_timescale().from_datetimes(times), latitude, longitude)
+    azimuth, altitude = transform(
+        [star.get('ra', 0.0) for star in stars], [star.get('dec', 0.0) for star in stars],
+        'icrs', 'altaz', horizon,
+    )
+    return {
+        'id': constellation['id'],
+        'name': constellation['name'],
+        'datetimes': [dt.isoformat() for dt in times],
+        'stars': [{'name': star.get('name'), 'ra': star.get('ra', 0.0), 'dec': star.get('dec', 0.0)} for star in stars],
+        'lines': constellation['lines'],
+        'altitude': np.round(altitude, 4).tolist(),
+        'azimuth': np.round(azimuth, 4).tolist(),
+    }
+
+@api_router.get("/constellations/custom/{constellation_id}/projection", dependencies=[standard_cost])
+async def get_constellation_projection(
+    constellation_id: str,
+    latitude: float = Query(ge=-90, le=90),
+    longitude: float = Query(ge=-180, le=180),
+    when: List[str] = Query(default=[], alias='datetime', max_length=MAX_TRANSFORM_TIMES),
+):
+    """Project a saved custom constellation onto an observer's sky at one or more times"""
+    try:
+        times = parse_datetimes(when) if when else [datetime.now(timezone.utc)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="datetime must be an ISO 8601 timestamp")
+    with timed('mongo', 'custom_constellations.find'):
+        constellation = await db.custom_constellations.find_one({"id": constellation_id}, {"_id": 0})
+    if constellation is None:
+        raise HTTPException(status_code=404, detail="Constellation not found")
+    try:
+        return await compute_executor.run(
+            'constellation_projection', project_constellation, constellation, latitude, longitude, times
+        )
+    except Exception as e:
+        logger.error(f"Error projecting constellation: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Stargazing events CRUD
 @api_router.post("/stargazing/events", response_model=StargazingEvent)
 async def create_stargazing_event(event: StargazingEvent):
     """Create a stargazing event/reminder"""
     doc = event.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.stargazing_events.insert_one(doc)
+    if event.point is None:
+        doc.pop('point')
+    else:
+        doc['point']['coordinates'] = list(event.point.coordinates)
+    # Native start time for date-range queries (the model keeps the strings)
+    starts_at = compute_fire_time(event.date, event.time, timedelta(0), event.tz)
+    if starts_at is not None:
+        doc['starts_at'] = starts_at
+    fire_at = None
+    if event.reminder_enabled:
+        fire_at = compute_fire_time(event.date, event.time, reminder_lead, event.tz)
+        if fire_at is None:
+            logger.warning(f"Cannot schedule reminder for event {event.id}: unparsable date/time")
+        else:
+            doc['next_fire_at'] = fire_at
+    doc.update(await sync_feed.stamp(event.user_id))
+    with timed('mongo', 'stargazing_events.insert'):
+        await db.stargazing_events.insert_one(doc)
+    await list_cache.invalidate('stargazing_events', event.user_id)
+    if fire_at is not None:
+        reminder_scheduler.notify(event.id, fire_at)
     return event
 
+class NearbyEvent(StargazingEvent):
+    distance_km: float
+
+class NearbyEventsPage(BaseModel):
+    events: List[NearbyEvent]
+    next_cursor: Optional[str] = None
+
+def encode_nearby_cursor(distance_m: float, ids: List[str]) -> str:
+    """Opaque cursor: the last distance returned and the events at exactly that distance"""
+    return base64.urlsafe_b64encode(json.dumps({'d': distance_m, 'ids': ids}).encode()).decode()
+
+def decode_nearby_cursor(cursor: str) -> Tuple[float, List[str]]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(data['d']), [str(i) for i in data['ids']]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_range_bound(value: Optional[str], name: str, end: bool = False) -> Optional[datetime]:
+    """UTC datetime for a range bound; a bare end date includes that whole day"""
+    if value is None:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 date or timestamp")
+    if end and len(value) == 10:
+        dt += timedelta(days=1)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+@api_router.get("/stargazing/events/nearby", response_model=NearbyEventsPage)
+async def get_nearby_stargazing_events(
+    latitude: float = Query(ge=-90, le=90),
+    longitude: float = Query(ge=-180, le=180),
+    radius_km: float = Query(50, gt=0, le=MAX_NEARBY_RADIUS_KM),
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_NEARBY_RESULTS),
+    cursor: Optional[str] = None,
+):
+    """Events with coordinates within radius_km, nearest first, optionally within a date range"""
+    query = {}
+    starts_after = parse_range_bound(start, 'start')
+    starts_before = parse_range_bound(end, 'end', end=True)
+    if starts_after or starts_before:
+        query['starts_at'] = {}
+        if starts_after:
+            query['starts_at']['$gte'] = starts_after
+        if starts_before:
+            query['starts_at']['$lt'] = starts_before
+    
+    # $geoNear walks the 2dsphere index outwards from the point and stops after
+    # limit + 1 matches; later pages resume from the last distance (keyset
+    # pagination) instead of skipping earlier results
+    geo_near = {
+        'near': {'type': 'Point', 'coordinates': [longitude, latitude]},
+        'key': 'point',
+        'distanceField': 'distance_m',
+        'maxDistance': radius_km * 1000,
+        'spherical': True,
+    }
+    if cursor:
+        min_distance, seen_ids = decode_nearby_cursor(cursor)
+        geo_near['minDistance'] = min_distance
+        query['id'] = {'$nin': seen_ids}
+    else:
+        min_distance, seen_ids = None, []
+    geo_near['query'] = query
+    
+    with timed('mongo', 'stargazing_events.nearby'):
+        docs = await db.stargazing_events.aggregate([
+            {'$geoNear': geo_near},
+            {'$limit': limit + 1},
+            {'$project': {'_id': 0}},
+        ]).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]['distance_m']
+        # Events tied at the boundary distance on earlier pages stay excluded too
+        tied = seen_ids if last == min_distance else []
+        next_cursor = encode_nearby_cursor(last, tied + [doc['id'] for doc in docs if doc['distance_m'] == last])
+    events = [NearbyEvent(**doc, distance_km=doc['distance_m'] / 1000) for doc in docs]
+    return NearbyEventsPage(events=events, next_cursor=next_cursor)
+
 @api_router.get("/stargazing/events/{user_id}", response_model=List[StargazingEvent])
-async def get_user_stargazing_events(user_id: str):
+async def get_user_stargazing_events(user_id: str, if_none_match: Optional[str] = Header(None)):
     """Get all stargazing events for a user"""
-    events = await db.stargazing_events.find(
-        {"user_id": user_id}, {"_id": 0}
-    ).to_list(100)
+    async def load_events() -> bytes:
+        events = await db.stargazing_events.find(
+            {"user_id": user_id}, {"_id": 0}
+        ).to_list(100)
+        return event_list_adapter.dump_json(event_list_adapter.validate_python(events))
     
-    for event in events:
-        if isinstance(event['created_at'], str):
-            event['created_at'] = datetime.fromisoformat(event['created_at'])
-    
-    return events
+    body, etag = await list_cache.get_or_load('stargazing_events', user_id, load_events)
+    return cached_list_response(body, etag, if_none_match)
 
 @api_router.delete("/stargazing/events/{event_id}")
 async def delete_stargazing_event(event_id: str):
     """Delete a stargazing event"""
-    result = await db.stargazing_events.delete_one({"id": event_id})
-    if result.deleted_count == 0:
+    with timed('mongo', 'stargazing_events.delete'):
+        deleted = await db.stargazing_events.find_one_and_delete(
+            {"id": event_id}, projection={"_id": 0, "user_id": 1}
+        )
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Event not found")
+    await sync_feed.tombstone('events', deleted['user_id'], event_id)
+    await list_cache.invalidate('stargazing_events', deleted['user_id'])
     return {"message": "Event deleted"}
 
+# Delta sync of a user's constellations and events
+class ConstellationChanges(BaseModel):
+    upserts: List[CustomConstellation]
+    deleted: List[str]
+
+class EventChanges(BaseModel):
+    upserts: List[StargazingEvent]
+    deleted: List[str]
+
+class SyncChanges(BaseModel):
+    constellations: ConstellationChanges
+    events: EventChanges
+    next_token: Optional[str] = None  # Pass as since on the next sync
+    has_more: bool  # Sync again straight away for the rest
+    reset: bool  # The token is too old: drop local copies and sync without one
+
+@api_router.get("/sync/{user_id}", response_model=SyncChanges)
+async def get_sync_changes(
+    user_id: str,
+    since: Optional[str] = None,
+    limit: int = Query(default=500, ge=1, le=MAX_SYNC_CHANGES),
+):
+    """Constellations and events created or deleted since a sync token (all of them without one)"""
+    try:
+        changes = await sync_feed.changes(user_id, since, limit)
+    except InvalidSyncToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SyncChanges(**changes)
+
 # Astronomical events
-@api_router.post("/astronomy/events")
+# Not memoized: POST clients send the current time on every poll, so entries
+# would never be hit again. The GET form shares results through the result cache.
+def compute_astronomical_events(location: LocationData):
+    """Next lunar phases after the given time"""
+    # Parse datetime - convert ISO format to datetime object
+    dt = datetime.fromisoformat(location.datetime.replace('Z', '+00:00'))
+    obs_time = ephem.Date(dt)
+    observer = ephem.Observer()
+    observer.lat = str(location.latitude)
+    observer.lon = str(location.longitude)
+    observer.date = obs_time
+    
+    events = []
+    
+    # Moon phases
+    next_full = ephem.next_full_moon(obs_time)
+    next_new = ephem.next_new_moon(obs_time)
+    
+    events.append({
+        'type': 'Full Moon',
+        'date': str(next_full),
+        'description': 'Next full moon'
+    })
+    
+    events.append({
+        'type': 'New Moon',
+        'date': str(next_new),
+        'description': 'Next new moon'
+    })
+    
+    return events
+
+@api_router.post("/astronomy/events", dependencies=[standard_cost])
 async def get_astronomical_events(location: LocationData):
     """Get upcoming astronomical events"""
     try:
-        # Parse datetime - convert ISO format to datetime object
-        from datetime import datetime
-        dt = datetime.fromisoformat(location.datetime.replace('Z', '+00:00'))
-        obs_time = ephem.Date(dt)
-        observer = ephem.Observer()
-        observer.lat = str(location.latitude)
-        observer.lon = str(location.longitude)
-        observer.date = obs_time
-        
-        events = []
-        
-        # Moon phases
-        next_full = ephem.next_full_moon(obs_time)
-        next_new = ephem.next_new_moon(obs_time)
-        
-        events.append({
-            'type': 'Full Moon',
-            'date': str(next_full),
-            'description': 'Next full moon'
-        })
-        
-        events.append({
-            'type': 'New Moon',
-            'date': str(next_new),
-            'description': 'Next new moon'
-        })
-        
-        return events
+        return await compute_executor.run('astronomical_events', compute_astronomical_events, location)
     except Exception as e:
         logger.error(f"Error getting astronomical events: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/astronomy/events", dependencies=[standard_cost])
+async def query_astronomical_events(
+    latitude: float = Query(0.0, ge=-90, le=90),
+    longitude: float = Query(0.0, ge=-180, le=180),
+    when: Optional[str] = Query(None, alias='datetime'),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Cacheable GET form of upcoming events (time to the hour; moon phases ignore the observer)"""
+    return await location_query(
+        'astronomical_events', compute_astronomical_events, latitude, longitude, when, if_none_match,
+    )
+
+# Rise/transit/set table for one night
+TONIGHT_CATALOGS = {
+    'bright': BRIGHT_STARS,
+    'figures': [{'name': name, 'ra': ra, 'dec': dec} for name, (ra, dec) in FIGURE_STARS.items()],
+}
+# Observers in the same cell share a table (0.1 deg moves events by under a minute)
+TONIGHT_CELL_DEG = 0.1
+
+class TonightRequest(BaseModel):
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    date: str  # Date of the evening, YYYY-MM-DD
+    catalog: Literal['bright', 'figures'] = 'bright'
+
+@lru_cache(maxsize=4)
+def get_night_grid(day: date) -> NightGrid:
+    """Body positions for nights starting on day, shared by every location"""
+    with timed('compute', 'tonight.grid'):
+        return NightGrid(get_timescale(), get_ephemeris(), day)
+
+def compute_tonight(request: TonightRequest):
+    """Rise, transit and set of the Sun, Moon, planets and a star catalogue from local noon to noon"""
+    day = date.fromisoformat(request.date)
+    grid = get_night_grid(day)
+    with timed('compute', 'tonight.table'):
+        table = rise_transit_set(grid, request.latitude, request.longitude, TONIGHT_CATALOGS[request.catalog])
+    return {'date': day.isoformat(), 'latitude': request.latitude, 'longitude': request.longitude, **table}
+
+@api_router.get("/astronomy/tonight", dependencies=[standard_cost])
+async def get_tonight(
+    latitude: float = Query(ge=-90, le=90),
+    longitude: float = Query(ge=-180, le=180),
+    night: Optional[str] = Query(None, alias='date'),
+    catalog: Literal['bright', 'figures'] = 'bright',
+    if_none_match: Optional[str] = Header(None),
+):
+    """Rise, transit and set times tonight for the planets, Moon and bright stars"""
+    # Until local noon "tonight" is the night that began the previous evening
+    local_now = datetime.now(timezone.utc) + timedelta(hours=longitude / 15 - 12)
+    if night:
+        try:
+            day = date.fromisoformat(night)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
+        max_age = FIXED_TIME_MAX_AGE
+    else:
+        day = local_now.date()
+        next_noon = datetime.combine(day + timedelta(days=1), datetime.min.time(), timezone.utc)
+        max_age = max(1, math.ceil((next_noon - local_now).total_seconds()))
+    if not 1900 <= day.year <= 2050:
+        raise HTTPException(status_code=400, detail="date must be between 1900 and 2050")
+    
+    request = TonightRequest(
+        latitude=round(round(latitude / TONIGHT_CELL_DEG) * TONIGHT_CELL_DEG, 6),
+        longitude=round(round(longitude / TONIGHT_CELL_DEG) * TONIGHT_CELL_DEG, 6),
+        date=day.isoformat(), catalog=catalog,
+    )
+    try:
+        body = await compute_cached_body('tonight', compute_tonight, request)
+    except Exception as e:
+        logger.error(f"Error computing tonight's table: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return public_response(body, if_none_match, max_age)
+
 # Satellite Tracking Endpoints
 @api_router.get("/satellites/list")
-async def get_satellite_list():
+async def get_satellite_list(if_none_match: Optional[str] = Header(None)):
     """Get list of trackable satellites from various groups"""
     try:
         satellite_groups = [
@@ -311,81 +1127,97 @@ async def get_satellite_list():
                 'tle_url': group['url']
             })
         
-        return result
+        return public_response(json.dumps(result).encode(), if_none_match, STATIC_MAX_AGE)
     except Exception as e:
         logger.error(f"Error getting satellite list: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/satellites/tle/{group_id}")
-async def get_satellite_tle(group_id: str):
+async def fetch_tle_group(group_id: str):
+    """Download and parse one CelesTrak group as (name, line1, line2) triples"""
+    with timed('upstream', 'celestrak_tle'):
+        response = await asyncio.to_thread(requests.get, CELESTRAK_GROUPS[group_id], timeout=10)
+    response.raise_for_status()
+    return parse_tle_text(response.text)
+
+@api_router.get("/satellites/tle/{group_id}", dependencies=[standard_cost])
+async def get_satellite_tle(group_id: str, if_none_match: Optional[str] = Header(None)):
     """Fetch TLE data for a specific satellite group"""
     try:
-        tle_urls = {
-            'stations': 'https://celestrak.org/NORAD/elements/gp.php?GROUP=stations&FORMAT=tle',
-            'starlink': 'https://celestrak.org/NORAD/elements/gp.php?GROUP=starlink&FORMAT=tle',
-            'gps-ops': 'https://celestrak.org/NORAD/elements/gp.php?GROUP=gps-ops&FORMAT=tle',
-            'galileo': 'https://celestrak.org/NORAD/elements/gp.php?GROUP=galileo&FORMAT=tle',
-            'visual': 'https://celestrak.org/NORAD/elements/gp.php?GROUP=visual&FORMAT=tle',
-        }
-        
-        if group_id not in tle_urls:
+        if group_id not in CELESTRAK_GROUPS:
             raise HTTPException(status_code=404, detail="Satellite group not found")
         
-        response = requests.get(tle_urls[group_id], timeout=10)
-        response.raise_for_status()
-        tle_data = response.text
+        key, body = cached_result('satellite_tle', group_id)
+        if body is not None:
+            return public_response(body, if_none_match, TLE_MAX_AGE)
         
-        # Parse TLE data
-        satellites = []
-        lines = tle_data.strip().split('\n')
+        tles = await fetch_tle_group(group_id)
+        await compute_executor.run('catalog_update', satellite_catalog.update_group, group_id, tles)
         
         # Handle Starlink specially - limit to first 50 for performance
         if group_id == 'starlink':
-            lines = lines[:150]  # 50 satellites * 3 lines
+            tles = tles[:50]
         
-        i = 0
-        while i < len(lines):
-            if i + 2 < len(lines):
-                name = lines[i].strip()
-                line1 = lines[i + 1].strip()
-                line2 = lines[i + 2].strip()
-                
-                if line1.startswith('1 ') and line2.startswith('2 '):
-                    satellites.append({
-                        'name': name,
-                        'line1': line1,
-                        'line2': line2
-                    })
-                    i += 3
-                else:
-                    i += 1
-            else:
-                break
+        satellites = [{'name': name, 'line1': line1, 'line2': line2} for name, line1, line2 in tles]
         
-        return {'group_id': group_id, 'satellites': satellites}
+        body = store_result('satellite_tle', key, {'group_id': group_id, 'satellites': satellites})
+        return public_response(body, if_none_match, TLE_MAX_AGE)
     except Exception as e:
         logger.error(f"Error fetching TLE data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/satellites/search")
+async def search_satellites(
+    q: str = Query(min_length=1, max_length=64),
+    group: Optional[List[str]] = Query(None),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+):
+    """Search all satellite groups by name, NORAD number or COSPAR designator"""
+    if not len(satellite_catalog):
+        raise HTTPException(status_code=503, detail="Satellite catalogue is still loading",
+                            headers={'Retry-After': '30'})
+    unknown = [group_id for group_id in group or [] if group_id not in CELESTRAK_GROUPS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown satellite groups: {', '.join(unknown)}")
+    with timed('compute', 'satellite_search'):
+        results = satellite_catalog.search_index.search(q, groups=group, limit=limit)
+    return {'query': q, 'catalog_size': len(satellite_catalog), 'results': results}
+
+class SatelliteTLE(BaseModel):
+    name: str = Field(max_length=MAX_TLE_NAME_LENGTH)
+    line1: str = Field(max_length=MAX_TLE_LINE_LENGTH)
+    line2: str = Field(max_length=MAX_TLE_LINE_LENGTH)
+
 class SatellitePositionRequest(BaseModel):
-    name: str
-    line1: str
-    line2: str
+    name: str = Field(max_length=MAX_TLE_NAME_LENGTH)
+    line1: str = Field(max_length=MAX_TLE_LINE_LENGTH)
+    line2: str = Field(max_length=MAX_TLE_LINE_LENGTH)
     latitude: float
     longitude: float
     datetime: str
+    # Magnitude at 1000 km, half illuminated; looked up by NORAD id if omitted
+    standard_magnitude: Optional[float] = None
 
-@api_router.post("/satellites/position")
-async def get_satellite_position(request: SatellitePositionRequest):
-    """Calculate current position of a satellite"""
-    try:
-        ts = load.timescale()
-        satellite = EarthSatellite(request.line1, request.line2, request.name, ts)
-        
-        # Parse datetime
-        dt = datetime.fromisoformat(request.datetime.replace('Z', '+00:00'))
-        t = ts.from_datetime(dt)
-        
+def magnitude_for(line1: str, override: Optional[float] = None) -> float:
+    """Standard magnitude to use for a satellite, NaN if unknown"""
+    if override is not None:
+        return override
+    known = standard_magnitude(line1)
+    return np.nan if known is None else known
+
+def finite_or_none(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+def compute_satellite_position(request: SatellitePositionRequest):
+    """Subpoint and observer-relative position of a satellite"""
+    ts = get_timescale()
+    satellite = EarthSatellite(request.line1, request.line2, request.name, ts)
+    
+    # Parse datetime
+    dt = datetime.fromisoformat(request.datetime.replace('Z', '+00:00'))
+    t = ts.from_datetime(dt)
+    
+    with timed('compute', 'satellite_position.propagate'):
         # Calculate geocentric position
         geocentric = satellite.at(t)
         subpoint = geocentric.subpoint()
@@ -395,173 +1227,578 @@ async def get_satellite_position(request: SatellitePositionRequest):
         difference = satellite - observer_location
         topocentric = difference.at(t)
         alt, az, distance = topocentric.altaz()
-        
-        return {
-            'name': request.name,
-            'latitude': float(subpoint.latitude.degrees),
-            'longitude': float(subpoint.longitude.degrees),
-            'altitude_km': float(subpoint.elevation.km),
-            'observer_altitude': float(alt.degrees),
-            'observer_azimuth': float(az.degrees),
-            'distance_km': float(distance.km),
-            'visible': bool(alt.degrees > 0)
-        }
+    
+    # Optical visibility: above the horizon, sunlit and the observer's sky dark
+    jd, fr = time_grid(dt, [0.0])
+    positions, _ = propagate([satellite.model], jd, fr)
+    lighting = optical_visibility(
+        positions, jd, fr, request.latitude, request.longitude,
+        standard_magnitudes=[magnitude_for(request.line1, request.standard_magnitude)],
+    )
+    
+    return {
+        'name': request.name,
+        'latitude': float(subpoint.latitude.degrees),
+        'longitude': float(subpoint.longitude.degrees),
+        'altitude_km': float(subpoint.elevation.km),
+        'observer_altitude': float(alt.degrees),
+        'observer_azimuth': float(az.degrees),
+        'distance_km': float(distance.km),
+        'above_horizon': bool(alt.degrees > 0),
+        'sunlit': bool(lighting['sunlit'][0, 0]),
+        'observer_dark': bool(lighting['observer_dark'][0]),
+        'visible': bool(alt.degrees > 0 and lighting['sunlit'][0, 0] and lighting['observer_dark'][0]),
+        'magnitude': finite_or_none(lighting['magnitude'][0, 0]),
+    }
+
+@api_router.post("/satellites/position", dependencies=[standard_cost])
+async def get_satellite_position(request: SatellitePositionRequest):
+    """Calculate current position of a satellite"""
+    try:
+        return await compute_executor.run('satellite_position', compute_satellite_position, request)
     except Exception as e:
         logger.error(f"Error calculating satellite position: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class SatelliteVisibilityRequest(BaseModel):
+    satellites: List[SatelliteTLE] = Field(min_length=1, max_length=MAX_VISIBILITY_OBJECTS)
+    latitude: float
+    longitude: float
+    datetime: str
+
+def compute_satellite_visibility(request: SatelliteVisibilityRequest):
+    """Look angles, lighting and optical visibility of many satellites at once"""
+    names, satrecs = parse_tles((sat.name, sat.line1, sat.line2) for sat in request.satellites)
+    dt = datetime.fromisoformat(request.datetime.replace('Z', '+00:00'))
+    jd, fr = time_grid(dt, [0.0])
+    
+    with timed('compute', 'satellite_visibility.propagate'):
+        positions, _ = propagate(satrecs, jd, fr)
+        lighting = optical_visibility(
+            positions, jd, fr, request.latitude, request.longitude,
+            standard_magnitudes=[magnitude_for(sat.line1) for sat in request.satellites],
+        )
+    
+    observer_dark = bool(lighting['observer_dark'][0])
+    satellites = []
+    for index, name in enumerate(names):
+        if not np.isfinite(positions[index, 0]).all():
+            continue  # Propagation failed (decayed or invalid elements)
+        satellites.append({
+            'name': name,
+            'observer_altitude': float(lighting['altitude'][index, 0]),
+            'observer_azimuth': float(lighting['azimuth'][index, 0]),
+            'distance_km': float(lighting['distance_km'][index, 0]),
+            'above_horizon': bool(lighting['above_horizon'][index, 0]),
+            'sunlit': bool(lighting['sunlit'][index, 0]),
+            'visible': bool(lighting['visible'][index, 0]),
+            'magnitude': finite_or_none(lighting['magnitude'][index, 0]),
+        })
+    
+    return {'observer_dark': observer_dark, 'satellites': satellites}
+
+@api_router.post("/satellites/visibility", dependencies=[standard_cost])
+async def get_satellite_visibility(request: SatelliteVisibilityRequest):
+    """Which of a set of satellites can be seen with the naked eye right now"""
+    try:
+        return await compute_executor.run('satellite_visibility', compute_satellite_visibility, request)
+    except Exception as e:
+        logger.error(f"Error calculating satellite visibility: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class GroundTrackRequest(BaseModel):
+    satellites: List[SatelliteTLE] = Field(min_length=1, max_length=MAX_GROUNDTRACK_SATELLITES)
+    datetime: str
+    orbits_before: float = Field(default=0.5, ge=0, le=MAX_GROUNDTRACK_ORBITS)
+    orbits_after: float = Field(default=1.0, ge=0, le=MAX_GROUNDTRACK_ORBITS)
+    # Maximum deviation of the simplified track from the propagated one
+    tolerance_deg: float = Field(default=0.05, ge=0.001, le=1.0)
+
+def compute_satellite_groundtracks(request: GroundTrackRequest):
+    """Past and future ground tracks of satellites as encoded polylines"""
+    names, satrecs = parse_tles((sat.name, sat.line1, sat.line2) for sat in request.satellites)
+    dt = datetime.fromisoformat(request.datetime.replace('Z', '+00:00'))
+    
+    tracks = []
+    for name, satrec in zip(names, satrecs):
+        with timed('compute', 'satellite_groundtrack.track'):
+            track = ground_track(satrec, dt, request.orbits_before, request.orbits_after, request.tolerance_deg)
+        tracks.append({'name': name, **track})
+    
+    return {'datetime': dt.isoformat(), 'encoding': 'polyline5', 'tracks': tracks}
+
+@api_router.post("/satellites/groundtrack", dependencies=[standard_cost])
+async def get_satellite_groundtracks(request: GroundTrackRequest):
+    """Get ground tracks of one or more satellites"""
+    try:
+        return await compute_executor.run('satellite_groundtrack', compute_satellite_groundtracks, request)
+    except Exception as e:
+        logger.error(f"Error calculating ground tracks: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class SkyPatchRequest(BaseModel):
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    datetime: str
+    # Either a cone around an altitude/azimuth...
+    altitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    azimuth: Optional[float] = Field(default=None, ge=0, le=360)
+    radius: float = Field(default=5, gt=0, le=90)
+    # ...or a J2000 RA/Dec box (ra_max below ra_min wraps through RA 0)
+    ra_min: Optional[float] = Field(default=None, ge=0, le=360)
+    ra_max: Optional[float] = Field(default=None, ge=0, le=360)
+    dec_min: Optional[float] = Field(default=None, ge=-90, le=90)
+    dec_max: Optional[float] = Field(default=None, ge=-90, le=90)
+    groups: Optional[List[str]] = Field(default=None, max_length=len(CELESTRAK_GROUPS))
+    limit: int = Field(default=50, ge=1, le=MAX_SKY_PATCH_RESULTS)
+
+    @model_validator(mode='after')
+    def check_region(self):
+        cone = [value is not None for value in (self.altitude, self.azimuth)]
+        box = [value is not None for value in (self.ra_min, self.ra_max, self.dec_min, self.dec_max)]
+        if not (all(cone) and not any(box) or all(box) and not any(cone)):
+            raise ValueError("Give either altitude and azimuth, or ra_min, ra_max, dec_min and dec_max")
+        if self.dec_min is not None and self.dec_min > self.dec_max:
+            raise ValueError("dec_min must not exceed dec_max")
+        unknown = [group for group in self.groups or [] if group not in CELESTRAK_GROUPS]
+        if unknown:
+            raise ValueError(f"Unknown satellite groups: {', '.join(unknown)}")
+        return self
+
+def compute_sky_patch(request: SkyPatchRequest):
+    """Catalogue satellites above the horizon inside a patch of sky"""
+    dt = datetime.fromisoformat(request.datetime.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    
+    cone = box = None
+    if request.altitude is not None:
+        cone = (request.altitude, request.azimuth, request.radius)
+    else:
+        box = (request.ra_min, request.ra_max, request.dec_min, request.dec_max)
+    
+    with timed('compute', 'sky_patch.query'):
+        patch = satellite_catalog.sky_patch(
+            dt, request.latitude, request.longitude, get_timescale().from_datetime(dt).M,
+            cone=cone, box=box, groups=request.groups, limit=request.limit,
+        )
+    
+    return {'datetime': dt.isoformat(), 'catalog_size': len(satellite_catalog), **patch}
+
+@api_router.post("/satellites/skypatch", dependencies=[standard_cost])
+async def get_sky_patch(request: SkyPatchRequest):
+    """Find which catalogue satellites are in a patch of sky"""
+    if not len(satellite_catalog):
+        raise HTTPException(status_code=503, detail="Satellite catalogue is still loading",
+                            headers={'Retry-After': '30'})
+    try:
+        return await compute_executor.run('sky_patch', compute_sky_patch, request)
+    except Exception as e:
+        logger.error(f"Error searching sky patch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 class SatellitePassRequest(BaseModel):
-    name: str
-    line1: str
-    line2: str
+    name: str = Field(max_length=MAX_TLE_NAME_LENGTH)
+    line1: str = Field(max_length=MAX_TLE_LINE_LENGTH)
+    line2: str = Field(max_length=MAX_TLE_LINE_LENGTH)
     latitude: float
     longitude: float
     datetime: str
-    days: int = 7
+    days: int = Field(default=7, ge=1, le=MAX_PASS_DAYS)
+    standard_magnitude: Optional[float] = None
 
-@api_router.post("/satellites/passes")
+@memo_store.memoize('satellite_passes', version=ephemeris_version)
+def compute_satellite_passes(request: SatellitePassRequest):
+    """Rise/culmination/set passes of a satellite over an observer"""
+    ts = get_timescale()
+    satellite = EarthSatellite(request.line1, request.line2, request.name, ts)
+    observer_location = wgs84.latlon(request.latitude, request.longitude)
+    
+    # Parse datetime
+    dt = datetime.fromisoformat(request.datetime.replace('Z', '+00:00'))
+    t0 = ts.from_datetime(dt)
+    t1 = ts.from_datetime(dt + timedelta(days=request.days))
+    
+    # Find events (rise, culminate, set)
+    with timed('compute', 'satellite_passes.find_events'):
+        t, events = satellite.find_events(observer_location, t0, t1, altitude_degrees=10.0)
+    
+    passes = []
+    windows = []  # (rise, set) datetimes of each complete pass
+    current_pass = {}
+    
+    for ti, event in zip(t, events):
+        event_time = ti.utc_datetime()
+    
+        if event == 0:  # Rise
+            rise_time = event_time
+            current_pass = {
+                'rise_time': event_time.isoformat(),
+                'rise_azimuth': None
+            }
+        elif event == 1:  # Culminate (highest point)
+            if current_pass:
+                difference = satellite - observer_location
+                topocentric = difference.at(ti)
+                alt, az, distance = topocentric.altaz()
+                current_pass['max_time'] = event_time.isoformat()
+                current_pass['max_altitude'] = alt.degrees
+                current_pass['max_azimuth'] = az.degrees
+        elif event == 2:  # Set
+            if current_pass:
+                current_pass['set_time'] = event_time.isoformat()
+                current_pass['set_azimuth'] = None
+                passes.append(current_pass)
+                windows.append((rise_time, event_time))
+                current_pass = {}
+    
+    passes, windows = passes[:20], windows[:20]  # Limit to 20 passes
+    mark_visible_portions(satellite, request, passes, windows)
+    
+    return {
+        'satellite': request.name,
+        'passes': passes
+    }
+
+PASS_SAMPLE_SECONDS = 10.0
+
+def mark_visible_portions(satellite, request: SatellitePassRequest, passes: List[dict], windows):
+    """Add rise/set azimuths and the optically visible part of each pass, in one propagation"""
+    if not passes:
+        return
+    offsets, owners = [], []
+    for index, (rise, set_) in enumerate(windows):
+        start = (rise - windows[0][0]).total_seconds()
+        duration = (set_ - rise).total_seconds()
+        samples = np.append(np.arange(0.0, duration, PASS_SAMPLE_SECONDS), duration)
+        offsets.append(start + samples)
+        owners.append(np.full(len(samples), index))
+    offsets, owners = np.concatenate(offsets), np.concatenate(owners)
+    
+    jd, fr = time_grid(windows[0][0], offsets)
+    positions, _ = propagate([satellite.model], jd, fr)
+    lighting = optical_visibility(
+        positions, jd, fr, request.latitude, request.longitude,
+        standard_magnitudes=[magnitude_for(request.line1, request.standard_magnitude)],
+    )
+    
+    for index, current_pass in enumerate(passes):
+        in_pass = np.flatnonzero(owners == index)
+        azimuths = lighting['azimuth'][0, in_pass]
+        current_pass['rise_azimuth'] = float(azimuths[0])
+        current_pass['set_azimuth'] = float(azimuths[-1])
+        visible = in_pass[lighting['visible'][0, in_pass]]
+        current_pass['visible'] = bool(len(visible))
+        if len(visible):
+            start = windows[0][0] + timedelta(seconds=float(offsets[visible[0]]))
+            end = windows[0][0] + timedelta(seconds=float(offsets[visible[-1]]))
+            current_pass['visible_start'] = start.isoformat()
+            current_pass['visible_end'] = end.isoformat()
+            current_pass['max_visible_altitude'] = float(lighting['altitude'][0, visible].max())
+            current_pass['peak_magnitude'] = finite_or_none(np.min(lighting['magnitude'][0, visible]))
+
+def drop_finished_passes(result: dict, requested: str) -> dict:
+    """result without the passes that set before the requested time
+
+    Passes are computed from the request time floored to its bucket, so a
+    cached result can start up to a bucket early.
+    """
+    try:
+        dt = datetime.fromisoformat(requested.replace('Z', '+00:00'))
+    except ValueError:
+        return result
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    result['passes'] = [
+        current_pass for current_pass in result['passes']
+        if datetime.fromisoformat(current_pass['set_time']) >= dt
+    ]
+    return result
+
+@api_router.post("/satellites/passes", dependencies=[heavy_cost])
 async def get_satellite_passes(request: SatellitePassRequest):
     """Predict when satellite will be visible from observer location"""
     try:
-        ts = load.timescale()
-        satellite = EarthSatellite(request.line1, request.line2, request.name, ts)
-        observer_location = wgs84.latlon(request.latitude, request.longitude)
-        
-        # Parse datetime
-        dt = datetime.fromisoformat(request.datetime.replace('Z', '+00:00'))
-        t0 = ts.from_datetime(dt)
-        t1 = ts.from_datetime(dt.replace(day=dt.day + request.days))
-        
-        # Find events (rise, culminate, set)
-        t, events = satellite.find_events(observer_location, t0, t1, altitude_degrees=10.0)
-        
-        passes = []
-        current_pass = {}
-        
-        for ti, event in zip(t, events):
-            event_time = ti.utc_datetime()
-            
-            if event == 0:  # Rise
-                current_pass = {
-                    'rise_time': event_time.isoformat(),
-                    'rise_azimuth': None
-                }
-            elif event == 1:  # Culminate (highest point)
-                if current_pass:
-                    difference = satellite - observer_location
-                    topocentric = difference.at(ti)
-                    alt, az, distance = topocentric.altaz()
-                    current_pass['max_time'] = event_time.isoformat()
-                    current_pass['max_altitude'] = alt.degrees
-                    current_pass['max_azimuth'] = az.degrees
-            elif event == 2:  # Set
-                if current_pass:
-                    current_pass['set_time'] = event_time.isoformat()
-                    current_pass['set_azimuth'] = None
-                    passes.append(current_pass)
-                    current_pass = {}
-        
-        return {
-            'satellite': request.name,
-            'passes': passes[:20]  # Limit to 20 passes
-        }
+        body = await compute_cached_body(
+            'satellite_passes', compute_satellite_passes, floor_request_time('satellite_passes', request)
+        )
+        return drop_finished_passes(json.loads(body), request.datetime)
     except Exception as e:
         logger.error(f"Error calculating satellite passes: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class ConjunctionRequest(BaseModel):
+    satellites: List[SatelliteTLE] = Field(min_length=2, max_length=MAX_CONJUNCTION_OBJECTS)
+    # Names of satellites to screen against the rest; every pair if omitted
+    targets: Optional[List[str]] = Field(None, min_length=1)
+    datetime: str
+    hours: float = Field(default=24, gt=0, le=72)
+    threshold_km: float = Field(default=10, gt=0, le=100)
+    step_seconds: float = Field(default=30, ge=5, le=120)
+
+    @model_validator(mode='after')
+    def check_screening_size(self):
+        steps = self.hours * 3600 / self.step_seconds
+        if steps * len(self.satellites) > MAX_CONJUNCTION_POSITIONS:
+            raise ValueError("Too many satellites for this window; shorten hours or increase step_seconds")
+        if self.targets is not None:
+            names = {satellite.name for satellite in self.satellites}
+            missing = [target for target in self.targets if target not in names]
+            if missing:
+                raise ValueError(f"Targets not among satellites: {', '.join(missing[:5])}")
+        return self
+
+def compute_satellite_conjunctions(request: ConjunctionRequest):
+    """Close approaches between satellites within a time window"""
+    names, satrecs = parse_tles((sat.name, sat.line1, sat.line2) for sat in request.satellites)
+    targets = None
+    if request.targets is not None:
+        wanted = set(request.targets)
+        targets = [index for index, name in enumerate(names) if name in wanted]
+    
+    # Parse datetime
+    dt = datetime.fromisoformat(request.datetime.replace('Z', '+00:00'))
+    
+    with timed('compute', 'satellite_conjunctions.screen'):
+        conjunctions = screen_conjunctions(
+            names, satrecs, dt, request.hours * 3600, request.threshold_km,
+            step_seconds=request.step_seconds, targets=targets,
+        )
+    
+    return {
+        'start': dt.isoformat(),
+        'end': (dt + timedelta(hours=request.hours)).isoformat(),
+        'screened_objects': len(names),
+        'conjunctions': conjunctions[:MAX_CONJUNCTION_RESULTS]
+    }
+
+@api_router.post("/satellites/conjunctions", dependencies=[heavy_cost])
+async def get_satellite_conjunctions(request: ConjunctionRequest):
+    """Screen satellites for close approaches"""
+    try:
+        return await compute_cached('satellite_conjunctions', compute_satellite_conjunctions, request)
+    except Exception as e:
+        logger.error(f"Error screening satellite conjunctions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Eclipse Prediction Endpoints
-@api_router.get("/eclipses/lunar")
-async def get_lunar_eclipses():
+@memo_store.memoize('lunar_eclipses', version=ephemeris_version)
+def compute_lunar_eclipses(start: datetime):
+    """Lunar eclipses from start until the end of 2027"""
+    ts = get_timescale()
+    eph = get_ephemeris()
+    
+    # Search for lunar eclipses from start until 2027; start is an argument,
+    # never "now", so the memo key covers it
+    t0 = ts.from_datetime(start)
+    t1 = ts.utc(2027, 12, 31)
+    
+    with timed('compute', 'lunar_eclipses.search'):
+        t, eclipse_types, details = eclipselib.lunar_eclipses(t0, t1, eph)
+    
+    eclipses = []
+    for ti, etype in zip(t, eclipse_types):
+        eclipse_time = ti.utc_datetime()
+    
+        eclipse_type_name = {
+            0: 'Penumbral',
+            1: 'Partial',
+            2: 'Total'
+        }.get(etype, 'Unknown')
+    
+        eclipses.append({
+            'date': eclipse_time.date().isoformat(),
+            'time': eclipse_time.time().isoformat(),
+            'type': eclipse_type_name,
+            'datetime': eclipse_time.isoformat(),
+            'description': f'{eclipse_type_name} Lunar Eclipse'
+        })
+    
+    return {'eclipses': eclipses}
+
+@api_router.get("/eclipses/lunar", dependencies=[heavy_cost])
+async def get_lunar_eclipses(if_none_match: Optional[str] = Header(None)):
     """Get upcoming lunar eclipses"""
     try:
-        ts = load.timescale()
-        eph = load('de421.bsp')
-        
-        # Search for lunar eclipses from now until 2027
-        t0 = ts.now()
-        t1 = ts.utc(2027, 12, 31)
-        
-        t, eclipse_types, details = eclipselib.lunar_eclipses(t0, t1, eph)
-        
-        eclipses = []
-        for ti, etype in zip(t, eclipse_types):
+        # Searching from the start of the day keeps the body, and its ETag, stable all day
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        key, body = cached_result('lunar_eclipses', today.date().isoformat())
+        if body is None:
+            result = await compute_executor.run('lunar_eclipses', compute_lunar_eclipses, today)
+            body = store_result('lunar_eclipses', key, result)
+    except Exception as e:
+        logger.error(f"Error calculating lunar eclipses: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return public_response(body, if_none_match, RESULT_TTLS['lunar_eclipses'])
+
+@memo_store.memoize('solar_eclipses', version=ephemeris_version)
+def compute_solar_eclipses(location: LocationData):
+    """Solar eclipse candidates from the given time until the end of 2027"""
+    ts = get_timescale()
+    eph = get_ephemeris()
+    
+    # Parse datetime
+    dt = datetime.fromisoformat(location.datetime.replace('Z', '+00:00'))
+    t0 = ts.from_datetime(dt)
+    t1 = ts.utc(2027, 12, 31)
+    
+    # Find new moons (potential solar eclipses)
+    with timed('compute', 'solar_eclipses.moon_phases'):
+        t, phases = almanac.find_discrete(t0, t1, almanac.moon_phases(eph))
+    new_moons = t[phases == 0]
+    
+    # Calculate angular separation at each new moon
+    earth = eph['earth']
+    sun = eph['sun']
+    moon = eph['moon']
+    
+    solar_eclipses = []
+    for ti in new_moons[:30]:  # Check first 30 new moons
+        # Calculate separation from Earth's perspective
+        sun_pos = earth.at(ti).observe(sun).apparent()
+        moon_pos = earth.at(ti).observe(moon).apparent()
+        separation = sun_pos.separation_from(moon_pos).degrees
+    
+        # If separation is very small, it's likely an eclipse
+        if separation < 2.0:
             eclipse_time = ti.utc_datetime()
-            
-            eclipse_type_name = {
-                0: 'Penumbral',
-                1: 'Partial',
-                2: 'Total'
-            }.get(etype, 'Unknown')
-            
-            eclipses.append({
+    
+            # Determine eclipse type based on separation
+            eclipse_type = 'Partial'
+            if separation < 0.5:
+                eclipse_type = 'Total/Annular'
+    
+            solar_eclipses.append({
                 'date': eclipse_time.date().isoformat(),
                 'time': eclipse_time.time().isoformat(),
-                'type': eclipse_type_name,
+                'type': eclipse_type,
                 'datetime': eclipse_time.isoformat(),
-                'description': f'{eclipse_type_name} Lunar Eclipse'
+                'separation': round(separation, 4),
+                'description': f'{eclipse_type} Solar Eclipse',
+                'note': 'Visibility depends on your location. Check local eclipse maps for exact timing.'
             })
-        
-        return {'eclipses': eclipses}
-    except Exception as e:
-        logger.error(f"Error calculating lunar eclipses: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {'eclipses': solar_eclipses}
 
-@api_router.post("/eclipses/solar")
+@api_router.post("/eclipses/solar", dependencies=[heavy_cost])
 async def get_solar_eclipses(location: LocationData):
     """Get upcoming solar eclipses and their visibility"""
     try:
-        ts = load.timescale()
-        eph = load('de421.bsp')
-        
-        # Parse datetime
-        dt = datetime.fromisoformat(location.datetime.replace('Z', '+00:00'))
-        t0 = ts.from_datetime(dt)
-        t1 = ts.utc(2027, 12, 31)
-        
-        # Find new moons (potential solar eclipses)
-        t, phases = almanac.find_discrete(t0, t1, almanac.moon_phases(eph))
-        new_moons = t[phases == 0]
-        
-        # Calculate angular separation at each new moon
-        earth = eph['earth']
-        sun = eph['sun']
-        moon = eph['moon']
-        
-        solar_eclipses = []
-        for ti in new_moons[:30]:  # Check first 30 new moons
-            # Calculate separation from Earth's perspective
-            sun_pos = earth.at(ti).observe(sun).apparent()
-            moon_pos = earth.at(ti).observe(moon).apparent()
-            separation = sun_pos.separation_from(moon_pos).degrees
-            
-            # If separation is very small, it's likely an eclipse
-            if separation < 2.0:
-                eclipse_time = ti.utc_datetime()
-                
-                # Determine eclipse type based on separation
-                eclipse_type = 'Partial'
-                if separation < 0.5:
-                    eclipse_type = 'Total/Annular'
-                
-                solar_eclipses.append({
-                    'date': eclipse_time.date().isoformat(),
-                    'time': eclipse_time.time().isoformat(),
-                    'type': eclipse_type,
-                    'datetime': eclipse_time.isoformat(),
-                    'separation': round(separation, 4),
-                    'description': f'{eclipse_type} Solar Eclipse',
-                    'note': 'Visibility depends on your location. Check local eclipse maps for exact timing.'
-                })
-        
-        return {'eclipses': solar_eclipses}
+        return await compute_cached('solar_eclipses', compute_solar_eclipses, location)
     except Exception as e:
         logger.error(f"Error calculating solar eclipses: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/eclipses/solar", dependencies=[heavy_cost])
+async def query_solar_eclipses(
+    latitude: float = Query(0.0, ge=-90, le=90),
+    longitude: float = Query(0.0, ge=-180, le=180),
+    when: Optional[str] = Query(None, alias='datetime'),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Cacheable GET form of solar eclipses (time to the day; the search ignores the observer)"""
+    return await location_query('solar_eclipses', compute_solar_eclipses, latitude, longitude, when, if_none_match)
+
 @api_router.get("/")
 async def root():
     return {"message": "Planetarium API"}
 
+# Startup: preload and warm-up
+WARMUP_TLE = (
+    'ISS (ZARYA)',
+    '1 25544U 98067A   25001.50000000  .00016717  00000-0  30571-3 0  9994',
+    '2 25544  51.6400 180.0000 0006703 130.5360 325.0288 15.50000000 48709',
+)
+
+def preload_data():
+    """Load ephemerides and timescale data before serving"""
+    get_timescale()
+    try:
+        get_ephemeris()
+    except Exception as e:
+        logger.warning(f"Could not preload ephemeris: {str(e)}")
+
+async def warm_up():
+    """Run each compute path once so first requests skip lazy initialisation"""
+    global worker_ready
+    started = time.perf_counter()
+    now = LocationData(latitude=0.0, longitude=0.0, datetime=datetime.now(timezone.utc).isoformat())
+    satellite = SatellitePositionRequest(
+        name=WARMUP_TLE[0], line1=WARMUP_TLE[1], line2=WARMUP_TLE[2],
+        latitude=0.0, longitude=0.0, datetime='2025-01-01T12:00:00+00:00',
+    )
+    warmups = [
+        ('planet_positions', compute_planet_positions, now),
+        ('visible_stars', compute_visible_stars, now),
+        ('astronomical_events', compute_astronomical_events, now),
+        ('satellite_position', compute_satellite_position, satellite),
+        ('satellite_passes', compute_satellite_passes, SatellitePassRequest(**satellite.model_dump(), days=1)),
+        ('lunar_eclipses', compute_lunar_eclipses, datetime.now(timezone.utc)),
+        ('solar_eclipses', compute_solar_eclipses, now),
+        ('tonight', compute_tonight, TonightRequest(latitude=0.0, longitude=0.0, date=date.today().isoformat())),
+    ]
+    for name, func, *args in warmups:
+        # Bypass the memo store: a stored result would skip the initialisation warm-up is for
+        func = getattr(func, '__wrapped__', func)
+        try:
+            await compute_executor.run(f'warmup.{name}', func, *args)
+        except Exception as e:
+            logger.warning(f"Warm-up of {name} failed: {str(e)}")
+    startup_phases['warmup'] = time.perf_counter() - started
+    worker_ready = True
+    logger.info(f"Worker ready: {', '.join(f'{k} {v:.2f}s' for k, v in startup_phases.items())}")
+
+async def refresh_satellite_catalog():
+    """Keep the satellite catalogue in step with CelesTrak"""
+    while True:
+        for group_id in CELESTRAK_GROUPS:
+            try:
+                tles = await fetch_tle_group(group_id)
+                await compute_executor.run('catalog_refresh', satellite_catalog.update_group, group_id, tles)
+            except Exception as e:
+                logger.warning(f"Refreshing satellite group {group_id} failed: {str(e)}")
+        await asyncio.sleep(satellite_catalog.refresh_seconds)
+
+@api_router.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+@api_router.get("/health/ready")
+async def readiness():
+    """Ready only once ephemerides are loaded and every compute path is warm"""
+    body = {'ready': worker_ready, 'phases': startup_phases}
+    return JSONResponse(body, status_code=200 if worker_ready else 503)
+
+def require_profiler_token(x_admin_token: Optional[str] = Header(None)):
+    """Profiles are only served when PROFILER_TOKEN is set and presented"""
+    if not sampling_profiler.check_token(x_admin_token):
+        raise HTTPException(status_code=404, detail="Not found")
+
+@api_router.get("/admin/profiles", dependencies=[Depends(require_profiler_token)])
+async def get_profiles(
+    route: Optional[str] = None,
+    format: str = Query('json', pattern='^(json|folded)$'),
+    top: int = Query(20, ge=1, le=500),
+):
+    """Sampled stacks per route, as JSON summaries or folded stacks for flame graphs"""
+    if format == 'folded':
+        return PlainTextResponse(sampling_profiler.folded(route))
+    profiles = sampling_profiler.profiles(top)
+    if route is not None:
+        profiles = {key: profile for key, profile in profiles.items() if key == route}
+    return {'interval_ms': sampling_profiler.interval * 1000, 'routes': profiles}
+
+@api_router.delete("/admin/profiles", dependencies=[Depends(require_profiler_token)])
+async def reset_profiles():
+    """Discard collected profiles"""
+    sampling_profiler.reset()
+    return {"message": "Profiles cleared"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics for this worker"""
+    return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4')
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -573,6 +1810,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -580,6 +1820,4 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+startup_phases['import'] = time.perf_counter() - IMPORT_STARTED
@@ -0,0 +1,170 @@
+"""Heliocentric state vectors and orbit polylines for the 3D views.
+
+Each body is evaluated once over a dense time grid covering one revolution
+(or the requested span, if shorter): planets from the JPL ephemeris relative
+to the Sun, the Moon relative to the Earth, and catalogue satellites by SGP4
+with TEME rotated into the same frame. The first sample is the state at the
+start time. The dense path is then simplified in 3D by the same interval
+halving as the ground tracks, keeping points only where a straight segment
+would stray from the path by more than a small share of the orbit's size.
+
+Results are packed into one binary payload for the browser:
+
+    b'ORB1' | uint32 header length | JSON header | zero padding to 8 bytes |
+    float32 rows of (days since start, x, y, z)
+
+The header lists the frame, the start time and, per body, its units, state
+vector and the offset and count of its rows.
+"""
+import json
+import struct
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+import numpy as np
+from skyfield.sgp4lib import TEME
+
+from orbits import propagate, time_grid
+from transforms import FIXED_FRAMES
+
+MAGIC = b'ORB1'
+HEADER_LENGTH = struct.Struct('<I')
+SECONDS_PER_DAY = 86400.0
+
+# Display name, ephemeris target and sidereal period in days
+PLANETS = (
+    ('Mercury', 'mercury', 87.969),
+    ('Venus', 'venus', 224.701),
+    ('Earth', 'earth', 365.256),
+    ('Mars', 'mars', 686.980),
+    ('Jupiter', 'jupiter barycenter', 4332.59),
+    ('Saturn', 'saturn barycenter', 10759.22),
+    ('Uranus', 'uranus barycenter', 30688.5),
+    ('Neptune', 'neptune barycenter', 60182.0),
+)
+MOON_PERIOD_DAYS = 27.321661
+# Dense samples per revolution before simplification
+SAMPLES_PER_ORBIT = 720
+MIN_SAMPLES = 16
+INITIAL_STRIDE = SAMPLES_PER_ORBIT // 16
+# Largest gap between a simplified polyline and the path, as a share of the orbit's radius
+TOLERANCE = 2e-4
+
+
+def simplify_path(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Indices of the points needed to stay within tolerance of a 3D path shaped (n, 3)"""
+    count = len(points)
+    kept = np.unique(np.append(np.arange(0, count, INITIAL_STRIDE), count - 1))
+    while True:
+        first, last = kept[:-1], kept[1:]
+        gaps = last - first - 1
+        wide = gaps > 0
+        first, last, gaps = first[wide], last[wide], gaps[wide]
+        if not len(first):
+            return kept
+        interval = np.repeat(np.arange(len(first)), gaps)
+        inner = first[interval] + 1 + np.arange(gaps.sum()) - np.repeat(np.cumsum(gaps) - gaps, gaps)
+        chord = (points[last] - points[first])[interval]
+        relative = points[inner] - points[first][interval]
+        length = np.linalg.norm(chord, axis=1)
+        error = np.where(
+            length > 0,
+            np.linalg.norm(np.cross(chord, relative), axis=1) / np.maximum(length, 1e-12),
+            np.linalg.norm(relative, axis=1),
+        )
+        worst = np.maximum.reduceat(error, np.cumsum(gaps) - gaps)
+        split = worst > tolerance
+        if not split.any():
+            return kept
+        kept = np.union1d(kept, (first[split] + last[split]) // 2)
+
+
+def sample_offsets(period_days: float, span_days: float, covered_days: float) -> np.ndarray:
+    """Day offsets of the dense grid over one revolution, the span or the ephemeris, whichever is shortest"""
+    length = max(min(period_days, span_days, covered_days), 0.0)
+    count = max(MIN_SAMPLES, int(np.ceil(length / period_days * SAMPLES_PER_ORBIT)) + 1)
+    return np.linspace(0.0, length, count)
+
+
+def track(name: str, kind: str, center: str, units: str, period_days: float, offsets: np.ndarray,
+          positions: np.ndarray, velocity: np.ndarray) -> dict:
+    """A body's state at the first sample and its simplified path"""
+    finite = np.isfinite(positions).all(axis=1)
+    offsets, path = offsets[finite], positions[finite]
+    if len(path) >= 2:
+        radius = np.linalg.norm(path, axis=1).mean()
+        kept = simplify_path(path, TOLERANCE * radius)
+        offsets, path = offsets[kept], path[kept]
+    return {
+        'name': name,
+        'kind': kind,
+        'center': center,
+        'units': units,
+        'period_days': period_days,
+        'position': positions[0].tolist() if finite[0] else None,
+        'velocity': velocity.tolist() if finite[0] else None,
+        'rows': np.column_stack([offsets, path]),
+    }
+
+
+def planet_tracks(ts, eph, start: datetime, span_days: float, frame: str) -> List[dict]:
+    """Heliocentric tracks (au, au/day) of the eight planets"""
+    rotation = FIXED_FRAMES[frame]
+    t0 = ts.from_datetime(start)
+    covered_days = min(segment.end_jd for segment in eph.spk.segments) - t0.tt
+    sun = eph['sun']
+    tracks = []
+    for name, target, period in PLANETS:
+        offsets = sample_offsets(period, span_days, covered_days)
+        state = (eph[target] - sun).at(ts.tt_jd(t0.tt + offsets))
+        positions = (rotation @ state.position.au).T
+        velocity = rotation @ state.velocity.au_per_d[:, 0]
+        tracks.append(track(name, 'planet', 'sun', 'au', period, offsets, positions, velocity))
+    return tracks
+
+
+def moon_track(ts, eph, start: datetime, span_days: float, frame: str) -> dict:
+    """Geocentric track (km, km/s) of the Moon"""
+    rotation = FIXED_FRAMES[frame]
+    t0 = ts.from_datetime(start)
+    covered_days = min(segment.end_jd for segment in eph.spk.segments) - t0.tt
+    offsets = sample_offsets(MOON_PERIOD_DAYS, span_days, covered_days)
+    state = (eph['moon'] - eph['earth']).at(ts.tt_jd(t0.tt + offsets))
+    positions = (rotation @ state.position.km).T
+    velocity = rotation @ state.velocity.km_per_s[:, 0]
+    return track('Moon', 'moon', 'earth', 'km', MOON_PERIOD_DAYS, offsets, positions, velocity)
+
+
+def satellite_tracks(ts, entries: Sequence, start: datetime, span_days: float, frame: str) -> List[dict]:
+    """Geocentric tracks (km, km/s) of catalogue satellites over one revolution each"""
+    rotation = FIXED_FRAMES[frame]
+    t0 = ts.from_datetime(start)
+    tracks = []
+    for entry in entries:
+        period = 2 * np.pi / entry.satrec.no_kozai / 1440
+        offsets = sample_offsets(period, span_days, np.inf)
+        jd, fr = time_grid(start, offsets * SECONDS_PER_DAY)
+        positions, velocities = propagate([entry.satrec], jd, fr)
+        # TEME -> ICRS is the transpose of Skyfield's ICRS -> TEME rotation
+        to_icrs = np.moveaxis(TEME.rotation_at(ts.tt_jd(t0.tt + offsets)), -1, 0).transpose(0, 2, 1)
+        positions = np.einsum('ij,tjk,tk->ti', rotation, to_icrs, positions[0])
+        velocity = rotation @ to_icrs[0] @ velocities[0, 0]
+        tracks.append(track(entry.name, 'satellite', 'earth', 'km', period, offsets, positions, velocity))
+    return tracks
+
+
+def encode_orbits(start: datetime, frame: str, tracks: List[dict], extra: Optional[dict] = None) -> bytes:
+    """Pack tracks into the binary payload described in the module docstring"""
+    bodies, offset = [], 0
+    for item in tracks:
+        count = len(item['rows'])
+        bodies.append({key: value for key, value in item.items() if key != 'rows'} | {'offset': offset, 'count': count})
+        offset += count
+    header = json.dumps({'start': start.isoformat(), 'frame': frame, **(extra or {}), 'bodies': bodies},
+                        separators=(',', ':')).encode()
+    padding = -(len(MAGIC) + HEADER_LENGTH.size + len(header)) % 8
+    rows = np.concatenate([item['rows'] for item in tracks]) if tracks else np.zeros((0, 4))
+    return b''.join([
+        MAGIC, HEADER_LENGTH.pack(len(header)), header, b'\0' * padding,
+        rows.astype('<f4').tobytes(),
+    ])
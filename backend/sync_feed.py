@@ -0,0 +1,135 @@
+"""Delta-sync change feed for users' constellations and stargazing events.
+
+Every write through the CRUD handlers stamps the document with ``updated_at``
+and the next value of a per-user sequence (one counter document per user,
+incremented atomically, so all workers agree on the order). Deletes leave a
+tombstone with the same stamp in ``sync_tombstones``. A client keeps the
+opaque token from its last sync and asks only for what changed since; every
+collection has a (user_id, seq) index, so that is a range read however large
+the library is.
+
+A sequence number is allocated just before its write lands, so a slow write
+can become visible after a later one. The token therefore only advances past
+changes older than a settle window; newer ones are sent again on the next
+sync, which clients apply idempotently (upsert by id, delete by id).
+Tombstones expire after the retention period, so tokens older than that get
+a reset: the client drops its copy and syncs again without a token.
+"""
+import base64
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+
+from metrics import timed
+from reminders import utc, utc_now
+
+
+# Stamped on every synced document besides its model fields
+SYNC_FIELDS = ('seq', 'updated_at')
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+class SyncFeed:
+    def __init__(self, db, collections: Dict[str, str], retention: timedelta, settle: timedelta):
+        self.db = db
+        # Feed section -> collection name
+        self.collections = collections
+        self.retention = retention
+        self.settle = settle
+        self.tombstones = db.sync_tombstones
+        self.counters = db.sync_counters
+
+    async def ensure_indexes(self):
+        for name in self.collections.values():
+            await self.db[name].create_index([('user_id', 1), ('seq', 1)])
+        await self.tombstones.create_index([('user_id', 1), ('seq', 1)])
+        # Kept a day past the retention, so a token just inside it still sees every delete
+        await self.tombstones.create_index(
+            'updated_at', expireAfterSeconds=int((self.retention + timedelta(days=1)).total_seconds())
+        )
+
+    async def stamp(self, user_id: str) -> dict:
+        """Sync fields for a document about to be written"""
+        with timed('mongo', 'sync_counters.increment'):
+            counter = await self.counters.find_one_and_update(
+                {'_id': user_id}, {'$inc': {'seq': 1}}, upsert=True, return_document=ReturnDocument.AFTER,
+            )
+        return {'seq': counter['seq'], 'updated_at': utc_now()}
+
+    async def tombstone(self, section: str, user_id: str, doc_id: str):
+        """Record a delete for clients that already have the document"""
+        stamp = await self.stamp(user_id)
+        with timed('mongo', 'sync_tombstones.insert'):
+            await self.tombstones.insert_one({'section': section, 'id': doc_id, 'user_id': user_id, **stamp})
+
+    def encode_token(self, user_id: str, seq: int, issued_at: datetime) -> str:
+        data = {'u': user_id, 's': seq, 't': int(issued_at.timestamp())}
+        return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode()
+
+    def decode_token(self, token: str):
+        """(user id, sequence, issue time) of a token"""
+        try:
+            data = json.loads(base64.urlsafe_b64decode(token.encode()))
+            return str(data['u']), int(data['s']), datetime.fromtimestamp(int(data['t']), timezone.utc)
+        except (ValueError, KeyError, TypeError):
+            raise InvalidSyncToken("Invalid sync token")
+
+    async def changes(self, user_id: str, token: Optional[str], limit: int) -> dict:
+        """Upserted documents and deleted ids per section since token, oldest change first"""
+        now = utc_now()
+        since = 0
+        if token:
+            token_user, since, issued_at = self.decode_token(token)
+            if token_user != user_id or now - issued_at > self.retention:
+                return {'reset': True, 'next_token': None, 'has_more': False,
+                        **{section: {'upserts': [], 'deleted': []} for section in self.collections}}
+
+        query = {'user_id': user_id, 'seq': {'$gt': since}}
+        found = []
+        for section, name in self.collections.items():
+            with timed('mongo', f'{name}.changes'):
+                docs = await self.db[name].find(query, {'_id': 0}).sort('seq', 1).to_list(limit + 1)
+            found.extend((doc['seq'], section, doc, False) for doc in docs)
+        with timed('mongo', 'sync_tombstones.changes'):
+            tombstones = await self.tombstones.find(query, {'_id': 0}).sort('seq', 1).to_list(limit + 1)
+        found.extend((doc['seq'], doc['section'], doc, True) for doc in tombstones)
+        found.sort(key=lambda change: change[0])
+        page = found[:limit]
+
+        next_seq = since
+        settled_before = now - self.settle
+        for seq, _, doc, _ in page:
+            if utc(doc['updated_at']) > settled_before:
+                break
+            next_seq = seq
+
+        result = {section: {'upserts': [], 'deleted': []} for section in self.collections}
+        deleted = {doc['id'] for _, _, doc, is_tombstone in page if is_tombstone}
+        for _, section, doc, is_tombstone in page:
+            if is_tombstone:
+                result[section]['deleted'].append(doc['id'])
+            elif doc['id'] not in deleted:
+                result[section]['upserts'].append(doc)
+        return {
+            **result,
+            'reset': False,
+            'next_token': self.encode_token(user_id, next_seq, now),
+            # Unsettled changes hold the token back; those are re-sent on a later sync instead
+            'has_more': len(found) > limit and next_seq > since,
+        }
+
+
+def create_sync_feed(db) -> SyncFeed:
+    """Build the feed from environment configuration"""
+    return SyncFeed(
+        db,
+        {'constellations': 'custom_constellations', 'events': 'stargazing_events'},
+        retention=timedelta(days=int(os.environ.get('SYNC_TOMBSTONE_DAYS', '30'))),
+        settle=timedelta(seconds=float(os.environ.get('SYNC_SETTLE_SECONDS', '5'))),
+    )
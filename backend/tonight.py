@@ -0,0 +1,199 @@
+"""Rise, transit and set times for every object in one pass.
+
+Geocentric apparent RA/Dec of the Sun, Moon and planets are sampled every
+``SAMPLE_MINUTES`` over the 48 hours from 00:00 UTC on a date, together with
+apparent sidereal time. Any observer's night (local noon to the next local
+noon, at most 24 hours from the date's start) falls inside that grid, so it
+is computed once per date and shared by every location.
+
+For an observer, the altitude of every object at every sample is then one
+closed-form expression over a (samples, objects) array: stars keep their
+RA/Dec of date, bodies have theirs sampled. Horizon crossings are bracketed
+by sign changes and refined by a few vectorised regula falsi steps on
+positions interpolated between samples; transits are where the hour angle
+passes zero, which is linear in time between samples.
+
+Rise and set use the standard altitudes: -0.5667 deg (refraction) for stars
+and planets, -0.8333 deg for the Sun (plus its semi-diameter) and, for the
+Moon, the same corrected for its horizontal parallax since its positions are
+geocentric.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+SAMPLE_MINUTES = 10
+GRID_HOURS = 48
+NIGHT_SAMPLES = 24 * 60 // SAMPLE_MINUTES + 1
+REFINE_STEPS = 4
+
+STANDARD_ALTITUDE = -0.5667
+SUN_ALTITUDE = -0.8333
+EARTH_RADIUS_KM = 6378.14
+
+# Display name, ephemeris target and kind of each solar-system body
+BODIES = (
+    ('Sun', 'sun', 'sun'),
+    ('Moon', 'moon', 'moon'),
+    ('Mercury', 'mercury', 'planet'),
+    ('Venus', 'venus', 'planet'),
+    ('Mars', 'mars', 'planet'),
+    ('Jupiter', 'jupiter barycenter', 'planet'),
+    ('Saturn', 'saturn barycenter', 'planet'),
+    ('Uranus', 'uranus barycenter', 'planet'),
+    ('Neptune', 'neptune barycenter', 'planet'),
+)
+
+
+class NightGrid:
+    """Sidereal time and body positions sampled over 48 hours from a date's 00:00 UTC"""
+
+    def __init__(self, ts, eph, day: date):
+        self.day = day
+        self.start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        minutes = np.arange(0, GRID_HOURS * 60 + 1, SAMPLE_MINUTES)
+        t = ts.utc(day.year, day.month, day.day, 0, minutes)
+        self.theta = np.unwrap(np.radians(t.gast * 15.0))
+
+        earth = eph['earth']
+        ra, dec, distance = [], [], []
+        for _, target, _ in BODIES:
+            body_ra, body_dec, body_distance = earth.at(t).observe(eph[target]).apparent().radec(epoch='date')
+            ra.append(body_ra.radians)
+            dec.append(body_dec.radians)
+            distance.append(body_distance.km)
+        self.ra = np.unwrap(np.array(ra).T, axis=0)
+        self.dec = np.array(dec).T
+        self.distance_km = np.array(distance).T
+        # Stars only need precessing to the equator of date once
+        self.precession = t[len(minutes) // 2].M
+
+    def star_positions(self, ra_deg: Sequence[float], dec_deg: Sequence[float]):
+        """RA/Dec of date (radians) of J2000 star positions in degrees"""
+        ra, dec = np.radians(ra_deg), np.radians(dec_deg)
+        vectors = np.array([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)])
+        x, y, z = self.precession @ vectors
+        return np.arctan2(y, x), np.arctan2(z, np.hypot(x, y))
+
+
+def _altitude(latitude, theta, ra, dec):
+    """Altitude in radians; hour angle = theta - ra with theta including the observer's longitude"""
+    sin_alt = np.sin(latitude) * np.sin(dec) + np.cos(latitude) * np.cos(dec) * np.cos(theta - ra)
+    return np.arcsin(np.clip(sin_alt, -1.0, 1.0))
+
+
+def _first(mask: np.ndarray):
+    """Index of the first True per column, and whether there is one"""
+    return mask.argmax(axis=0), mask.any(axis=0)
+
+
+def rise_transit_set(grid: NightGrid, latitude: float, longitude: float, stars: List[dict]) -> dict:
+    """Rise, transit and set of the bodies and the given stars during an observer's night.
+
+    stars are dicts with name, ra and dec (J2000 degrees) and optionally magnitude.
+    """
+    # Local noon to local noon, in grid samples
+    first = int(round((12.0 - longitude / 15.0) * 60 / SAMPLE_MINUTES))
+    window = slice(first, first + NIGHT_SAMPLES)
+    phi = np.radians(latitude)
+    theta = grid.theta[window] + np.radians(longitude)
+    n_bodies = len(BODIES)
+
+    star_ra, star_dec = grid.star_positions([s['ra'] for s in stars], [s['dec'] for s in stars])
+    ra = np.concatenate([grid.ra[window], np.broadcast_to(star_ra, (NIGHT_SAMPLES, len(stars)))], axis=1)
+    dec = np.concatenate([grid.dec[window], np.broadcast_to(star_dec, (NIGHT_SAMPLES, len(stars)))], axis=1)
+
+    horizon = np.full(ra.shape[1], np.radians(STANDARD_ALTITUDE))
+    horizon[0] = np.radians(SUN_ALTITUDE)
+    parallax = np.arcsin(EARTH_RADIUS_KM / grid.distance_km[window, 1].mean())
+    horizon[1] = 0.7275 * parallax + np.radians(STANDARD_ALTITUDE)
+
+    theta_column = theta[:, None]
+    altitude = _altitude(phi, theta_column, ra, dec)
+    above = altitude >= horizon
+
+    d_theta = np.diff(theta)
+    d_ra = np.diff(ra, axis=0)
+    d_dec = np.diff(dec, axis=0)
+
+    def interpolated_altitude(k, j, fraction):
+        return _altitude(phi, theta[k] + fraction * d_theta[k], ra[k, j] + fraction * d_ra[k, j],
+                         dec[k, j] + fraction * d_dec[k, j])
+
+    def refine(k, j):
+        """Fraction of sample interval k where object j crosses its horizon (regula falsi)"""
+        lo, hi = np.zeros(len(k)), np.ones(len(k))
+        f_lo = altitude[k, j] - horizon[j]
+        f_hi = altitude[k + 1, j] - horizon[j]
+        for _ in range(REFINE_STEPS):
+            x = lo - f_lo * (hi - lo) / np.where(f_hi != f_lo, f_hi - f_lo, 1.0)
+            f_x = interpolated_altitude(k, j, x) - horizon[j]
+            same = np.sign(f_x) == np.sign(f_lo)
+            lo, f_lo = np.where(same, x, lo), np.where(same, f_x, f_lo)
+            hi, f_hi = np.where(same, hi, x), np.where(same, f_hi, f_x)
+        return lo - f_lo * (hi - lo) / np.where(f_hi != f_lo, f_hi - f_lo, 1.0)
+
+    columns = np.arange(ra.shape[1])
+
+    def crossing_times(mask):
+        k, found = _first(mask)
+        times = np.full(len(columns), np.nan)
+        j = columns[found]
+        times[found] = k[found] + refine(k[found], j)
+        return times
+
+    rise = crossing_times(~above[:-1] & above[1:])
+    set_ = crossing_times(above[:-1] & ~above[1:])
+
+    # Upper transit: hour angle goes from negative to non-negative (not the jump through 180 deg)
+    hour_angle = (theta_column - ra + np.pi) % (2 * np.pi) - np.pi
+    k, found = _first((hour_angle[:-1] < 0) & (hour_angle[1:] >= 0) & (np.diff(hour_angle, axis=0) < np.pi))
+    transit = np.full(len(columns), np.nan)
+    transit_altitude = np.full(len(columns), np.nan)
+    j = columns[found]
+    kf = k[found]
+    fraction = -hour_angle[kf, j] / (hour_angle[kf + 1, j] - hour_angle[kf, j])
+    transit[found] = kf + fraction
+    transit_altitude[found] = interpolated_altitude(kf, j, fraction)
+
+    # Highest altitude while the Sun is down
+    dark = ~above[:, 0]
+    max_altitude = np.where(dark[:, None], altitude, -np.inf).max(axis=0) if dark.any() else None
+    if max_altitude is not None:
+        in_dark = found & dark[k] & dark[k + 1]
+        max_altitude = np.where(in_dark, np.fmax(max_altitude, transit_altitude), max_altitude)
+
+    night_start = grid.start + timedelta(minutes=first * SAMPLE_MINUTES)
+
+    def when(samples) -> Optional[str]:
+        if np.isnan(samples):
+            return None
+        return (night_start + timedelta(minutes=float(samples) * SAMPLE_MINUTES)).isoformat()
+
+    objects = []
+    names = [name for name, _, _ in BODIES] + [star['name'] for star in stars]
+    kinds = [kind for _, _, kind in BODIES] + ['star'] * len(stars)
+    magnitudes = [None] * n_bodies + [star.get('magnitude') for star in stars]
+    for i, (name, kind, magnitude) in enumerate(zip(names, kinds, magnitudes)):
+        objects.append({
+            'name': name,
+            'type': kind,
+            'magnitude': magnitude,
+            'rise': when(rise[i]),
+            'transit': when(transit[i]),
+            'set': when(set_[i]),
+            'transit_altitude': None if np.isnan(transit_altitude[i]) else round(float(np.degrees(transit_altitude[i])), 3),
+            'max_altitude': None if max_altitude is None else round(float(np.degrees(max_altitude[i])), 3),
+            'always_up': bool(above[:, i].all()),
+            'never_up': bool(not above[:, i].any()),
+        })
+
+    return {
+        'night_start': night_start.isoformat(),
+        'night_end': (night_start + timedelta(hours=24)).isoformat(),
+        # The Sun is up at local noon, so its first set and rise are this evening's and tomorrow's
+        'sunset': objects[0]['set'],
+        'sunrise': objects[0]['rise'],
+        'objects': objects,
+    }
@@ -0,0 +1,82 @@
+"""Batch conversions between celestial coordinate frames.
+
+Every frame is a rotation of ICRS (J2000 RA/Dec): the J2000 ecliptic and the
+galactic frame by constant matrices, and an observer's horizon (azimuth from
+north through east, altitude) by one matrix per time built from Skyfield's
+precession-nutation matrix and apparent sidereal time. Converting any number
+of points is then a couple of matrix products over (times, points, 3) arrays.
+
+Directions are geometric: aberration (up to 20") and atmospheric refraction
+are ignored, which is fine for drawing figures on a sky map.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+
+FRAMES = ('icrs', 'ecliptic', 'galactic', 'altaz')
+
+J2000_OBLIQUITY = np.radians(23.4392911)
+# ICRS -> J2000 ecliptic
+ECLIPTIC = np.array([
+    [1.0, 0.0, 0.0],
+    [0.0, np.cos(J2000_OBLIQUITY), np.sin(J2000_OBLIQUITY)],
+    [0.0, -np.sin(J2000_OBLIQUITY), np.cos(J2000_OBLIQUITY)],
+])
+# ICRS -> galactic (Hipparcos definition)
+GALACTIC = np.array([
+    [-0.0548755604162154, -0.8734370902348850, -0.4838350155487132],
+    [0.4941094278755837, -0.4448296299600112, 0.7469822444972189],
+    [-0.8676661490190047, -0.1980763734312015, 0.4559837761750669],
+])
+FIXED_FRAMES = {'icrs': np.eye(3), 'ecliptic': ECLIPTIC, 'galactic': GALACTIC}
+
+
+def unit_vectors(lon_deg, lat_deg) -> np.ndarray:
+    """Unit vectors shaped (..., 3) from longitude-like and latitude-like angles in degrees"""
+    lon, lat = np.radians(lon_deg), np.radians(lat_deg)
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def spherical(vectors: np.ndarray):
+    """Longitude in [0, 360) and latitude in degrees of vectors shaped (..., 3)"""
+    x, y, z = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+    return np.degrees(np.arctan2(y, x)) % 360.0, np.degrees(np.arctan2(z, np.hypot(x, y)))
+
+
+def horizon_rotations(t, latitude: float, longitude: float) -> np.ndarray:
+    """ICRS -> (north, east, up) rotations for an observer at Skyfield times t, shaped (times, 3, 3)"""
+    precession_nutation = np.moveaxis(np.asarray(t.M).reshape(3, 3, -1), -1, 0)
+    sidereal = np.radians(np.atleast_1d(t.gast) * 15.0 + longitude)
+    lat = np.radians(latitude)
+    cos_s, sin_s = np.cos(sidereal), np.sin(sidereal)
+    zeros = np.zeros_like(sidereal)
+    local = np.stack([
+        np.stack([-np.sin(lat) * cos_s, -np.sin(lat) * sin_s, np.full_like(sidereal, np.cos(lat))], axis=-1),
+        np.stack([-sin_s, cos_s, zeros], axis=-1),
+        np.stack([np.cos(lat) * cos_s, np.cos(lat) * sin_s, np.full_like(sidereal, np.sin(lat))], axis=-1),
+    ], axis=1)
+    return local @ precession_nutation
+
+
+def transform(lon: Sequence[float], lat: Sequence[float], from_frame: str, to_frame: str,
+              horizon: Optional[np.ndarray] = None):
+    """Convert points between frames; returns (lon, lat) arrays in degrees.
+
+    horizon (from horizon_rotations) is required when either frame is altaz,
+    and the results are then shaped (times, points); otherwise (points,).
+    """
+    vectors = unit_vectors(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+    if from_frame == 'altaz':
+        # Rotations are orthogonal, so the inverse is the transpose
+        icrs = np.einsum('tji,nj->tni', horizon, vectors)
+    else:
+        icrs = vectors @ FIXED_FRAMES[from_frame]
+    if to_frame == 'altaz':
+        if icrs.ndim == 2:
+            result = np.einsum('tij,nj->tni', horizon, icrs)
+        else:
+            result = np.einsum('tij,tnj->tni', horizon, icrs)
+    else:
+        result = icrs @ FIXED_FRAMES[to_frame].T
+    return spherical(result)
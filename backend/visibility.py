@@ -0,0 +1,139 @@
+"""Optical visibility of satellites from a ground observer.
+
+A satellite can be seen with the naked eye when it is above the horizon,
+lit by the Sun (outside Earth's shadow), and the observer's sky is dark
+enough (Sun below civil twilight). Everything here works on arrays of SGP4
+TEME positions shaped (satellites, times, 3), so a whole group over a whole
+pass is evaluated in one call.
+
+The Sun's direction uses the Astronomical Almanac low-precision formula
+(about 0.01°) and Earth's shadow is modelled as a cylinder, which is plenty
+for a visible/not-visible flag and a brightness estimate.
+"""
+from typing import Optional
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6378.137
+WGS84_FLATTENING = 1 / 298.257223563
+# Sun altitude below which the sky is dark enough to see satellites (civil twilight)
+SUN_ALTITUDE_LIMIT = -6.0
+
+# Standard magnitudes (at 1000 km range, half illuminated) by NORAD catalogue
+# number, for objects where a commonly quoted value exists
+STANDARD_MAGNITUDES = {
+    25544: -1.8,  # ISS
+    20580: 2.2,  # Hubble Space Telescope
+}
+
+
+def norad_id(line1: str) -> Optional[int]:
+    """NORAD catalogue number from TLE line 1"""
+    try:
+        return int(line1[2:7])
+    except ValueError:
+        return None
+
+
+def standard_magnitude(line1: str) -> Optional[float]:
+    return STANDARD_MAGNITUDES.get(norad_id(line1))
+
+
+def gmst(jd, fr):
+    """Greenwich mean sidereal time in radians (IAU 1982, as used by SGP4)"""
+    t = (np.asarray(jd) - 2451545.0 + np.asarray(fr)) / 36525.0
+    seconds = (-6.2e-6 * t ** 3 + 0.093104 * t ** 2
+               + (876600.0 * 3600 + 8640184.812866) * t + 67310.54841)
+    return np.mod(seconds * (2 * np.pi / 86400.0), 2 * np.pi)
+
+
+def sun_direction(jd, fr):
+    """Unit vectors towards the Sun in the equatorial frame of date, shaped (t, 3)"""
+    n = np.asarray(jd) - 2451545.0 + np.asarray(fr)
+    mean_longitude = np.radians(280.460 + 0.9856474 * n)
+    mean_anomaly = np.radians(357.528 + 0.9856003 * n)
+    longitude = mean_longitude + np.radians(1.915 * np.sin(mean_anomaly) + 0.020 * np.sin(2 * mean_anomaly))
+    obliquity = np.radians(23.439 - 0.0000004 * n)
+    return np.stack([
+        np.cos(longitude),
+        np.cos(obliquity) * np.sin(longitude),
+        np.sin(obliquity) * np.sin(longitude),
+    ], axis=-1)
+
+
+def observer_frame(latitude: float, longitude: float, jd, fr, elevation_m: float = 0.0):
+    """Observer position (km) and local up/east/north unit vectors in TEME, each shaped (t, 3)"""
+    lat = np.radians(latitude)
+    e2 = WGS84_FLATTENING * (2 - WGS84_FLATTENING)
+    normal_radius = EARTH_RADIUS_KM / np.sqrt(1 - e2 * np.sin(lat) ** 2)
+    height = elevation_m / 1000.0
+    theta = gmst(jd, fr) + np.radians(longitude)
+
+    cos_lat, sin_lat = np.cos(lat), np.sin(lat)
+    cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+    position = np.stack([
+        (normal_radius + height) * cos_lat * cos_theta,
+        (normal_radius + height) * cos_lat * sin_theta,
+        np.full_like(theta, (normal_radius * (1 - e2) + height) * sin_lat),
+    ], axis=-1)
+    up = np.stack([cos_lat * cos_theta, cos_lat * sin_theta, np.full_like(theta, sin_lat)], axis=-1)
+    east = np.stack([-sin_theta, cos_theta, np.zeros_like(theta)], axis=-1)
+    north = np.stack([-sin_lat * cos_theta, -sin_lat * sin_theta, np.full_like(theta, cos_lat)], axis=-1)
+    return position, up, east, north
+
+
+def optical_visibility(
+    positions: np.ndarray,
+    jd,
+    fr,
+    latitude: float,
+    longitude: float,
+    standard_magnitudes=None,
+    min_altitude: float = 0.0,
+    sun_altitude_limit: float = SUN_ALTITUDE_LIMIT,
+) -> dict:
+    """Look angles, lighting and visibility for satellites over times.
+
+    positions are TEME km shaped (n, t, 3); jd/fr are the matching times,
+    shaped (t,). standard_magnitudes, if given, is one value (or NaN) per
+    satellite. Returns arrays shaped (n, t) except observer_dark and
+    sun_altitude, which are (t,).
+    """
+    positions = np.asarray(positions, dtype=float)
+    observer, up, east, north = observer_frame(latitude, longitude, jd, fr)
+    sun = sun_direction(jd, fr)
+
+    rho = positions - observer[None]
+    distance = np.linalg.norm(rho, axis=-1)
+    unit = rho / distance[..., None]
+    altitude = np.degrees(np.arcsin(np.clip(np.einsum('ntk,tk->nt', unit, up), -1, 1)))
+    azimuth = np.degrees(np.arctan2(np.einsum('ntk,tk->nt', unit, east), np.einsum('ntk,tk->nt', unit, north))) % 360
+
+    # Cylindrical shadow: behind Earth (relative to the Sun) and within one Earth radius of the axis
+    along_sun = np.einsum('ntk,tk->nt', positions, sun)
+    off_axis = np.linalg.norm(positions - along_sun[..., None] * sun[None], axis=-1)
+    sunlit = (along_sun > 0) | (off_axis > EARTH_RADIUS_KM)
+
+    sun_altitude = np.degrees(np.arcsin(np.clip(np.einsum('tk,tk->t', sun, up), -1, 1)))
+    observer_dark = sun_altitude < sun_altitude_limit
+    above_horizon = altitude > min_altitude
+    visible = above_horizon & sunlit & observer_dark[None]
+
+    result = {
+        'altitude': altitude,
+        'azimuth': azimuth,
+        'distance_km': distance,
+        'above_horizon': above_horizon,
+        'sunlit': sunlit,
+        'sun_altitude': sun_altitude,
+        'observer_dark': observer_dark,
+        'visible': visible,
+    }
+    if standard_magnitudes is not None:
+        # Phase angle at the satellite between the Sun and the observer
+        cos_phase = np.einsum('ntk,tk->nt', -unit, sun)
+        illuminated = np.maximum((1 + cos_phase) / 2, 1e-6)
+        base = np.asarray(standard_magnitudes, dtype=float)[:, None]
+        magnitude = base - 15.75 + 2.5 * np.log10(distance ** 2 / illuminated)
+        result['magnitude'] = np.where(visible, magnitude, np.nan)
+    return result
@@ -69,6 +69,8 @@ const Planner = () => {
       const eventData = {
         ...newEvent,
         date: format(newEvent.date, 'yyyy-MM-dd'),
+        // Date and time are local wall-clock values; the backend converts them to UTC
+        tz: Intl.DateTimeFormat().resolvedOptions().timeZone,
         user_id: userId
       };
       
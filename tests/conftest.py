@@ -0,0 +1,21 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+
+# server reads these at import; keep tests off MongoDB and the shared caches
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'tests')
+os.environ.setdefault('MEMO_STORE_MB', '0')
+os.environ.setdefault('RESULT_CACHE_MB', '0')
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture
+def tles():
+    """Fixture TLEs as (name, line1, line2) tuples"""
+    lines = (BACKEND_DIR / 'benchmarks' / 'fixtures' / 'stations.tle').read_text().strip().splitlines()
+    return [tuple(lines[i:i + 3]) for i in range(0, len(lines), 3)]
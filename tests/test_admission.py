@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from admission import CostClass
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    async def scenario():
+        cost_class = CostClass('heavy', limit=1, queue_size=3, wait_timeout=5)
+        await cost_class.acquire()
+        admitted = []
+
+        async def request(name):
+            await cost_class.acquire()
+            admitted.append(name)
+
+        waiters = [asyncio.ensure_future(request(name)) for name in 'abc']
+        await asyncio.sleep(0)
+        assert cost_class.queued == 3 and admitted == []
+
+        for expected in ('a', 'ab', 'abc'):
+            cost_class.release()
+            await asyncio.sleep(0.01)
+            assert ''.join(admitted) == expected
+        await asyncio.gather(*waiters)
+        assert (cost_class.active, cost_class.queued) == (1, 0)
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def scenario():
+        cost_class = CostClass('heavy', limit=2, queue_size=1, wait_timeout=5)
+        cost_class._service_time = 4.0
+        await cost_class.acquire()
+        await cost_class.acquire()
+        waiter = asyncio.ensure_future(cost_class.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as rejected:
+            await cost_class.acquire()
+        assert rejected.value.status_code == 503
+        # Two requests ahead of a new one, two slots, four seconds each
+        assert rejected.value.headers['Retry-After'] == '4'
+        waiter.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_timed_out_waiter_is_rejected_and_leaves_the_queue():
+    async def scenario():
+        cost_class = CostClass('standard', limit=1, queue_size=2, wait_timeout=0.01)
+        await cost_class.acquire()
+        with pytest.raises(HTTPException) as rejected:
+            await cost_class.acquire()
+        assert rejected.value.status_code == 503
+        assert cost_class.queued == 0
+        cost_class.release()
+        assert cost_class.active == 0
+
+    asyncio.run(scenario())
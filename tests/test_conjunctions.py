@@ -0,0 +1,90 @@
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from conjunctions import _target_pairs, grid_pairs, screen_conjunctions
+from orbits import parse_tles, propagate, propagate_one, time_grid
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def brute_force_pairs(points, radius):
+    distance = np.linalg.norm(points[:, None] - points[None, :], axis=2)
+    i, j = np.nonzero(np.triu(distance < radius, k=1))
+    return set(zip(i.tolist(), j.tolist()))
+
+
+def test_grid_pairs_matches_brute_force():
+    points = np.random.default_rng(1).uniform(-50, 50, (400, 3))
+    first, second = grid_pairs(points, 7.5)
+    assert set(zip(first.tolist(), second.tolist())) == brute_force_pairs(points, 7.5)
+    assert len(first) == len(set(zip(first.tolist(), second.tolist())))
+
+
+def test_grid_pairs_keeps_groups_apart():
+    points = np.zeros((4, 3))
+    first, second = grid_pairs(points, 1.0, groups=np.array([0, 0, 1, 1]))
+    assert set(zip(first.tolist(), second.tolist())) == {(0, 1), (2, 3)}
+
+
+def test_target_pairs_match_filtered_grid_pairs():
+    count, steps = 40, 3
+    positions = np.random.default_rng(3).uniform(-20, 20, (steps * count, 3))
+    is_target = np.zeros(count, dtype=bool)
+    is_target[[2, 7]] = True
+    valid = np.arange(steps * count)
+    first, second = _target_pairs(positions, valid, count, 6.0, is_target)
+    grid_first, grid_second = grid_pairs(positions, 6.0, groups=valid // count)
+    involved = is_target[grid_first % count] | is_target[grid_second % count]
+    expected = set(zip(grid_first[involved].tolist(), grid_second[involved].tolist()))
+    assert sorted(zip(first.tolist(), second.tolist())) == sorted(expected)
+
+
+def test_target_pairs_without_targets_is_empty():
+    positions = np.random.default_rng(2).uniform(-10, 10, (30, 3))
+    first, second = _target_pairs(positions, np.arange(30), 10, 5.0, np.zeros(10, dtype=bool))
+    assert first.dtype.kind == 'i' and len(first) == 0 and len(second) == 0
+
+
+def test_screen_with_empty_targets_finds_nothing(tles):
+    names, satrecs = parse_tles(tles)
+    assert screen_conjunctions(names, satrecs, START, 3600, 50, targets=[]) == []
+
+
+def test_targets_screen_only_their_pairs(tles):
+    names, satrecs = parse_tles(tles)
+    target = names.index('STARLINK-1007')
+    everything = screen_conjunctions(names, satrecs, START, 6 * 3600, 100)
+    targeted = screen_conjunctions(names, satrecs, START, 6 * 3600, 100, targets=[target])
+    expected = [c for c in everything if names[target] in (c['satellite_a'], c['satellite_b'])]
+    assert expected and targeted == expected
+    assert screen_conjunctions(names, satrecs, START, 6 * 3600, 100, targets=[names.index('ISS (ZARYA)')]) == []
+
+
+def test_naive_start_is_utc_whatever_the_host_zone(tles, monkeypatch):
+    names, satrecs = parse_tles(tles)
+    expected = screen_conjunctions(names, satrecs, START, 6 * 3600, 100)
+    grid, _ = propagate(satrecs[:1], *time_grid(START, [600.0]))
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    try:
+        naive_start = START.replace(tzinfo=None)
+        position, _ = propagate_one(satrecs[0], naive_start, 600.0)
+        naive = screen_conjunctions(names, satrecs, naive_start, 6 * 3600, 100)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    # The refinement step must agree with the coarse grid
+    np.testing.assert_allclose(position, grid[0, 0])
+    assert expected and naive == expected
+
+
+def test_request_rejects_empty_targets(tles):
+    from server import ConjunctionRequest
+    satellites = [{'name': name, 'line1': line1, 'line2': line2} for name, line1, line2 in tles]
+    with pytest.raises(ValidationError):
+        ConjunctionRequest(satellites=satellites, targets=[], datetime=START.isoformat())
+    ConjunctionRequest(satellites=satellites, targets=[satellites[0]['name']], datetime=START.isoformat())
@@ -0,0 +1,18 @@
+from constellations import FIGURE_STARS, constellation_at, constellation_geometry
+
+
+def test_geometry_covers_every_constellation_and_flags_missing_figures():
+    geometry = constellation_geometry()
+    assert len(geometry) == 88
+    for entry in geometry:
+        assert entry['boundaries']
+        assert entry['has_figure'] == bool(entry['lines'])
+    flags = {entry['abbreviation']: entry['has_figure'] for entry in geometry}
+    assert flags['Ori'] and not flags['Sct']
+
+
+def test_lookup_places_figure_stars_in_their_constellations():
+    ra, dec = zip(FIGURE_STARS['Betelgeuse'], FIGURE_STARS['Polaris'])
+    assert constellation_at(list(ra), list(dec)).tolist() == ['Ori', 'UMi']
+    # The north celestial pole
+    assert constellation_at(0.0, 90.0) == 'UMi'
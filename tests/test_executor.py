@@ -0,0 +1,30 @@
+import asyncio
+import threading
+
+from executor import ComputeExecutor
+
+
+def test_cancelled_queued_job_leaves_counters_balanced():
+    executor = ComputeExecutor(max_workers=1)
+    release = threading.Event()
+    ran = []
+
+    async def scenario():
+        blocker = asyncio.ensure_future(executor.run('block', release.wait, 5))
+        queued = asyncio.ensure_future(executor.run('queued', ran.append, 'queued'))
+        await asyncio.sleep(0.05)
+        assert (executor.queued, executor.running) == (1, 1)
+
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        assert executor.queued == 0
+        release.set()
+        assert await blocker is True
+        assert await executor.run('after', sum, [1, 2]) == 3
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert ran == []
+    assert (executor.queued, executor.running) == (0, 0)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from groundtrack import encode_polyline, encode_track, split_at_antimeridian
+
+
+def test_encode_polyline_known_answer():
+    # The worked example from Google's encoded polyline format documentation
+    points = np.array([(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)])
+    assert encode_polyline(points) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+
+def test_split_at_antimeridian_eastward_and_westward():
+    segments = split_at_antimeridian(np.array([0.0, 1.0, 2.0]), np.array([170.0, 190.0, 200.0]))
+    assert [segment.tolist() for segment in segments] == [
+        [[0.0, 170.0], [0.5, 180.0]],
+        [[0.5, -180.0], [1.0, -170.0], [2.0, -160.0]],
+    ]
+
+    segments = split_at_antimeridian(np.array([0.0, -2.0]), np.array([-170.0, -190.0]))
+    assert [segment.tolist() for segment in segments] == [
+        [[0.0, -170.0], [-1.0, -180.0]],
+        [[-1.0, 180.0], [-2.0, 170.0]],
+    ]
+
+
+def test_encode_track_splits_wrapped_longitudes():
+    latitude = np.linspace(0, 10, 21)
+    longitude = (np.linspace(150, 210, 21) + 180) % 360 - 180
+    polylines = encode_track(latitude, longitude, tolerance_deg=0.01)
+    assert len(polylines) == 2
+    # A straight track simplifies to its ends plus the crossing
+    assert polylines[0] == encode_polyline(np.array([(0.0, 150.0), (5.0, 180.0)]))
+    assert polylines[1] == encode_polyline(np.array([(5.0, -180.0), (10.0, -150.0)]))
@@ -0,0 +1,48 @@
+import asyncio
+
+from list_cache import InMemoryBackend, ListCache, SharedGenerations
+
+
+def test_in_process_entries_follow_shared_generations(tmp_path):
+    # Two workers with their own in-process caches over the same generations file
+    data = {'body': b'[1]'}
+    loads = []
+
+    async def loader():
+        loads.append(data['body'])
+        return data['body']
+
+    async def scenario():
+        path = str(tmp_path / 'generations.bin')
+        first, second = (
+            ListCache(InMemoryBackend(generations=SharedGenerations(path, slots=64))) for _ in range(2)
+        )
+        body, etag = await first.get_or_load('lists', 'u', loader)
+        assert (await second.get_or_load('lists', 'u', loader)) == (body, etag)
+        assert len(loads) == 2
+        await first.get_or_load('lists', 'u', loader)
+        assert len(loads) == 2
+
+        # A write handled by the first worker also invalidates the second's entry
+        data['body'] = b'[1,2]'
+        await first.invalidate('lists', 'u')
+        body, new_etag = await second.get_or_load('lists', 'u', loader)
+        assert body == b'[1,2]' and new_etag != etag
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_with_process_local_generations():
+    async def scenario():
+        cache = ListCache(InMemoryBackend())
+        bodies = iter([b'a', b'b'])
+
+        async def loader():
+            return next(bodies)
+
+        assert (await cache.get_or_load('lists', 'u', loader))[0] == b'a'
+        assert (await cache.get_or_load('lists', 'u', loader))[0] == b'a'
+        await cache.invalidate('lists', 'u')
+        assert (await cache.get_or_load('lists', 'u', loader))[0] == b'b'
+
+    asyncio.run(scenario())
@@ -0,0 +1,144 @@
+import multiprocessing
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import BaseModel
+
+from memo_store import MemoStore, canonical
+
+
+class Query(BaseModel):
+    latitude: float
+    when: str
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MemoStore(str(tmp_path / 'memo.sqlite3'), max_bytes=1024 * 1024, max_value_bytes=64 * 1024)
+
+
+def test_canonical_forms():
+    assert canonical({'b': 1, 'a': (2, {3})}) == {'a': [2, [3]], 'b': 1}
+    assert canonical(Query(latitude=1, when='x')) == {'latitude': 1.0, 'when': 'x'}
+    assert canonical(datetime(2025, 1, 1, tzinfo=timezone.utc)) == '2025-01-01T00:00:00+00:00'
+    with pytest.raises(TypeError):
+        canonical(object())
+
+
+def test_memoize_reuses_results_for_equal_arguments(store):
+    calls = []
+
+    @store.memoize('square')
+    def square(query: Query):
+        calls.append(query)
+        return {'value': query.latitude ** 2}
+
+    assert square(Query(latitude=3, when='now')) == {'value': 9.0}
+    assert square(Query(latitude=3.0, when='now')) == {'value': 9.0}
+    assert square(Query(latitude=4, when='now')) == {'value': 16.0}
+    assert len(calls) == 2
+
+
+def test_version_change_recomputes_and_purges(store):
+    version = ['de421-a']
+    calls = []
+
+    @store.memoize('events', version=lambda: version[0])
+    def events(day: str):
+        calls.append(day)
+        return [day, version[0]]
+
+    assert events('2025-01-01') == ['2025-01-01', 'de421-a']
+    version[0] = 'de421-b'
+    assert events('2025-01-01') == ['2025-01-01', 'de421-b']
+    assert len(calls) == 2
+    rows = store._connection().execute('SELECT version FROM memo').fetchall()
+    assert rows == [('de421-b',)]
+
+
+def test_code_change_purges_rows_of_earlier_code(store):
+    @store.memoize('events')
+    def old_events(day: str):
+        return ['old', day]
+
+    @store.memoize('events')
+    def new_events(day: str):
+        return ['new', day]
+
+    @store.memoize('events_other')
+    def other(day: str):
+        return day
+
+    old_events('2025-01-01')
+    other('2025-01-01')
+    assert new_events('2025-01-01') == ['new', '2025-01-01']
+    rows = store._connection().execute('SELECT function FROM memo ORDER BY function').fetchall()
+    assert [function.rpartition(':')[0] for function, in rows] == ['events', 'events_other']
+
+
+def test_oversized_values_and_disabled_store(tmp_path):
+    small = MemoStore(str(tmp_path / 'small.sqlite3'), max_bytes=1024 * 1024, max_value_bytes=16)
+    assert not small.set('k', 'f', '', b'x' * 1000 + bytes(range(256)) * 4)
+    disabled = MemoStore(str(tmp_path / 'off.sqlite3'), max_bytes=0, max_value_bytes=1024)
+
+    def func():
+        return 1
+    assert disabled.memoize('func')(func) is func
+
+
+def test_trim_evicts_least_recently_used(tmp_path):
+    store = MemoStore(str(tmp_path / 'memo.sqlite3'), max_bytes=4000, max_value_bytes=4000)
+    payload = bytes(range(256)) * 8  # incompressible enough to take ~2 KB
+    for i in range(4):
+        store.set(f'k{i}', 'f', '', payload)
+        store._connection().execute('UPDATE memo SET last_used = ? WHERE key = ?', (i, f'k{i}'))
+    store.trim()
+    keys = [key for key, in store._connection().execute('SELECT key FROM memo ORDER BY key')]
+    assert keys and keys == [f'k{i}' for i in range(4 - len(keys), 4)]
+    total = store._connection().execute('SELECT SUM(size) FROM memo').fetchone()[0]
+    assert total <= 4000 * 0.9
+
+
+def test_unreadable_store_falls_back_to_computing(tmp_path):
+    path = tmp_path / 'memo.sqlite3'
+    path.write_bytes(b'not a database' * 100)
+    store = MemoStore(str(path), max_bytes=1024 * 1024, max_value_bytes=1024)
+
+    @store.memoize('double')
+    def double(x):
+        return x * 2
+
+    with pytest.raises(sqlite3.DatabaseError):
+        store._connection()
+    assert double(21) == 42
+
+
+def memo_worker(path, results):
+    store = MemoStore(path, max_bytes=1024 * 1024, max_value_bytes=64 * 1024)
+    calls = []
+
+    @store.memoize('shared')
+    def shared(i):
+        calls.append(i)
+        return {'i': i}
+
+    results.put(([shared(i)['i'] for i in range(50)], len(calls)))
+
+
+def test_workers_share_one_file(tmp_path):
+    path = str(tmp_path / 'memo.sqlite3')
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=memo_worker, args=(path, results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+    assert all(values == list(range(50)) for values, _ in outcomes)
+
+    # Everything is stored now: a later worker computes nothing
+    memo_worker(path, results)
+    assert results.get(timeout=5) == (list(range(50)), 0)
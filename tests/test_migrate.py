@@ -0,0 +1,50 @@
+import asyncio
+from datetime import datetime, timezone
+
+import mongomock_motor
+import pytest
+from bson import ObjectId
+
+import migrate
+import server
+
+
+@pytest.fixture
+def db(monkeypatch):
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(server, 'db', client['tests'])
+    return server.db
+
+
+def test_normalise_coerces_legacy_values():
+    _id = ObjectId.from_datetime(datetime(2023, 5, 1, tzinfo=timezone.utc))
+    doc = {
+        'id': 'c1', 'user_id': 'u', 'name': 'Legacy',
+        'stars': [{'ra': 'n/a', 'dec': '12.5', 'x': 'left', 'extra': 1}, {'ra': 400, 'dec': -100}],
+        'lines': [[0, 1], [1, 1], [0, 5]],
+    }
+    migrated = migrate.normalise_constellation(doc, _id)
+    assert migrated['created_at'] == datetime(2023, 5, 1, tzinfo=timezone.utc)
+    assert migrated['stars'] == [{'ra': 0.0, 'dec': 12.5}, {'ra': 360.0, 'dec': -90.0}]
+    assert migrated['lines'] == [[0, 1]]
+
+
+def test_migration_skips_invalid_documents(db):
+    async def scenario():
+        await db.custom_constellations.insert_many([
+            {'id': 'ok', 'user_id': 'u', 'name': 'Fine', 'stars': [], 'lines': [], 'created_at': '2024-01-01T00:00:00Z'},
+            {'id': 'orphan', 'name': 'No owner', 'stars': [], 'lines': []},
+        ])
+        await db.stargazing_events.insert_many([
+            {'id': 'e1', 'user_id': 'u', 'title': 't', 'created_at': 'yesterday'},
+            {'id': 'e2', 'user_id': 'u', 'title': 't'},
+        ])
+        assert await migrate.migrate_constellations(False) == 1
+        assert await migrate.migrate_event_dates(False) == 2
+        assert await migrate.migrate_constellations(False) == 0
+        constellation = await db.custom_constellations.find_one({'id': 'ok'})
+        assert constellation['created_at'].year == 2024
+        async for event in db.stargazing_events.find({}):
+            assert isinstance(event['created_at'], datetime)
+
+    asyncio.run(scenario())
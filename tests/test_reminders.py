@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import mongomock_motor
+
+from reminders import LocalQueueSink, ReminderScheduler, compute_fire_time, utc, utc_now
+
+
+class RecordingSink:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    async def send(self, reminder):
+        await asyncio.sleep(0)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('sink down')
+        self.sent.append(reminder)
+
+
+def test_fire_time_uses_the_event_time_zone():
+    assert compute_fire_time('2025-07-01', '20:00', timedelta(0), 'Europe/Paris') == \
+        datetime(2025, 7, 1, 18, tzinfo=timezone.utc)
+    assert compute_fire_time('2025-01-01', '20:00', timedelta(hours=1), 'America/New_York') == \
+        datetime(2025, 1, 2, tzinfo=timezone.utc)
+    assert compute_fire_time('2025-01-01', '20:00', timedelta(0)) == datetime(2025, 1, 1, 20, tzinfo=timezone.utc)
+    # An explicit offset wins over the zone
+    assert compute_fire_time('2025-01-01', '20:00+02:00', timedelta(0), 'Asia/Tokyo') == \
+        datetime(2025, 1, 1, 18, tzinfo=timezone.utc)
+    assert compute_fire_time('soon', 'later', timedelta(0)) is None
+
+
+async def setup_event(fire_at):
+    collection = mongomock_motor.AsyncMongoMockClient()['tests'].stargazing_events
+    await collection.insert_one({
+        'id': 'e1', 'user_id': 'u', 'title': 'Perseids', 'event_type': 'meteor_shower',
+        'date': '2025-08-12', 'time': '22:00', 'description': '', 'next_fire_at': fire_at,
+    })
+    return collection
+
+
+async def fire(scheduler, fire_at):
+    # _fire releases the dispatch slot the run loop took for it
+    await scheduler._dispatch_slots.acquire()
+    await scheduler._fire('e1', fire_at)
+
+
+def test_only_one_scheduler_claims_a_reminder():
+    async def scenario():
+        fire_at = utc_now() - timedelta(seconds=1)
+        collection = await setup_event(fire_at)
+        sinks = [RecordingSink(), RecordingSink()]
+        schedulers = [ReminderScheduler(collection, sink) for sink in sinks]
+        await asyncio.gather(*(fire(scheduler, fire_at) for scheduler in schedulers))
+
+        assert sum(len(sink.sent) for sink in sinks) == 1
+        event = await collection.find_one({'id': 'e1'})
+        assert 'next_fire_at' not in event and 'reminder_attempts' not in event
+        assert event['reminder_sent_at']
+
+        # A stale heap entry for the same time cannot claim it again
+        await fire(schedulers[0], fire_at)
+        assert sum(len(sink.sent) for sink in sinks) == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_dispatch_retries_then_gives_up():
+    async def scenario():
+        fire_at = utc_now() - timedelta(seconds=1)
+        collection = await setup_event(fire_at)
+        sink = RecordingSink(failures=10)
+        scheduler = ReminderScheduler(collection, sink, max_attempts=3)
+
+        for attempt in range(1, 3):
+            await fire(scheduler, fire_at)
+            event = await collection.find_one({'id': 'e1'})
+            assert event['reminder_attempts'] == attempt
+            retry_at = utc(event['next_fire_at'])
+            assert retry_at > utc_now()
+            fire_at = retry_at
+
+        await fire(scheduler, fire_at)
+        event = await collection.find_one({'id': 'e1'})
+        assert 'next_fire_at' not in event and event['reminder_failed_at']
+        assert sink.sent == []
+
+    asyncio.run(scenario())
+
+
+def test_full_local_queue_retries_instead_of_dropping():
+    async def scenario():
+        fire_at = utc_now() - timedelta(seconds=1)
+        collection = await setup_event(fire_at)
+        sink = LocalQueueSink(maxsize=1)
+        sink.queue.put_nowait({'event_id': 'other', 'title': ''})
+        scheduler = ReminderScheduler(collection, sink)
+
+        await fire(scheduler, fire_at)
+        event = await collection.find_one({'id': 'e1'})
+        assert 'reminder_sent_at' not in event
+        assert utc(event['next_fire_at']) > utc_now()
+
+    asyncio.run(scenario())
+
+
+def test_claim_pushes_the_lease_forward():
+    async def scenario():
+        fire_at = utc_now() - timedelta(seconds=1)
+        collection = await setup_event(fire_at)
+        claimed = asyncio.Event()
+
+        class StuckSink:
+            async def send(self, reminder):
+                claimed.set()
+                await asyncio.sleep(3600)
+
+        scheduler = ReminderScheduler(collection, StuckSink(), lease=timedelta(minutes=5))
+        task = asyncio.ensure_future(fire(scheduler, fire_at))
+        await claimed.wait()
+        event = await collection.find_one({'id': 'e1'})
+        # A worker dying now leaves the reminder to fire again once the lease expires
+        assert timedelta(minutes=4) < utc(event['next_fire_at']) - utc_now() <= timedelta(minutes=5)
+        task.cancel()
+
+    asyncio.run(scenario())
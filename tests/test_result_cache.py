@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from result_cache import SharedResultCache
+
+STRESS_KEYS = [f'key-{i}' for i in range(16)]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'results.cache')
+
+
+def test_round_trip_between_instances(path):
+    writer, reader = SharedResultCache(path, sets=4, ways=2, slot_size=1024), None
+    try:
+        assert writer.set('a', b'{"value": 1}', 60)
+        reader = SharedResultCache(path, sets=4, ways=2, slot_size=1024)
+        assert reader.get('a') == b'{"value": 1}'
+        assert reader.get('b') is None
+        assert writer.set('a', b'{"value": 2}', 60)
+        assert reader.get('a') == b'{"value": 2}'
+    finally:
+        writer.close()
+        if reader:
+            reader.close()
+
+
+def test_expiry_and_size_limit(path):
+    cache = SharedResultCache(path, sets=1, ways=2, slot_size=256)
+    try:
+        assert cache.set('old', b'x', -1)
+        assert cache.get('old') is None
+        assert not cache.set('big', b'x' * 256, 60)
+        assert cache.get('big') is None
+    finally:
+        cache.close()
+
+
+def test_oversized_results_are_counted(path, monkeypatch):
+    import server
+    from metrics import CACHE_REJECTED
+
+    cache = SharedResultCache(path, sets=1, ways=2, slot_size=256)
+    monkeypatch.setattr(server, 'result_cache', cache)
+    try:
+        before = CACHE_REJECTED.snapshot().get(('results', 'satellite_tle'), 0)
+        assert server.store_result('satellite_tle', 'small', {'n': 1}) == b'{"n": 1}'
+        server.store_result('satellite_tle', 'large', {'n': 'x' * 256})
+        assert CACHE_REJECTED.snapshot()[('results', 'satellite_tle')] == before + 1
+        assert cache.get('small') == b'{"n": 1}' and cache.get('large') is None
+    finally:
+        cache.close()
+
+
+def test_evicts_expired_then_least_recently_used(path):
+    cache = SharedResultCache(path, sets=1, ways=2, slot_size=256)
+    try:
+        cache.set('a', b'a', 60)
+        time.sleep(0.01)
+        cache.set('b', b'b', 60)
+        time.sleep(0.01)
+        assert cache.get('a') == b'a'
+        cache.set('c', b'c', 60)
+        assert (cache.get('a'), cache.get('b'), cache.get('c')) == (b'a', None, b'c')
+
+        # d takes the least recently used slot (a's); e then replaces d, which has expired
+        time.sleep(0.01)
+        cache.get('c')
+        cache.set('d', b'd', -1)
+        cache.set('e', b'e', 60)
+        assert (cache.get('a'), cache.get('c'), cache.get('e')) == (None, b'c', b'e')
+    finally:
+        cache.close()
+
+
+def test_new_layout_reformats_the_file(path):
+    first = SharedResultCache(path, sets=2, ways=2, slot_size=512)
+    first.set('a', b'a', 60)
+    first.close()
+    second = SharedResultCache(path, sets=4, ways=2, slot_size=512)
+    try:
+        assert second.get('a') is None
+        assert os.path.getsize(path) == 64 + 4 * 2 * 512
+    finally:
+        second.close()
+
+
+def stress_value(key: str, writer: int, i: int) -> bytes:
+    padding = (writer * 7919 + i * 104729) % 900
+    return f'{key}|{writer}|{i}|{padding}|'.encode() + b'x' * padding
+
+
+def check_value(key: str, value: bytes) -> bool:
+    name, writer, i, padding, rest = value.split(b'|', 4)
+    return name.decode() == key and len(rest) == int(padding) and value == stress_value(key, int(writer), int(i))
+
+
+def stress_worker(path: str, writer: int, seconds: float, results):
+    cache = SharedResultCache(path, sets=2, ways=2, slot_size=1024)
+    torn = reads = hits = 0
+    deadline = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < deadline:
+        key = STRESS_KEYS[(writer + i) % len(STRESS_KEYS)]
+        cache.set(key, stress_value(key, writer, i), 60)
+        for other in STRESS_KEYS[i % 4::4]:
+            value = cache.get(other)
+            reads += 1
+            if value is not None:
+                hits += 1
+                torn += not check_value(other, value)
+        i += 1
+    cache.close()
+    results.put((writer, i, reads, hits, torn))
+
+
+def test_concurrent_processes_never_read_torn_values(path):
+    # Far more keys than slots, so every write evicts and rewrites slots other processes are reading
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=stress_worker, args=(path, writer, 1.5, results)) for writer in range(4)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+    assert all(writes > 0 and hits > 0 for _, writes, _, hits, _ in outcomes)
+    assert sum(torn for *_, torn in outcomes) == 0
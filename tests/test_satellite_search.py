@@ -0,0 +1,55 @@
+import threading
+
+from satellite_catalog import SatelliteCatalog
+
+
+def make_catalog(tles):
+    catalog = SatelliteCatalog(snapshot_tick_seconds=10, snapshot_cell_km=500, refresh_seconds=3600)
+    catalog.update_group('stations', tles)
+    catalog.update_group('starlink', [tle for tle in tles if tle[0].startswith('STARLINK')])
+    return catalog
+
+
+def test_search_by_name_prefix_norad_and_cospar(tles):
+    index = make_catalog(tles).search_index
+    assert [r['name'] for r in index.search('iss')] == ['ISS (ZARYA)']
+    assert index.search('25544')[0]['match'] == 'norad'
+    assert index.search('98067A')[0]['norad_id'] == 25544
+    assert {r['name'] for r in index.search('starlink', groups=['starlink'])} == {
+        name for name, _, _ in tles if name.startswith('STARLINK')
+    }
+
+
+def test_search_reports_group_membership(tles):
+    catalog = make_catalog(tles)
+    starlink = next(name for name, _, _ in tles if name.startswith('STARLINK'))
+    assert catalog.search_index.search(starlink)[0]['groups'] == ['starlink', 'stations']
+    catalog.update_group('starlink', [])
+    assert catalog.search_index.search(starlink)[0]['groups'] == ['stations']
+
+
+def test_search_during_refreshes(tles):
+    catalog = make_catalog(tles)
+    errors = []
+    done = threading.Event()
+
+    def refresh():
+        try:
+            for i in range(300):
+                catalog.update_group('active', tles if i % 2 else tles[:1])
+        finally:
+            done.set()
+
+    def search():
+        try:
+            while not done.is_set():
+                catalog.search_index.search('starlink', limit=50)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=refresh)] + [threading.Thread(target=search) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
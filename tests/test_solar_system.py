@@ -0,0 +1,53 @@
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from solar_system import HEADER_LENGTH, MAGIC, encode_orbits, track
+
+
+def decode_orbits(payload: bytes):
+    """Reference ORB1 reader, as the browser parses it"""
+    assert payload[:4] == MAGIC
+    (length,) = HEADER_LENGTH.unpack_from(payload, 4)
+    header = json.loads(payload[8:8 + length])
+    start = 8 + length + (-(8 + length) % 8)
+    assert start % 8 == 0
+    rows = np.frombuffer(payload, dtype='<f4', offset=start).reshape(-1, 4)
+    return header, rows
+
+
+def circle(radius, count=721):
+    angles = np.linspace(0, 2 * np.pi, count)
+    return np.column_stack([radius * np.cos(angles), radius * np.sin(angles), np.zeros(count)])
+
+
+def test_encode_orbits_round_trip():
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    offsets = np.linspace(0, 365.256, 721)
+    earth = track('Earth', 'planet', 'sun', 'au', 365.256, offsets, circle(1.0), np.array([0.0, 0.0172, 0.0]))
+    moon = track('Moon', 'moon', 'earth', 'km', 27.32, offsets[:50] / 13, circle(384400.0, 50),
+                 np.array([0.0, 1.0, 0.0]))
+    payload = encode_orbits(start, 'ecliptic', [earth, moon], extra={'span_days': 365.256})
+
+    header, rows = decode_orbits(payload)
+    assert header['start'] == start.isoformat() and header['frame'] == 'ecliptic'
+    assert header['span_days'] == 365.256
+    assert [body['name'] for body in header['bodies']] == ['Earth', 'Moon']
+    assert header['bodies'][0]['position'] == [1.0, 0.0, 0.0]
+    for body, item in zip(header['bodies'], (earth, moon)):
+        assert 'rows' not in body
+        decoded = rows[body['offset']:body['offset'] + body['count']]
+        np.testing.assert_allclose(decoded, item['rows'].astype('<f4'))
+    assert len(rows) == sum(body['count'] for body in header['bodies'])
+
+
+def test_track_simplifies_within_tolerance():
+    path = circle(1.0)
+    item = track('Earth', 'planet', 'sun', 'au', 365.256, np.linspace(0, 365.256, len(path)), path, np.zeros(3))
+    kept = item['rows']
+    assert 16 < len(kept) < len(path)
+    # Every kept point lies on the circle, starting from the state at the start time
+    assert np.linalg.norm(kept[:, 1:], axis=1) == pytest.approx(np.ones(len(kept)))
+    assert kept[0].tolist() == [0.0, 1.0, 0.0, 0.0]
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import timedelta
+
+import mongomock_motor
+import pytest
+
+from sync_feed import InvalidSyncToken, SyncFeed
+
+SECTIONS = {'constellations': 'custom_constellations', 'events': 'stargazing_events'}
+
+
+def make_feed(settle=timedelta(0), retention=timedelta(days=30)):
+    db = mongomock_motor.AsyncMongoMockClient()['tests']
+    return db, SyncFeed(db, SECTIONS, retention=retention, settle=settle)
+
+
+async def insert(db, feed, name, doc_id, user_id='u'):
+    await db[name].insert_one({'id': doc_id, 'user_id': user_id, **await feed.stamp(user_id)})
+
+
+async def sync_all(feed, user_id, token, limit):
+    """Follow has_more to the end; returns the pages and the final token"""
+    pages = []
+    while True:
+        page = await feed.changes(user_id, token, limit)
+        pages.append(page)
+        token = page['next_token']
+        if not page['has_more']:
+            return pages, token
+
+
+def ids(pages, section, kind):
+    return [doc['id'] if kind == 'upserts' else doc for page in pages for doc in page[section][kind]]
+
+
+def test_pages_through_changes_in_sequence_order():
+    async def scenario():
+        db, feed = make_feed()
+        for i in range(5):
+            await insert(db, feed, 'custom_constellations', f'c{i}')
+            await insert(db, feed, 'stargazing_events', f'e{i}')
+        await insert(db, feed, 'custom_constellations', 'other', user_id='v')
+
+        pages, token = await sync_all(feed, 'u', None, 3)
+        assert len(pages) == 4
+        assert ids(pages, 'constellations', 'upserts') == [f'c{i}' for i in range(5)]
+        assert ids(pages, 'events', 'upserts') == [f'e{i}' for i in range(5)]
+
+        # Nothing new: an empty page with the same position
+        page = await feed.changes('u', token, 3)
+        assert not page['constellations']['upserts'] and not page['has_more']
+        assert feed.decode_token(page['next_token'])[1] == feed.decode_token(token)[1] == 10
+
+    asyncio.run(scenario())
+
+
+def test_deletes_arrive_as_tombstones():
+    async def scenario():
+        db, feed = make_feed()
+        for doc_id in ('a', 'b', 'c'):
+            await insert(db, feed, 'custom_constellations', doc_id)
+        _, token = await sync_all(feed, 'u', None, 10)
+
+        await db.custom_constellations.delete_one({'id': 'b'})
+        await feed.tombstone('constellations', 'u', 'b')
+        await insert(db, feed, 'custom_constellations', 'd')
+        await db.custom_constellations.delete_one({'id': 'd'})
+        await feed.tombstone('constellations', 'u', 'd')
+
+        pages, _ = await sync_all(feed, 'u', token, 10)
+        # d came and went since the last sync: only its delete is sent
+        assert ids(pages, 'constellations', 'deleted') == ['b', 'd']
+        assert ids(pages, 'constellations', 'upserts') == []
+
+        # One change per page: every tombstone still gets its own page
+        pages, _ = await sync_all(feed, 'u', token, 1)
+        assert len(pages) == 2
+        assert ids(pages, 'constellations', 'deleted') == ['b', 'd']
+
+    asyncio.run(scenario())
+
+
+def test_unsettled_changes_hold_the_token_back():
+    async def scenario():
+        db, feed = make_feed(settle=timedelta(minutes=5))
+        await insert(db, feed, 'custom_constellations', 'a')
+        first = await feed.changes('u', None, 10)
+        assert ids([first], 'constellations', 'upserts') == ['a']
+        assert not first['has_more']
+        assert feed.decode_token(first['next_token'])[1] == 0
+
+        # Sent again until it has settled
+        feed.settle = timedelta(0)
+        again = await feed.changes('u', first['next_token'], 10)
+        assert ids([again], 'constellations', 'upserts') == ['a']
+        assert feed.decode_token(again['next_token'])[1] == 1
+
+    asyncio.run(scenario())
+
+
+def test_old_foreign_and_invalid_tokens():
+    async def scenario():
+        db, feed = make_feed(retention=timedelta(days=30))
+        await insert(db, feed, 'custom_constellations', 'a')
+        token = (await feed.changes('u', None, 10))['next_token']
+
+        assert (await feed.changes('v', token, 10))['reset']
+        _, seq, issued_at = feed.decode_token(token)
+        stale = feed.encode_token('u', seq, issued_at - timedelta(days=31))
+        reset = await feed.changes('u', stale, 10)
+        assert reset['reset'] and reset['next_token'] is None
+        with pytest.raises(InvalidSyncToken):
+            await feed.changes('u', 'not a token', 10)
+
+    asyncio.run(scenario())
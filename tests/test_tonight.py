@@ -0,0 +1,86 @@
+from datetime import date, datetime, timedelta, timezone
+
+import ephem
+import numpy as np
+import pytest
+
+from tonight import BODIES, GRID_HOURS, SAMPLE_MINUTES, NightGrid, rise_transit_set
+
+EPHEM_BODIES = {
+    'Sun': ephem.Sun, 'Moon': ephem.Moon, 'Mercury': ephem.Mercury, 'Venus': ephem.Venus, 'Mars': ephem.Mars,
+    'Jupiter': ephem.Jupiter, 'Saturn': ephem.Saturn, 'Uranus': ephem.Uranus, 'Neptune': ephem.Neptune,
+}
+AU_KM = 149597870.7
+
+
+class EphemNightGrid(NightGrid):
+    """The same samples as NightGrid, taken from ephem so no JPL ephemeris is needed"""
+
+    def __init__(self, day: date):
+        self.day = day
+        self.start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        greenwich = ephem.Observer()
+        greenwich.lat = greenwich.lon = '0'
+        bodies = [EPHEM_BODIES[name]() for name, _, _ in BODIES]
+        theta, ra, dec, distance = [], [], [], []
+        for minutes in range(0, GRID_HOURS * 60 + 1, SAMPLE_MINUTES):
+            greenwich.date = ephem.Date(self.start + timedelta(minutes=minutes))
+            theta.append(float(greenwich.sidereal_time()))
+            for body in bodies:
+                body.compute(greenwich.date)
+            ra.append([float(body.g_ra) for body in bodies])
+            dec.append([float(body.g_dec) for body in bodies])
+            distance.append([body.earth_distance * AU_KM for body in bodies])
+        self.theta = np.unwrap(theta)
+        self.ra = np.unwrap(np.array(ra), axis=0)
+        self.dec = np.array(dec)
+        self.distance_km = np.array(distance)
+        self.precession = np.eye(3)
+
+
+def ephem_event(name, latitude, longitude, after, rising, horizon, use_center):
+    observer = ephem.Observer()
+    observer.lat, observer.lon = str(latitude), str(longitude)
+    observer.pressure = 0
+    observer.horizon = horizon
+    observer.date = ephem.Date(after)
+    find = observer.next_rising if rising else observer.next_setting
+    return find(EPHEM_BODIES[name](), use_center=use_center).datetime().replace(tzinfo=timezone.utc)
+
+
+def minutes_apart(iso, expected):
+    return abs((datetime.fromisoformat(iso) - expected).total_seconds()) / 60
+
+
+def test_sun_and_moon_match_ephem():
+    latitude, longitude = 51.48, -0.13
+    table = rise_transit_set(EphemNightGrid(date(2025, 3, 20)), latitude, longitude, [])
+    night_start = datetime.fromisoformat(table['night_start'])
+    objects = {item['name']: item for item in table['objects']}
+
+    def ephem_time(name, rising, horizon, use_center):
+        return ephem_event(name, latitude, longitude, night_start, rising, horizon, use_center)
+
+    # -0:50 for the Sun's centre is the standard altitude with its semi-diameter
+    assert minutes_apart(table['sunset'], ephem_time('Sun', False, '-0:50', True)) < 1
+    assert minutes_apart(table['sunrise'], ephem_time('Sun', True, '-0:50', True)) < 1
+    # ephem works topocentrically, so the Moon's upper limb at -0:34 is the same event
+    assert minutes_apart(objects['Moon']['rise'], ephem_time('Moon', True, '-0:34', False)) < 2
+    assert minutes_apart(objects['Moon']['set'], ephem_time('Moon', False, '-0:34', False)) < 2
+
+def test_circumpolar_and_never_rising_objects():
+    stars = [
+        {'name': 'Near the pole', 'ra': 40.0, 'dec': 85.0},
+        {'name': 'Deep south', 'ra': 100.0, 'dec': -80.0},
+    ]
+    table = rise_transit_set(EphemNightGrid(date(2025, 6, 21)), 78.2, 15.6, stars)
+    objects = {item['name']: item for item in table['objects']}
+
+    # Midnight sun over Svalbard
+    assert objects['Sun']['always_up'] and table['sunset'] is None and table['sunrise'] is None
+    pole = objects['Near the pole']
+    assert pole['always_up'] and pole['rise'] is None and pole['set'] is None
+    # Upper culmination, north of the zenith
+    assert pole['transit_altitude'] == pytest.approx(90 - (85.0 - 78.2), abs=0.01)
+    south = objects['Deep south']
+    assert south['never_up'] and south['rise'] is None and south['transit_altitude'] < 0
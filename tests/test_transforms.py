@@ -0,0 +1,38 @@
+import pytest
+from skyfield.api import load
+
+from transforms import horizon_rotations, transform
+
+
+def test_galactic_and_ecliptic_reference_points():
+    # Galactic centre and north galactic pole (Hipparcos/ICRS)
+    lon, lat = transform([266.40499, 192.85948], [-28.93617, 27.12825], 'icrs', 'galactic')
+    assert (lon[0] + 180) % 360 - 180 == pytest.approx(0, abs=1e-4)
+    assert lat == pytest.approx([0, 90], abs=1e-4)
+
+    # The June solstice point and the north ecliptic pole
+    lon, lat = transform([90, 270], [23.4392911, 66.5607089], 'icrs', 'ecliptic')
+    assert lon[0] == pytest.approx(90, abs=1e-6)
+    assert lat == pytest.approx([0, 90], abs=1e-6)
+
+    lon, lat = transform([10, 200], [-40, 5], 'galactic', 'ecliptic')
+    back_lon, back_lat = transform(lon, lat, 'ecliptic', 'galactic')
+    assert back_lon == pytest.approx([10, 200]) and back_lat == pytest.approx([-40, 5])
+
+
+def test_altaz_round_trip_and_zenith():
+    ts = load.timescale(builtin=True)
+    t = ts.utc(2025, 3, 20, [0, 6, 12])
+    horizon = horizon_rotations(t, latitude=51.48, longitude=0.0)
+    assert horizon.shape == (3, 3, 3)
+
+    ra, dec = [10.0, 120.0, 300.0], [-20.0, 45.0, 80.0]
+    azimuth, altitude = transform(ra, dec, 'icrs', 'altaz', horizon)
+    assert azimuth.shape == (3, 3)
+    for i in range(3):
+        back_ra, back_dec = transform(azimuth[i], altitude[i], 'altaz', 'icrs', horizon[i:i + 1])
+        assert back_ra[0] == pytest.approx(ra, abs=1e-8) and back_dec[0] == pytest.approx(dec, abs=1e-8)
+
+    # The zenith's declination is the latitude, give or take precession since J2000
+    _, zenith_dec = transform([0.0], [90.0], 'altaz', 'icrs', horizon)
+    assert zenith_dec[:, 0] == pytest.approx([51.48] * 3, abs=0.5)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from visibility import EARTH_RADIUS_KM, observer_frame, optical_visibility, sun_direction
+
+JD, FR = np.array([2460000.5]), np.array([0.0])
+
+
+def observer_with_sun_at(sun_altitude):
+    """Equatorial longitude where the Sun stands at about sun_altitude degrees"""
+    sun = sun_direction(JD, FR)[0]
+    longitudes = np.arange(-180, 180, 0.1)
+    altitudes = [np.degrees(np.arcsin(observer_frame(0.0, lon, JD, FR)[1][0] @ sun)) for lon in longitudes]
+    return float(longitudes[np.argmin(np.abs(np.array(altitudes) - sun_altitude))])
+
+
+def test_cylindrical_shadow():
+    sun = sun_direction(JD, FR)[0]
+    across = np.cross(sun, [0.0, 0.0, 1.0])
+    across /= np.linalg.norm(across)
+    positions = np.array([
+        -7000 * sun,  # behind Earth, on the shadow axis
+        -7000 * sun + (EARTH_RADIUS_KM + 50) * across,  # behind Earth, outside the cylinder
+        7000 * sun,  # on the day side
+    ])[:, None]
+    result = optical_visibility(positions, JD, FR, 0.0, 0.0)
+    assert result['sunlit'][:, 0].tolist() == [False, True, True]
+
+
+def test_overhead_brightness_and_darkness():
+    longitude = observer_with_sun_at(-20)
+    observer, up, _, _ = observer_frame(0.0, longitude, JD, FR)
+    positions = np.array([observer[0] + range_km * up[0] for range_km in (1000, 2000, 100)])[:, None]
+    result = optical_visibility(positions, JD, FR, 0.0, longitude, standard_magnitudes=[-1.8, -1.8, -1.8])
+
+    assert result['observer_dark'][0]
+    assert result['altitude'][:, 0] == pytest.approx([90, 90, 90], abs=1e-6)
+    # Low enough overhead to still be inside Earth's shadow
+    assert result['visible'][:, 0].tolist() == [True, True, False]
+    magnitude = result['magnitude'][:, 0]
+    assert np.isnan(magnitude[2])
+
+    cos_phase = -(up[0] @ sun_direction(JD, FR)[0])
+    expected = -1.8 - 15.75 + 2.5 * np.log10(1000 ** 2 / ((1 + cos_phase) / 2))
+    assert magnitude[0] == pytest.approx(expected)
+    # Twice the range is 5 log10(2) magnitudes fainter
+    assert magnitude[1] - magnitude[0] == pytest.approx(5 * np.log10(2))